@@ -1,34 +1,59 @@
 import os
 import csv
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, session, send_from_directory
+import json
+import threading
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, session, send_file, Response, stream_with_context
 from PIL import Image
 import piexif
 import shutil
-import exifread
 from werkzeug.utils import secure_filename
 from datetime import datetime, timedelta
 from PIL import Image
 from PIL.ExifTags import TAGS, GPSTAGS
 from PIL import JpegImagePlugin
+from PIL import ImageOps
 from geopy.geocoders import Nominatim
 from geopy.exc import GeocoderTimedOut, GeocoderServiceError
 
-import pytz
 import subprocess
 import platform
 import tempfile
-
-# Import pillow-heif for HEIC support
-try:
-    import pillow_heif
-    # Register the HEIF opener with PIL
-    pillow_heif.register_heif_opener()
-    HEIF_SUPPORT = True
-except ImportError:
-    HEIF_SUPPORT = False
+import time
+import uuid
+from collections import OrderedDict
 
 # Import the utility functions for logging and CSV path handling
 from utils import setup_logger, get_csv_path
+from media_index import get_media_index
+# Single-pass metadata extraction (also registers pillow-heif for HEIC support)
+from media_metadata import HEIF_SUPPORT, HEIC_EXTENSIONS, extract_media_metadata, extract_media_info, detect_media_type
+# Parallel directory scanning on a persistent worker pool
+from media_scanner import collect_media_paths, extract_many, default_scan_workers
+# Parallel metadata writer for bulk saves
+from media_writer import write_many, default_save_workers, default_video_save_workers
+# In-place GPS patching for JPEG, TIFF, PNG and HEIC
+from exif_patch import patch_gps_in_place
+# Lossless HEIC Exif item writer
+from heif_meta import read_heif_exif
+from heif_write import write_heif_exif
+# Native QuickTime/MP4 location writer
+from mp4_atoms import QUICKTIME_EXTENSIONS
+from mp4_write import format_iso6709, write_quicktime_location
+# Journal of original metadata, replacing full .bak copies
+from backup_journal import get_backup_journal
+# On-disk caches of derived files (thumbnails, previews)
+from file_cache import FileCache, CACHE_ROOT
+# Thumbnails embedded in EXIF IFD1 and HEIF 'thmb' items
+from embedded_thumbnail import read_embedded_thumbnail, upright_thumbnail
+# Durable write-behind queue for review page updates
+from write_queue import WriteQueue, DEFAULT_SETTLE_DELAY
+
+from prefetch import Prefetcher
+# Background jobs (scans, bulk saves) with progress reporting and cancellation
+from jobs import JobManager, JobCancelled
+# Sorted time index for proxy GPS lookups
+from proxy_gps import GpsTimeIndex
+from gpx_track import GpxTrackStore, GPX_EXTENSIONS
 
 # Setup logger
 logger = setup_logger()
@@ -39,14 +64,54 @@ app = Flask(__name__)
 app.config['CSV_FOLDER'] = os.path.join('data', 'csv')
 app.config['LOG_FOLDER'] = os.path.join('data', 'log')
 app.config['PHOTOS_FOLDER'] = os.path.join('data', 'photos')
+# Uploaded GPX tracks, loaded on startup as an extra proxy GPS source
+app.config['GPX_FOLDER'] = os.path.join('data', 'gpx')
 app.config['TEMP_FOLDER'] = tempfile.gettempdir()
+# Number of parallel workers used when scanning directories (1 disables parallel scanning)
+app.config['SCAN_WORKERS'] = default_scan_workers()
+# Proxy GPS mode: 'interpolate' between the bracketing geotagged shots, or snap to the 'nearest' one
+app.config['PROXY_GPS_MODE'] = os.environ.get('PROXY_GPS_MODE', 'interpolate')
+# Seconds a directory scan is reused when only the proxy time frame changes
+app.config['SCAN_CACHE_TTL'] = int(os.environ.get('SCAN_CACHE_TTL', '300'))
+# Number of background jobs (scans) that can run at the same time
+app.config['JOB_WORKERS'] = int(os.environ.get('JOB_WORKERS', '2'))
+# Parallel metadata writers for Save All, and the separate cap on concurrent video (ffmpeg) rewrites
+app.config['SAVE_WORKERS'] = default_save_workers()
+app.config['SAVE_VIDEO_WORKERS'] = default_video_save_workers()
+# Write-behind mode: review page updates are queued and written by a background worker
+app.config['WRITE_BEHIND'] = os.environ.get('WRITE_BEHIND', '1').lower() not in ('0', 'false', 'no')
+# Seconds a queued update waits for further edits of the same file before it is written
+app.config['WRITE_BEHIND_DELAY'] = float(os.environ.get('WRITE_BEHIND_DELAY', str(DEFAULT_SETTLE_DELAY)))
+# Video thumbnails, kept across restarts and evicted least recently used first beyond the budget
+app.config['THUMBNAIL_CACHE_FOLDER'] = os.path.join(CACHE_ROOT, 'thumbnails')
+app.config['THUMBNAIL_CACHE_MB'] = int(os.environ.get('THUMBNAIL_CACHE_MB', '256'))
+# Browser-viewable JPEG previews (HEIC conversions), with their own budget
+app.config['PREVIEW_CACHE_FOLDER'] = os.path.join(CACHE_ROOT, 'previews')
+app.config['PREVIEW_CACHE_MB'] = int(os.environ.get('PREVIEW_CACHE_MB', '1024'))
+# Widths previews are rendered at; requests are rounded up to the next one so few variants get cached
+app.config['PREVIEW_WIDTHS'] = (480, 960, 1440, 1920, 2560)
+app.config['PREVIEW_QUALITY'] = int(os.environ.get('PREVIEW_QUALITY', '82'))
+# Width of the decoded fallback for directory browser thumbnails
+app.config['GRID_THUMBNAIL_WIDTH'] = 320
+# Seconds browsers may reuse content-addressed files (cached video thumbnails) without revalidating
+app.config['IMMUTABLE_MAX_AGE'] = 365 * 24 * 3600
+# Default and maximum page size of /api/entries
+app.config['API_PAGE_SIZE'] = 200
+app.config['API_PAGE_LIMIT'] = 1000
+# Review entries warmed in the background after each move: upcoming ones, previous ones, and the pool size
+app.config['PREFETCH_AHEAD'] = int(os.environ.get('PREFETCH_AHEAD', '3'))
+app.config['PREFETCH_BEHIND'] = int(os.environ.get('PREFETCH_BEHIND', '1'))
+app.config['PREFETCH_WORKERS'] = int(os.environ.get('PREFETCH_WORKERS', '2'))
+# Review page metadata (display EXIF) kept in memory for this many files
+app.config['METADATA_CACHE_SIZE'] = 512
 
 # Ensure the directories exist
 os.makedirs(app.config['CSV_FOLDER'], exist_ok=True)
 os.makedirs(app.config['LOG_FOLDER'], exist_ok=True)
 os.makedirs(app.config['PHOTOS_FOLDER'], exist_ok=True)
+os.makedirs(app.config['GPX_FOLDER'], exist_ok=True)
 
-app.config['ALLOWED_EXTENSIONS'] = {'jpg', 'jpeg', 'png', 'csv', 'heic', 'heif', 'mp4', 'mov', 'avi', 'mkv'}
+app.config['ALLOWED_EXTENSIONS'] = {'jpg', 'jpeg', 'png', 'csv', 'gpx', 'heic', 'heif', 'mp4', 'mov', 'avi', 'mkv'}
 app.secret_key = 'your-secret-key-here'  # Needed for flash messages
 
 # Log application initialization
@@ -62,6 +127,40 @@ logger.info(f"Photos folder exists: {os.path.exists(app.config['PHOTOS_FOLDER'])
 logger.info(f"Photos folder writable: {os.access(app.config['PHOTOS_FOLDER'], os.W_OK)}")
 logger.info(f"HEIC/HEIF support: {HEIF_SUPPORT}")
 
+# Persistent metadata index so unchanged files are not re-parsed on every scan
+media_index = get_media_index()
+logger.info(f"Media index: {media_index.db_path}")
+logger.info(f"Scan workers: {app.config['SCAN_WORKERS']}")
+logger.info(f"Save workers: {app.config['SAVE_WORKERS']} (video: {app.config['SAVE_VIDEO_WORKERS']})")
+logger.info(f"Write-behind: {app.config['WRITE_BEHIND']} (delay: {app.config['WRITE_BEHIND_DELAY']}s)")
+
+thumbnail_cache = FileCache(app.config['THUMBNAIL_CACHE_FOLDER'], app.config['THUMBNAIL_CACHE_MB'] * 1024 * 1024,
+                            name='Thumbnail cache')
+preview_cache = FileCache(app.config['PREVIEW_CACHE_FOLDER'], app.config['PREVIEW_CACHE_MB'] * 1024 * 1024,
+                          name='Preview cache')
+# Directory browser thumbnails served from embedded EXIF/HEIF thumbnails vs. decoded
+thumbnail_stats = {'embedded': 0, 'decoded': 0}
+# Preview width last picked by the browser from the review page srcset, so prefetching warms the same variant
+preview_requests = {'width': app.config['PREVIEW_WIDTHS'][1]}
+
+# Review page metadata by path, as (size, mtime_ns, metadata) in LRU order
+review_metadata_cache = OrderedDict()
+review_metadata_lock = threading.Lock()
+
+# GPS writes of this process by path; part of media ETags, since a write need not change the size or mtime
+media_write_generations = {}
+media_write_lock = threading.Lock()
+# Keeps ETags of an earlier run from matching after the generations restart at 0
+media_etag_epoch = uuid.uuid4().hex[:8]
+
+# Background job runner; scans fan out further to the scan worker pool
+job_manager = JobManager(app.config['JOB_WORKERS'])
+
+# GPS logger tracks used as a proxy source before falling back to other photos
+gpx_store = GpxTrackStore()
+gpx_store.add_path(app.config['GPX_FOLDER'])
+logger.info(f"GPX trackpoints loaded: {len(gpx_store)}")
+
 # Handle Windows long path issue
 if platform.system() == 'Windows':
     try:
@@ -111,6 +210,79 @@ def validate_coordinates(lat, lon):
         raise ValueError(f"Invalid coordinates: lat={lat}, lon={lon}")
     return True
 
+# Coordinates closer than this (in degrees, about 0.1 m) count as unchanged; the DMS
+# rationals written by decimal_to_dms round to 0.001 arc seconds (about 3e-7 degrees)
+GPS_EPSILON = 1e-6
+
+def gps_unchanged(file_path, lat, lon):
+    """
+    Check whether a file already holds the given coordinates, within GPS_EPSILON.
+
+    QuickTime locations are written with 4 decimals, so videos are compared at that precision.
+    """
+    try:
+        info = get_media_info(file_path)
+    except Exception as e:
+        logger.debug(f"Could not read current GPS of {file_path}: {e}")
+        return False
+    gps = info['gps']
+    if not gps:
+        return False
+    if info.get('media_type') == 'video' and file_path.lower().endswith(QUICKTIME_EXTENSIONS):
+        return format_iso6709(*gps) == format_iso6709(lat, lon)
+    return abs(gps[0] - lat) <= GPS_EPSILON and abs(gps[1] - lon) <= GPS_EPSILON
+
+def restore_original(file_path):
+    """Re-apply the metadata a file had before its GPS was first rewritten, dropping any queued write"""
+    queued = write_queue.get(file_path) is not None
+    write_queue.discard(file_path)
+    if backup_journal.has_backup(file_path):
+        restored = backup_journal.restore(file_path)
+    else:
+        # Backups made before the journal existed are full copies next to the file
+        legacy_backup = file_path + '.bak'
+        if not os.path.exists(legacy_backup):
+            if queued:
+                # The change never reached the file
+                logger.info(f"Dropped queued GPS write of {file_path}")
+                return True
+            logger.warning(f"No backup found for {file_path}")
+            return False
+        shutil.move(legacy_backup, file_path)
+        logger.info(f"Restored {file_path} from {legacy_backup}")
+        restored = True
+    if restored:
+        media_index.invalidate(file_path)
+        bump_media_generation(file_path)
+        forget_review_metadata(file_path)
+        invalidate_scan_cache()
+    return restored
+
+def media_generation_key(file_path):
+    return os.path.normcase(os.path.abspath(fix_long_path(file_path)))
+
+def bump_media_generation(file_path):
+    """Record that a file's content was rewritten, so its media ETags change"""
+    key = media_generation_key(file_path)
+    with media_write_lock:
+        media_write_generations[key] = media_write_generations.get(key, 0) + 1
+
+def write_gps_update(file_path, lat, lon, media_type=None):
+    """Back up a file and write new coordinates to it; used by the write-behind queue"""
+    file_path = fix_long_path(file_path)
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"File not found: {file_path}")
+    if gps_unchanged(file_path, lat, lon):
+        logger.info(f"GPS of {file_path} already matches, nothing to write")
+        return True
+    if not backup_journal.backup(file_path, media_type or get_write_media_type(file_path)):
+        return False
+    if not update_image_gps(file_path, lat, lon):
+        return False
+    invalidate_scan_cache()
+    logger.info(f"GPS coordinates written for {file_path}")
+    return True
+
 def rational_to_decimal(ratio):
     """Convert a rational (tuple or IFDRational) to a decimal number."""
     try:
@@ -233,8 +405,30 @@ def _clean_exif_dict(exif_dict):
         del exif_dict["Exif"][41729]
     return exif_dict
 
+def set_gps_ifd(exif_dict, lat, lon):
+    """Replace the GPS IFD of a piexif dictionary with the given position"""
+    exif_dict["GPS"] = {
+        piexif.GPSIFD.GPSLatitudeRef: 'N' if lat >= 0 else 'S',
+        piexif.GPSIFD.GPSLatitude: decimal_to_dms(abs(lat)),
+        piexif.GPSIFD.GPSLongitudeRef: 'E' if lon >= 0 else 'W',
+        piexif.GPSIFD.GPSLongitude: decimal_to_dms(abs(lon)),
+        # Add GPSVersionID if not present
+        piexif.GPSIFD.GPSVersionID: exif_dict.get("GPS", {}).get(piexif.GPSIFD.GPSVersionID, (2, 3, 0, 0))
+    }
+    return exif_dict
+
 def update_image_gps(file_path, lat, lon):
-    """Update GPS metadata for media files (images, HEIC, videos)."""
+    """Update GPS metadata for media files (images, HEIC, videos) and drop the file from the media index."""
+    if not _write_media_gps(file_path, lat, lon):
+        return False
+    # In-place patches keep the size and may land within the mtime resolution, so never trust the stat alone
+    media_index.invalidate(fix_long_path(file_path))
+    bump_media_generation(file_path)
+    forget_review_metadata(file_path)
+    return True
+
+def _write_media_gps(file_path, lat, lon):
+    """Write GPS metadata with the cheapest method that works for the file type."""
     try:
         # Fix long path issue on Windows
         file_path = fix_long_path(file_path)
@@ -244,16 +438,36 @@ def update_image_gps(file_path, lat, lon):
             logger.error(f"File not found: {file_path}")
             return False
         
-        # Get media type
-        media_type = get_media_type(file_path)
+        # Get media type; HEIC files are written even without pillow-heif
+        media_type = get_write_media_type(file_path)
         file_lower = file_path.lower()
         
         logger.info(f"Processing {media_type} file: {file_path}")
         
-        # Handle HEIC files specifically with pillow-heif
-        if media_type == 'heic' and HEIF_SUPPORT:
+        # HEIC: replace only the Exif item so the coded image stays byte-identical
+        if media_type == 'heic':
+            try:
+                if patch_gps_in_place(file_path, lat, lon):
+                    logger.info(f"Successfully patched GPS in place for HEIC file {file_path}")
+                    return True
+
+                tiff = read_heif_exif(file_path)
+                if tiff is not None:
+                    exif_dict = piexif.load(tiff) if tiff else {"0th": {}, "Exif": {}, "GPS": {}, "1st": {}}
+                    exif_dict = set_gps_ifd(_clean_exif_dict(exif_dict), lat, lon)
+                    if write_heif_exif(file_path, piexif.dump(exif_dict)[6:]):
+                        logger.info(f"Successfully updated GPS for HEIC file {file_path}")
+                        return True
+            except Exception as e:
+                logger.warning(f"Could not update the Exif item of {file_path}: {str(e)}")
+
+            if not HEIF_SUPPORT:
+                logger.error(f"Failed to update HEIC file {file_path}")
+                return False
+
+            # Last resort: re-encode with pillow-heif
+            logger.warning(f"Re-encoding {file_path} to update its GPS")
             try:
-                # Open HEIC with pillow-heif
                 img = Image.open(file_path)
                 exif_data = img.getexif()
                 
@@ -286,6 +500,11 @@ def update_image_gps(file_path, lat, lon):
         
         # Handle video files
         elif media_type == 'video':
+            # Rewrite only the moov box of QuickTime/MP4 files instead of remuxing them
+            if file_lower.endswith(QUICKTIME_EXTENSIONS) and write_quicktime_location(file_path, format_iso6709(lat, lon)):
+                logger.info(f"Successfully updated GPS for video {file_path}")
+                return True
+
             try:
                 # Use FFmpeg to add GPS metadata to video
                 # Note: FFmpeg can modify some video metadata, but GPS data might not be preserved by all players
@@ -331,6 +550,11 @@ def update_image_gps(file_path, lat, lon):
         # Handle standard image files
         else:  # media_type == 'image'
             try:
+                # Patch the existing GPS tags in place when they can hold the new values
+                if patch_gps_in_place(file_path, lat, lon):
+                    logger.info(f"Successfully patched GPS in place for image {file_path}")
+                    return True
+
                 try:
                     exif_dict = piexif.load(file_path)
                 except Exception as e:
@@ -340,17 +564,7 @@ def update_image_gps(file_path, lat, lon):
                 # Clean problematic tags
                 exif_dict = _clean_exif_dict(exif_dict)
                 
-                # Create GPS metadata
-                gps_ifd = {
-                    piexif.GPSIFD.GPSLatitudeRef: 'N' if lat >= 0 else 'S',
-                    piexif.GPSIFD.GPSLatitude: decimal_to_dms(abs(lat)),
-                    piexif.GPSIFD.GPSLongitudeRef: 'E' if lon >= 0 else 'W',
-                    piexif.GPSIFD.GPSLongitude: decimal_to_dms(abs(lon)),
-                    # Add GPSVersionID if not present
-                    piexif.GPSIFD.GPSVersionID: exif_dict.get("GPS", {}).get(piexif.GPSIFD.GPSVersionID, (2, 3, 0, 0))
-                }
-                
-                exif_dict["GPS"] = gps_ifd
+                exif_dict = set_gps_ifd(exif_dict, lat, lon)
                 
                 # Save with new EXIF
                 piexif.insert(piexif.dump(exif_dict), file_path)
@@ -369,8 +583,50 @@ def update_image_gps(file_path, lat, lon):
 # Directory Scanning Functions
 # ==============================================
 
-def scan_directory_for_media(directory):
-    """Scan directory for media files (images, HEIC, and videos) and collect their metadata"""
+def get_media_info(file_path):
+    """Get datetime, GPS and media type, served from the media index when the file is unchanged."""
+    return media_index.get_or_extract(file_path, extract_media_info)
+
+def get_review_metadata(file_path):
+    """
+    Get the review page metadata of a file (see extract_media_metadata), cached in memory while the file is unchanged.
+
+    Returns:
+        dict: A copy of the metadata the caller may modify
+    """
+    stat = os.stat(file_path)
+    generation = media_write_generations.get(media_generation_key(file_path), 0)
+    with review_metadata_lock:
+        cached = review_metadata_cache.get(file_path)
+        if cached and cached[:2] == (stat.st_size, stat.st_mtime_ns):
+            review_metadata_cache.move_to_end(file_path)
+            metadata = cached[2]
+        else:
+            metadata = None
+    if metadata is None:
+        metadata = extract_media_metadata(file_path)
+        with review_metadata_lock:
+            # A write during the extraction may have kept the stat; do not cache what was read before it
+            if generation == media_write_generations.get(media_generation_key(file_path), 0):
+                review_metadata_cache[file_path] = (stat.st_size, stat.st_mtime_ns, metadata)
+                review_metadata_cache.move_to_end(file_path)
+                while len(review_metadata_cache) > app.config['METADATA_CACHE_SIZE']:
+                    review_metadata_cache.popitem(last=False)
+    return dict(metadata, exif=dict(metadata['exif']))
+
+def forget_review_metadata(file_path):
+    """Drop the cached review metadata of a rewritten file, whose stat may not have changed"""
+    with review_metadata_lock:
+        review_metadata_cache.pop(file_path, None)
+        review_metadata_cache.pop(fix_long_path(file_path), None)
+
+def get_media_infos(file_paths, progress=None):
+    """Get (path, info, error) for many files in path order, extracting index misses in parallel."""
+    return extract_many(file_paths, extract_media_info, index=media_index,
+                        workers=app.config['SCAN_WORKERS'], progress=progress)
+
+def scan_directory_for_media(directory, job=None):
+    """Scan directory for media files (images, HEIC, and videos) and collect their metadata, reporting progress to job"""
     media_files = []
     logger.debug(f"Scanning directory: {directory}")
     
@@ -384,92 +640,164 @@ def scan_directory_for_media(directory):
         all_supported_extensions += heic_extensions
     all_supported_extensions += video_extensions
     
-    for root, _, files in os.walk(directory):
-        for file in files:
-            file_lower = file.lower()
-            if file_lower.endswith(all_supported_extensions):
-                file_path = os.path.join(root, file)
-                
-                # Fix long paths on Windows
-                file_path = fix_long_path(file_path)
-                
-                # Skip unsupported HEIC files if pillow-heif is not available
-                if not HEIF_SUPPORT and file_lower.endswith(heic_extensions):
-                    logger.warning(f"Skipping HEIC/HEIF file {file_path} - pillow-heif not available")
-                    continue
-                
-                try:
-                    dt = get_media_datetime(file_path)
-                    gps = get_media_gps(file_path)
-                    media_type = get_media_type(file_path)
-                    
-                    logger.debug(f"File: {file_path}\n  Type: {media_type}\n  Datetime: {dt}\n  GPS: {gps}")
-                    
-                    media_files.append({
-                        'path': file_path,
-                        'datetime': dt,
-                        'gps': gps,
-                        'media_type': media_type
-                    })
-                except Exception as e:
-                    logger.error(f"Error processing {file_path}: {str(e)}")
+    # Collect paths first (fixing long paths on Windows) so they can be processed in parallel
+    file_paths = collect_media_paths(directory, all_supported_extensions, fix_long_path,
+                                     progress=job.add_discovered if job else None)
+    
+    for file_path, info, error in get_media_infos(file_paths, progress=job.add_processed if job else None):
+        if error:
+            logger.error(f"Error processing {file_path}: {error}")
+            continue
+        
+        dt = info['datetime']
+        gps = info['gps']
+        media_type = info['media_type']
+        
+        logger.debug(f"File: {file_path}\n  Type: {media_type}\n  Datetime: {dt}\n  GPS: {gps}")
+        
+        media_files.append({
+            'path': file_path,
+            'datetime': dt,
+            'gps': gps,
+            'media_type': media_type
+        })
     
     logger.debug(f"Total media files found: {len(media_files)}")
     return media_files
 
-def find_closest_gps(media_files, target_file, time_window_hours=1):
-    """Find closest GPS coordinates within a time window"""
+def find_closest_gps(gps_index, target_file, time_window_hours=1):
+    """Find closest GPS coordinates within a time window using a GpsTimeIndex"""
     target_dt = target_file['datetime']
     if not target_dt:
         logger.debug(f"Target file {target_file['path']} has no datetime, skipping proxy search.")
         return None
-    time_window = timedelta(hours=time_window_hours)
-    closest_gps = None
-    min_time_diff = None
-    for media in media_files:
-        if media['gps'] and media['gps'] != (0.0, 0.0) and media['datetime']:
-            time_diff = abs((target_dt - media['datetime']).total_seconds())
-            if time_diff <= time_window.total_seconds():
-                if min_time_diff is None or time_diff < min_time_diff:
-                    min_time_diff = time_diff
-                    closest_gps = media['gps']
-                    logger.debug(f"Potential proxy: {media['path']} | GPS: {closest_gps} | Time diff: {time_diff/60:.1f} min")
-    if closest_gps:
-        logger.debug(f"Closest GPS for {target_file['path']}: {closest_gps} (diff {min_time_diff/60:.1f} min)")
-    else:
-        logger.debug(f"No proxy GPS found for {target_file['path']}")
-    return closest_gps
+    match = gps_index.nearest(target_dt, timedelta(hours=time_window_hours).total_seconds())
+    if match:
+        closest_gps, time_diff, source_path = match
+        logger.debug(f"Closest GPS for {target_file['path']}: {closest_gps} from {source_path} (diff {time_diff/60:.1f} min)")
+        return closest_gps
+    logger.debug(f"No proxy GPS found for {target_file['path']}")
+    return None
 
-def scan_directory_with_closest(directory, time_frame=1):
-    """Scan directory and find closest GPS for files without GPS"""
-    media_files = scan_directory_for_media(directory)
+# Entry gps_source values that are suggestions awaiting review
+PROXY_SOURCES = ('proxy', 'gpx')
+
+# Most recent directory scan, reused when proxy assignment is re-run with another time frame
+scan_cache = {}
+
+def invalidate_scan_cache():
+    """Drop cached scans after files have been modified"""
+    scan_cache.clear()
+
+def directory_fingerprint(directory):
+    """
+    mtimes of a directory and all its subdirectories.
+
+    Adding, removing or renaming a file (which is also how most tools save
+    metadata edits) bumps the mtime of its directory, so a cached scan whose
+    fingerprint still matches has seen every file.
+    """
+    fingerprint = []
+    for root, _, _ in os.walk(directory):
+        try:
+            fingerprint.append((root, os.stat(root).st_mtime_ns))
+        except OSError:
+            continue
+    return fingerprint
+
+def get_scanned_media(directory, job=None):
+    """
+    Return (media_files, gps_index) for a directory, reusing a recent scan of the same directory.
+
+    The cached media_files are shared between jobs and must not be modified; assign_proxy_gps works on copies.
+    """
+    key = os.path.abspath(directory)
+    cached = scan_cache.get(key)
+    fingerprint = directory_fingerprint(directory)
+    if cached and time.time() - cached['time'] < app.config['SCAN_CACHE_TTL'] and cached['fingerprint'] == fingerprint:
+        logger.debug(f"Reusing scan of {directory} from {time.time() - cached['time']:.0f}s ago")
+        if job:
+            job.add_discovered(len(cached['media_files']))
+            job.add_processed(len(cached['media_files']))
+        return cached['media_files'], cached['gps_index']
+
+    media_files = scan_directory_for_media(directory, job)
+    for m in media_files:
+        m['orig_gps'] = m['gps']
     gps_files = [m for m in media_files if m['gps'] is not None and m['gps'] != (0.0, 0.0)]
     logger.debug(f"Reference files with valid GPS: {len(gps_files)}")
+    gps_index = GpsTimeIndex.from_media(gps_files)
+
+    # Only keep the latest scan to bound memory use
+    scan_cache.clear()
+    scan_cache[key] = {'time': time.time(), 'fingerprint': fingerprint, 'media_files': media_files, 'gps_index': gps_index}
+    return media_files, gps_index
+
+def assign_proxy_gps(media_files, gps_index, time_frame=1):
+    """
+    Assign proxy GPS to files without GPS, recording the time gap and distance as proxy_confidence.
+
+    Returns:
+        list: Copies of the media_files dicts with the assignments; the inputs (possibly a
+              cached scan shared with other jobs) are left untouched
+    """
+    media_files = [dict(m, gps=m['orig_gps']) for m in media_files]
+    targets = []
+    for m in media_files:
+        if (m['gps'] is None or m['gps'] == (0.0, 0.0)) and m['datetime'] is not None:
+            m['gps'] = None
+            targets.append(m)
+
+    # GPS logger tracks take precedence over neighbouring photos
+    if len(gpx_store) and targets:
+        results = gpx_store.interpolate_many([m['datetime'].timestamp() for m in targets],
+                                             timedelta(hours=time_frame).total_seconds())
+        remaining = []
+        for media, result in zip(targets, results):
+            if result:
+                media['gps'], media['proxy_confidence'] = result
+                media['proxy_source'] = 'gpx'
+            else:
+                remaining.append(media)
+        logger.debug(f"Assigned GPX track positions to {len(targets) - len(remaining)} of {len(targets)} files")
+        targets = remaining
 
-    for media in media_files:
-        if (media['gps'] is None or media['gps'] == (0.0, 0.0)) and media['datetime'] is not None:
-            logger.debug(f"Looking for proxy GPS for: {media['path']}")
-            proxy_gps = find_closest_gps(gps_files, media, time_frame)
-            if proxy_gps and proxy_gps != (0.0, 0.0):
-                logger.debug(f"Assigned proxy GPS {proxy_gps} to {media['path']}")
-                media['gps'] = proxy_gps
+    if app.config['PROXY_GPS_MODE'] == 'nearest':
+        for media in targets:
+            media['gps'] = find_closest_gps(gps_index, media, time_frame)
+    else:
+        # Interpolate the whole batch in one sweep over the time index
+        results = gps_index.interpolate_many([m['datetime'].timestamp() for m in targets],
+                                             timedelta(hours=time_frame).total_seconds())
+        for media, result in zip(targets, results):
+            if result:
+                media['gps'], media['proxy_confidence'] = result
+                logger.debug(f"Assigned proxy GPS {media['gps']} to {media['path']} ({media['proxy_confidence']['method']})")
             else:
                 logger.debug(f"No proxy GPS assigned to {media['path']}")
-                media['gps'] = None
+
+    logger.debug(f"Assigned photo proxy GPS to {sum(1 for m in targets if m['gps'])} of {len(targets)} files")
+    return media_files
+
+def scan_directory_with_closest(directory, time_frame=1, job=None):
+    """Scan directory and find closest GPS for files without GPS"""
+    media_files, gps_index = get_scanned_media(directory, job)
+    media_files = assign_proxy_gps(media_files, gps_index, time_frame)
 
     entries = []
     for m in media_files:
-        orig_gps = get_media_gps(m['path'])
+        orig_gps = m['orig_gps']
         if (not orig_gps or orig_gps == (0.0, 0.0)) and m['gps'] and m['gps'] != (0.0, 0.0):
             lat = m['gps'][0]
             lon = m['gps'][1]
-            gps_source = 'proxy'
+            gps_source = m.get('proxy_source', 'proxy')
             entry = {
                 'path': m['path'],
                 'datetime': m['datetime'].isoformat() if m['datetime'] else '',
                 'latitude': lat,
                 'longitude': lon,
-                'gps_source': gps_source
+                'gps_source': gps_source,
+                'proxy_confidence': m.get('proxy_confidence')
             }
             logger.debug(f"Entry for review: {entry}")
             entries.append(entry)
@@ -504,47 +832,36 @@ def scan_directory_for_jpgs_without_gps_entries(root_dir):
         all_supported_extensions += heic_extensions
     all_supported_extensions += video_extensions
     
-    for root, _, files in os.walk(root_dir):
-        for file in files:
-            file_lower = file.lower()
-            if file_lower.endswith(all_supported_extensions):
-                file_path = os.path.join(root, file)
-                
-                # Fix long paths on Windows
-                file_path = fix_long_path(file_path)
-                
-                # Skip unsupported HEIC files if pillow-heif is not available
-                if not HEIF_SUPPORT and file_lower.endswith(heic_extensions):
-                    logger.warning(f"Skipping HEIC/HEIF file {file_path} - pillow-heif not available")
-                    continue
-                
-                try:
-                    # Get media info
-                    dt = get_media_datetime(file_path)
-                    gps = get_media_gps(file_path)
-                    media_type = get_media_type(file_path)
-                    
-                    # Add entries without GPS
-                    if gps is None or gps == (0.0, 0.0):
-                        entries.append({
-                            'path': file_path,
-                            'datetime': dt.isoformat() if dt else '',
-                            'latitude': '',
-                            'longitude': '',
-                            'gps_source': 'scan',
-                            'media_type': media_type
-                        })
-                except Exception as e:
-                    logger.error(f"Error processing {file_path}: {str(e)}")
-                    entries.append({
-                        'path': file_path,
-                        'datetime': '',
-                        'latitude': '',
-                        'longitude': '',
-                        'gps_source': 'scan',
-                        'media_type': 'unknown',
-                        'error': str(e)
-                    })
+    # Collect paths first (fixing long paths on Windows) so they can be processed in parallel
+    file_paths = collect_media_paths(root_dir, all_supported_extensions, fix_long_path)
+    
+    for file_path, info, error in get_media_infos(file_paths):
+        if error:
+            logger.error(f"Error processing {file_path}: {error}")
+            entries.append({
+                'path': file_path,
+                'datetime': '',
+                'latitude': '',
+                'longitude': '',
+                'gps_source': 'scan',
+                'media_type': 'unknown',
+                'error': error
+            })
+            continue
+        
+        dt = info['datetime']
+        gps = info['gps']
+        
+        # Add entries without GPS
+        if gps is None or gps == (0.0, 0.0):
+            entries.append({
+                'path': file_path,
+                'datetime': dt.isoformat() if dt else '',
+                'latitude': '',
+                'longitude': '',
+                'gps_source': 'scan',
+                'media_type': info['media_type']
+            })
     
     logger.info(f"Found {len(entries)} media files without GPS data in {root_dir}")
     return entries
@@ -557,243 +874,12 @@ def get_media_datetime(file_path):
     """Extract datetime from media file (image, HEIC, or video)."""
     # Fix long path issue on Windows
     file_path = fix_long_path(file_path)
-    
-    # Check if file exists
-    if not os.path.exists(file_path):
-        logger.error(f"File not found when getting datetime: {file_path}")
-        return None
-    
-    file_lower = file_path.lower()
-        
-    # Handle HEIC files specifically with pillow-heif if available
-    if file_lower.endswith(('.heic', '.heif')) and HEIF_SUPPORT:
-        try:
-            # pillow-heif allows opening HEIC files directly via PIL
-            img = Image.open(file_path)
-            exif_data = img.getexif()
-            
-            # Get DateTimeOriginal (tag 36867)
-            if 36867 in exif_data:
-                dt_str = exif_data[36867]
-                return datetime.strptime(dt_str, '%Y:%m:%d %H:%M:%S').replace(tzinfo=pytz.UTC)
-                
-            logger.debug(f"No DateTimeOriginal found in HEIC/HEIF file: {file_path}")
-            return None
-        except Exception as e:
-            logger.error(f"Error processing HEIC/HEIF file {file_path}: {str(e)}")
-    
-    # For regular images
-    try:
-        if file_lower.endswith(('.jpg', '.jpeg', '.png', '.tiff')):
-            with open(file_path, 'rb') as f:
-                tags = exifread.process_file(f, details=False)
-                if 'EXIF DateTimeOriginal' in tags:
-                    dt_str = str(tags['EXIF DateTimeOriginal'])
-                    return datetime.strptime(dt_str, '%Y:%m:%d %H:%M:%S').replace(tzinfo=pytz.UTC)
-                else:
-                    logger.debug(f"No DateTimeOriginal found in {file_path}")
-    except Exception as e:
-        logger.error(f"Error extracting datetime from image {file_path}: {str(e)}")
-    
-    # For videos
-    try:
-        if file_lower.endswith(('.mp4', '.mov', '.avi', '.mkv')):
-            # Use FFmpeg to extract metadata, including creation time
-            ffmpeg_command = [
-                'ffmpeg', '-i', file_path, '-f', 'ffmetadata', '-']
-            result = subprocess.run(ffmpeg_command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-            metadata = result.stdout
-            stderr = result.stderr
-
-            # Look for creation_time in the metadata output
-            creation_time = None
-            for line in metadata.splitlines():
-                if 'creation_time' in line.lower():
-                    creation_time = line.split('=')[1].strip()
-                    break
-                    
-            # If not found in stdout, check stderr (ffmpeg often outputs metadata there)
-            if not creation_time:
-                for line in stderr.splitlines():
-                    if 'creation_time' in line.lower():
-                        parts = line.split('creation_time')
-                        if len(parts) > 1:
-                            # Fix: More carefully extract the timestamp
-                            time_part = parts[1].strip()
-                            if time_part.startswith(':'):
-                                time_part = time_part[1:].strip()
-                            creation_time = time_part.split(',')[0].strip()
-                            break
-
-            if creation_time:
-                # Handle multiple date formats
-                import re
-                
-                # Method 1: ISO 8601 format with microseconds and Z timezone
-                # Example: 2025-06-12T08:42:06.000000Z
-                try:
-                    pattern = r'^(\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2})\.(\d+)Z$'
-                    match = re.match(pattern, creation_time)
-                    if match:
-                        base_time = match.group(1)  # YYYY-MM-DDThh:mm:ss
-                        dt = datetime.strptime(base_time, '%Y-%m-%dT%H:%M:%S')
-                        dt = dt.replace(tzinfo=datetime.timezone.utc)
-                        return dt
-                except Exception:
-                    pass
-
-                # Method 2: Use regex to extract just the basic date and time components with T
-                try:
-                    pattern = r'^(\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2})'
-                    match = re.match(pattern, creation_time)
-                    if match:
-                        # Found YYYY-MM-DDThh:mm:ss format
-                        base_time = match.group(1)
-                        dt = datetime.strptime(base_time, '%Y-%m-%dT%H:%M:%S')
-                        dt = dt.replace(tzinfo=datetime.timezone.utc)
-                        return dt
-                except Exception:
-                    pass
-                
-                # Method 3: Try standard date format without 'T'
-                try:
-                    pattern = r'^(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})'
-                    match = re.match(pattern, creation_time)
-                    if match:
-                        time_str = match.group(1)
-                        dt = datetime.strptime(time_str, '%Y-%m-%d %H:%M:%S')
-                        dt = dt.replace(tzinfo=datetime.timezone.utc)
-                        return dt
-                except Exception:
-                    pass
-                
-                # Method 4: Try directly removing Z and microseconds
-                if 'Z' in creation_time:
-                    try:
-                        # Replace Z with UTC marker
-                        simple_time = creation_time.replace('Z', '+00:00')
-                        
-                        # Remove microseconds if present
-                        if '.' in simple_time:
-                            simple_time = simple_time.split('.')[0] + '+00:00'
-                        
-                        dt = datetime.fromisoformat(simple_time)
-                        return dt
-                    except Exception:
-                        pass
-                
-                # Method 5: Try direct parsing
-                try:
-                    dt = datetime.fromisoformat(creation_time)
-                    return dt
-                except Exception:
-                    pass
-                
-                # Last effort - log the failure and return None
-                logger.error(f"Could not parse creation_time: {creation_time}")
-                return None
-            else:
-                logger.debug(f"No creation_time found in video metadata for {file_path}")
-    except Exception as e:
-        logger.error(f"Error extracting datetime from video {file_path}: {str(e)}")
-
-    logger.debug(f"Could not extract datetime from {file_path}")
-    return None
+    return extract_media_metadata(file_path)['datetime']
 
 def get_media_gps(file_path):
     """Extract GPS coordinates from media file if available."""
-    try:
-        # Check if it's a video file (MOV, MP4, etc.)
-        if file_path.lower().endswith(('.mov', '.mp4', '.avi', '.mkv')): 
-            # Use FFmpeg to extract metadata, including GPS coordinates
-            ffmpeg_command = [
-                'ffmpeg', '-i', file_path, '-f', 'ffmetadata', '-']
-            result = subprocess.run(ffmpeg_command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-            metadata = result.stdout
-
-            # Check for errors
-            if "error" in result.stderr.lower():
-                logger.error(f"Error with file {file_path}: {result.stderr}")
-                return None
-
-            gps_data = None
-            # Look for GPS info in the metadata output
-            for line in metadata.splitlines():
-                if 'location' in line.lower():  # Check for the location tag in the metadata
-                    gps_data = line.split('=')[1].strip()
-                    break
-
-            if gps_data:
-                # Parse the location string if found (e.g., +38.7695-009.1297)
-                loc = gps_data.strip('/')
-                if loc[0] not in ('+', '-'):
-                    return None  # Invalid location format
-
-                split_indexes = [i for i in range(1, len(loc)) if loc[i] in ('+', '-') and loc[i-1] not in ('E', 'W', 'N', 'S')]
-
-                if len(split_indexes) == 1:
-                    # Extract latitude and longitude from the two parts
-                    lat = float(loc[:split_indexes[0]])
-                    lon = float(loc[split_indexes[0]:])
-                    if is_valid_gps((lat, lon)):
-                        return (lat, lon)
-                    else:
-                        logger.warning(f"Invalid GPS coordinates skipped: {lat}, {lon}")
-                        return None
-                else:
-                    logger.warning(f"Could not parse GPS coordinates: {loc}")
-                    return None
-
-        # Default behavior for other files
-        else:
-            # For image files (e.g., .jpg, .png), continue using EXIF
-            with open(file_path, 'rb') as f:
-                tags = exifread.process_file(f, details=False)
-                
-                # Check if GPS coordinates exist
-                if 'GPS GPSLatitude' in tags and 'GPS GPSLongitude' in tags:
-                    lat = tags['GPS GPSLatitude']
-                    lon = tags['GPS GPSLongitude']
-                    
-                    # Convert to decimal degrees
-                    lat = float(lat.values[0]) + float(lat.values[1])/60 + float(lat.values[2])/3600
-                    lon = float(lon.values[0]) + float(lon.values[1])/60 + float(lon.values[2])/3600
-
-                    # Handle GPS reference directions if available
-                    if 'GPS GPSLatitudeRef' in tags and 'GPS GPSLongitudeRef' in tags:
-                        lat_ref = tags['GPS GPSLatitudeRef']
-                        lon_ref = tags['GPS GPSLongitudeRef']
-                        
-                        if str(lat_ref) == 'S':
-                            lat = -lat
-                        if str(lon_ref) == 'W':
-                            lon = -lon
-                    else:
-                        # If ref tags are missing, infer them from coordinate values
-                        # For images with missing ref tags but valid coordinates
-                        logger.info(f"Missing GPS ref tags in {file_path}, inferring from coordinate signs")
-                        
-                        # In the Northern and Eastern hemispheres, coordinates are typically positive
-                        # In the Southern and Western hemispheres, coordinates are typically negative
-                        # We can't infer accurately without the ref tags, but we'll return the coordinates as-is
-                        # Most software uses positive values for N/E and negative for S/W
-                        
-                    if is_valid_gps((lat, lon)):
-                        return (lat, lon)
-                    else:
-                        logger.warning(f"Invalid GPS coordinates skipped: {lat}, {lon}")
-                        return None
-
-    except Exception as e:
-        logger.error(f"Error extracting GPS: {e}")
-    return None
-
-def is_valid_gps(gps_coord):
-    """Check if GPS coordinates are valid and not (0,0)."""
-    if not gps_coord:
-        return False
-    lat, lon = gps_coord
-    return (-90 <= lat <= 90) and (-180 <= lon <= 180) and (lat, lon) != (0.0, 0.0)
+    file_path = fix_long_path(file_path)
+    return extract_media_metadata(file_path)['gps']
 
 def get_exif_data(image_path):
     """Extract EXIF data from an image file."""
@@ -863,6 +949,24 @@ class Reviewer:
         self.csv_path = csv_path  # Only set for CSV workflow
         self.current_index = 0
         self.changes_made = 0
+        # Indexes of entries whose coordinates have not been written to their file yet
+        self.dirty = {i for i, entry in enumerate(entries) if self._needs_write(entry)}
+        # Identifies this set of entries to API clients; version counts coordinate changes since it was loaded
+        self.token = uuid.uuid4().hex[:12]
+        self.version = 0
+        self._changed_at = {}  # entry index -> version of its last change
+        self._gps_points = (None, [])  # (version, points) of the last gps_points() call
+        self._index_by_path = None  # absolute path -> entry index, built on first use
+        # Entries whose coordinates are proxies; kept up to date by _set_source so pages need not scan the entries
+        self.proxy_count = sum(1 for entry in entries if entry.get('gps_source') in PROXY_SOURCES)
+        # Guards version and _changed_at: the save job and the write-behind worker change entries too
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _needs_write(entry):
+        """Entries with coordinates that did not come from the file itself (proxies, CSV values)"""
+        return bool(entry.get('latitude') and entry.get('longitude')) and \
+            entry.get('gps_source') not in ('original', 'exif')
 
     @classmethod
     def from_csv(cls, csv_path):
@@ -888,24 +992,19 @@ class Reviewer:
                     'gps_source': gps_source or 'manual'
                 }
 
-                if gps_source == 'proxy':
+                if gps_source in PROXY_SOURCES:
                     # Use CSV values for proxy
                     entry['latitude'] = lat
                     entry['longitude'] = lon
-                    entry['gps_source'] = 'proxy'
+                    entry['gps_source'] = gps_source
                 elif gps_source == 'original' or gps_source == 'exif':
                     # Try to get from EXIF, fallback to CSV if not found
                     if os.path.exists(path):
-                        exif_info = get_exif_data(path)
-                        if exif_info and 'GPSInfo' in exif_info:
-                            gps_info = exif_info['GPSInfo']
-                            if 'GPSLatitude' in gps_info and 'GPSLongitude' in gps_info:
-                                entry['latitude'] = str(gps_info['GPSLatitude'])
-                                entry['longitude'] = str(gps_info['GPSLongitude'])
-                                entry['gps_source'] = 'exif'
-                            else:
-                                entry['latitude'] = lat
-                                entry['longitude'] = lon
+                        gps = get_media_info(path)['gps']
+                        if gps:
+                            entry['latitude'] = str(gps[0])
+                            entry['longitude'] = str(gps[1])
+                            entry['gps_source'] = 'exif'
                         else:
                             entry['latitude'] = lat
                             entry['longitude'] = lon
@@ -931,6 +1030,92 @@ class Reviewer:
             return self.entries[self.current_index]
         return None
 
+    @property
+    def has_proxy_gps(self):
+        return self.proxy_count > 0
+
+    def _set_source(self, entry, source):
+        """Set the gps_source of an entry, keeping proxy_count in step"""
+        self.proxy_count += (source in PROXY_SOURCES) - (entry.get('gps_source') in PROXY_SOURCES)
+        entry['gps_source'] = source
+
+    def _mark_changed(self, index):
+        """Record that the coordinates of an entry changed, so API clients can fetch just the changes"""
+        with self._lock:
+            self.version += 1
+            self._changed_at[index] = self.version
+
+    def changed_since(self, version):
+        """Indexes of the entries changed after a version, in index order"""
+        with self._lock:
+            changed = list(self._changed_at.items())
+        return sorted(i for i, at in changed if at > version)
+
+    def index_of(self, file_path):
+        """Index of the entry of a file, or None if it is not under review"""
+        if self._index_by_path is None:
+            self._index_by_path = {os.path.abspath(entry['path']): i for i, entry in enumerate(self.entries)}
+        return self._index_by_path.get(os.path.abspath(file_path))
+
+    def write_finished(self, file_path):
+        """Bump the version after a queued write of an entry's file, whose pending state changed"""
+        index = self.index_of(file_path)
+        if index is not None:
+            self._mark_changed(index)
+
+    def pending_indexes(self):
+        """
+        Indexes of the entries whose coordinates are not in their file yet: unsaved
+        proxy and CSV values, and review page edits still in the write-behind queue.
+        """
+        pending = set(self.dirty)
+        for path in write_queue.queued_paths():
+            index = self.index_of(path)
+            if index is not None:
+                pending.add(index)
+        return pending
+
+    @staticmethod
+    def gps_point(entry):
+        """[lat, lon] of an entry for the heatmap, or None if it has no usable coordinates"""
+        try:
+            lat = float(entry.get('latitude', ''))
+            lon = float(entry.get('longitude', ''))
+        except (TypeError, ValueError):
+            return None
+        return [lat, lon] if lat != 0.0 or lon != 0.0 else None
+
+    def gps_points(self):
+        """Heatmap point of every entry (None where there is none) by index, rebuilt only after changes"""
+        version, points = self._gps_points
+        if version != self.version:
+            points = [self.gps_point(entry) for entry in self.entries]
+            self._gps_points = (self.version, points)
+        return points
+
+    def filter_indexes(self, name):
+        """
+        Indexes of the entries matching an API filter.
+
+        Args:
+            name (str): 'all', 'with_gps', 'without_gps', 'proxy' or 'pending' (not written to the file yet)
+
+        Returns:
+            list: Matching indexes, or None for an unknown filter
+        """
+        if name == 'all':
+            return list(range(len(self.entries)))
+        if name == 'pending':
+            return sorted(self.pending_indexes())
+        points = self.gps_points()
+        if name == 'with_gps':
+            return [i for i, point in enumerate(points) if point]
+        if name == 'without_gps':
+            return [i for i, point in enumerate(points) if not point]
+        if name == 'proxy':
+            return [i for i, entry in enumerate(self.entries) if entry.get('gps_source') in PROXY_SOURCES]
+        return None
+
     def update_gps(self, lat, lon):
         try:
             lat = float(lat)
@@ -946,15 +1131,35 @@ class Reviewer:
         if not os.path.exists(file_path):
             logger.error(f"File not found: {file_path}")
             return False
+        if app.config['WRITE_BEHIND']:
+            # Record the decision now; the queue worker backs up and writes the file
+            write_queue.enqueue(file_path, lat, lon, entry.get('media_type') or get_write_media_type(file_path))
+            entry['latitude'] = lat
+            entry['longitude'] = lon
+            self._set_source(entry, 'manual')
+            self.dirty.discard(self.current_index)
+            self._mark_changed(self.current_index)
+            self.changes_made += 1
+            logger.info(f"Queued GPS update for {file_path}")
+            return True
         try:
-            backup_path = file_path + '.bak'
-            if not os.path.exists(backup_path):
-                shutil.copy2(file_path, backup_path)
-                logger.debug(f"Created backup of {file_path} to {backup_path}")
+            if gps_unchanged(file_path, lat, lon):
+                logger.info(f"GPS of {file_path} already matches, nothing to write")
+                entry['latitude'] = lat
+                entry['longitude'] = lon
+                self._set_source(entry, 'manual')
+                self.dirty.discard(self.current_index)
+                self._mark_changed(self.current_index)
+                return True
+            if not backup_journal.backup(file_path, entry.get('media_type') or get_write_media_type(file_path)):
+                return False
             if update_image_gps(file_path, lat, lon):
+                invalidate_scan_cache()
                 entry['latitude'] = lat
                 entry['longitude'] = lon
-                entry['gps_source'] = 'manual'
+                self._set_source(entry, 'manual')
+                self.dirty.discard(self.current_index)
+                self._mark_changed(self.current_index)
                 self.changes_made += 1
                 logger.info(f"GPS coordinates updated for {file_path}")
                 return True
@@ -964,14 +1169,42 @@ class Reviewer:
             logger.error(f"Error updating GPS: {e}")
             return False
 
-    def save_all(self):
-        # Only save CSV if csv_path is set (CSV workflow)
+    def undo(self):
+        """Restore the original metadata of the current entry's file"""
+        entry = self.get_current_entry()
+        if not entry or not restore_original(entry['path']):
+            return False
+        gps = get_media_info(entry['path'])['gps']
+        entry['latitude'] = gps[0] if gps else ''
+        entry['longitude'] = gps[1] if gps else ''
+        self._set_source(entry, 'original' if gps else 'scan')
+        self.dirty.discard(self.current_index)
+        self._mark_changed(self.current_index)
+        logger.info(f"Undid GPS changes of {entry['path']}")
+        return True
+
+    def save_all(self, progress=None):
+        """
+        Write the GPS of every changed entry to its file and rewrite the CSV (CSV workflow only).
+
+        Only dirty entries (proxies, CSV values) are considered, and of those only
+        files whose current GPS differs by more than GPS_EPSILON are backed up and
+        written; the rest count as successful without touching the file.
+
+        Args:
+            progress (callable): Optional progress(path, ok, bytes_written) called after each entry
+
+        Returns:
+            dict: Counts of successful and failed entries with the failed paths
+        """
         logger.info("Starting bulk save operation...")
         results = {
             'total': len(self.entries),
             'success': 0,
             'failed': 0,
             'failed_paths': [],
+            'written': 0,
+            'unchanged': 0,
             'current_index': self.current_index,
             'total_entries': len(self.entries)
         }
@@ -986,28 +1219,65 @@ class Reviewer:
                     shutil.copy2(self.csv_path, backup_path)
                     logger.debug(f"Created backup of CSV file: {backup_path}")
             
-            for entry in self.entries:
+            tasks = []
+            coordinates = {}
+            failed = []
+            for i, entry in enumerate(self.entries):
                 try:
-                    file_path = entry['path']
-                    if entry['latitude'] and entry['longitude']:
-                        img_backup = file_path + '.bak'
-                        if not os.path.exists(img_backup):
-                            shutil.copy2(file_path, img_backup)
-                            logger.debug(f"Created backup of image: {img_backup}")
-                        lat = float(entry['latitude'])
-                        lon = float(entry['longitude'])
-                        if update_image_gps(file_path, lat, lon):
-                            results['success'] += 1
-                        else:
-                            results['failed'] += 1
-                            results['failed_paths'].append(entry['path'])
-                            logger.warning(f"Failed to update GPS for: {file_path}")
+                    if i in self.dirty and entry['latitude'] and entry['longitude']:
+                        coordinates[i] = (float(entry['latitude']), float(entry['longitude']))
+                        tasks.append((i, entry['path'], entry.get('media_type') or get_write_media_type(entry['path'])))
                     else:
                         results['success'] += 1
+                        if progress:
+                            progress(entry['path'], True, 0)
+                except JobCancelled:
+                    raise
                 except Exception as e:
                     logger.error(f"Error processing {entry['path']}: {str(e)}")
-                    results['failed'] += 1
-                    results['failed_paths'].append(entry['path'])
+                    failed.append(i)
+                    if progress:
+                        progress(entry['path'], False, 0)
+
+            media_types = {i: media_type for i, _, media_type in tasks}
+
+            def write(i, file_path):
+                lat, lon = coordinates[i]
+                if gps_unchanged(file_path, lat, lon):
+                    return True, None
+                if not backup_journal.backup(file_path, media_types[i]):
+                    return False, 0
+                if not update_image_gps(file_path, lat, lon):
+                    logger.warning(f"Failed to update GPS for: {file_path}")
+                    return False, 0
+                return True, os.path.getsize(file_path)
+
+            def report(i, ok, bytes_written):
+                if progress:
+                    progress(self.entries[i]['path'], ok, bytes_written or 0)
+
+            written = write_many(tasks, write,
+                                 workers=app.config['SAVE_WORKERS'],
+                                 video_workers=app.config['SAVE_VIDEO_WORKERS'],
+                                 progress=report)
+
+            # Aggregate in entry order so the results match a sequential save
+            for i, _, _ in tasks:
+                ok, bytes_written, _ = written[i]
+                if ok:
+                    results['success'] += 1
+                    # bytes_written is None when the file already held these coordinates
+                    results['unchanged' if bytes_written is None else 'written'] += 1
+                    self.dirty.discard(i)
+                    self._mark_changed(i)
+                else:
+                    failed.append(i)
+            results['failed'] = len(failed)
+            results['failed_paths'] = [self.entries[i]['path'] for i in sorted(failed)]
+            logger.info(f"Wrote {results['written']} files, {results['unchanged']} already up to date, "
+                        f"{len(self.entries) - len(tasks)} not changed")
+            if results['written']:
+                invalidate_scan_cache()
             
             if self.csv_path:
                 with open(self.csv_path, 'w', newline='', encoding='utf-8') as f:
@@ -1026,6 +1296,11 @@ class Reviewer:
             
             logger.info(f"Bulk save completed. Success: {results['success']}, Failed: {results['failed']}")
             return results
+        except JobCancelled:
+            # Files written so far keep their backups; the CSV is left as it was
+            invalidate_scan_cache()
+            logger.info(f"Bulk save cancelled after {results['success'] + results['failed']} entries")
+            raise
         except Exception as e:
             logger.error(f"Critical error during bulk save: {str(e)}", exc_info=True)
             if self.csv_path and os.path.exists(self.csv_path + '.bak'):
@@ -1041,9 +1316,57 @@ def allowed_file(filename):
     return '.' in filename and \
            filename.rsplit('.', 1)[1].lower() in app.config['ALLOWED_EXTENSIONS']
 
+def warm_review_entry(file_path):
+    """
+    Do the slow work of showing a review entry ahead of time: parse its metadata and
+    render the preview (or the HEIC conversion, or the video thumbnail) the page will request.
+    """
+    file_path = fix_long_path(file_path)
+    if not os.path.isfile(file_path):
+        return
+    media_type = get_review_metadata(file_path)['media_type']
+    if media_type == 'video':
+        get_video_thumbnail(file_path)
+    elif media_type == 'image' or (media_type == 'heic' and HEIF_SUPPORT):
+        width = preview_requests['width']
+        preview_cache.get_or_create(file_path, lambda out: render_preview(file_path, out, width),
+                                    variant=f"w{width}")
+
 # Global reviewer instance
 reviewer = None
 
+# Original metadata of every file before its GPS was first rewritten
+backup_journal = get_backup_journal()
+
+# Review page updates waiting to be written; always drained, so writes queued before a restart still land
+def queued_write_done(file_path, ok):
+    """Let API clients see that a queued write landed (or failed) through a new reviewer version"""
+    active = reviewer
+    if active:
+        active.write_finished(file_path)
+
+write_queue = WriteQueue(write_gps_update, settle_delay=app.config['WRITE_BEHIND_DELAY'], done=queued_write_done)
+
+@app.before_request
+def start_write_queue():
+    """
+    Start the write-behind worker on the first request.
+
+    Starting it at import would also run one in the parent process of the debug
+    reloader, which imports this module but never serves requests.
+    """
+    write_queue.start()
+
+# Warms the entries around the current one so moving to the next or previous entry is fast
+prefetcher = Prefetcher(warm_review_entry, workers=app.config['PREFETCH_WORKERS'],
+                        ahead=app.config['PREFETCH_AHEAD'], behind=app.config['PREFETCH_BEHIND'])
+
+# Only one bulk save runs at a time
+save_job_lock = threading.Lock()
+# Seconds between heartbeats on an idle event stream, and minimum spacing of progress events
+JOB_EVENT_HEARTBEAT = 15
+JOB_EVENT_MIN_INTERVAL = 0.2
+
 @app.route('/', methods=['GET', 'POST'])
 def index():
     global reviewer
@@ -1080,7 +1403,7 @@ def index():
                 # Set session variables for tracking source type
                 session['source_type'] = 'csv'
                 session['find_closest'] = False
-                session['has_proxy_gps'] = any(entry.get('gps_source') == 'proxy' for entry in reviewer.entries)
+                session['has_proxy_gps'] = reviewer.has_proxy_gps
                 logger.info(f"Starting review with {len(reviewer.entries)} entries")
                 return redirect(url_for('review'))
             except Exception as e:
@@ -1107,7 +1430,10 @@ def review():
             if lat and lon:
                 try:
                     if reviewer.update_gps(lat, lon):
-                        flash('GPS coordinates updated successfully!', 'success')
+                        if app.config['WRITE_BEHIND']:
+                            flash('GPS update queued, it is written in the background.', 'success')
+                        else:
+                            flash('GPS coordinates updated successfully!', 'success')
                         # Move to next entry after successful update
                         reviewer.current_index = min(reviewer.current_index + 1, len(reviewer.entries) - 1)
                     else:
@@ -1115,6 +1441,12 @@ def review():
                 except ValueError as e:
                     flash(f'Invalid coordinates: {str(e)}', 'danger')
         
+        elif action == 'undo':
+            if reviewer.undo():
+                flash('Original metadata restored.', 'success')
+            else:
+                flash('Could not restore the original metadata', 'danger')
+
         elif action == 'next':
             reviewer.current_index = min(reviewer.current_index + 1, len(reviewer.entries) - 1)
         
@@ -1123,10 +1455,8 @@ def review():
         
         elif action == 'save':
             try:
-                results = reviewer.save_all()
-                flash(f'Saved {results["success"]} of {results["total"]} files successfully!', 'success')
-                if results['failed'] > 0:
-                    flash(f'Failed to save {results["failed"]} files', 'warning')
+                start_save_job()
+                flash('Saving all changes in the background.', 'info')
             except Exception as e:
                 flash(f'Error saving changes: {str(e)}', 'danger')
             
@@ -1146,9 +1476,14 @@ def review():
         flash(f'File not found: {file_path}', 'danger')
         return redirect(url_for('index'))
     
-    # Determine media type (image, HEIC, or video)
+    # Start warming the neighbouring entries while this one is rendered
+    prefetcher.schedule([reviewer.entries[i]['path']
+                         for i in prefetcher.neighbours(len(reviewer.entries), reviewer.current_index)])
+
+    # Read media type, date taken and display EXIF in a single pass (cached while the file is unchanged)
+    metadata = get_review_metadata(file_path)
     if 'media_type' not in entry:
-        entry['media_type'] = get_media_type(file_path)
+        entry['media_type'] = metadata['media_type']
     
     media_type = entry['media_type']
     thumbnail_path = None
@@ -1160,120 +1495,33 @@ def review():
             logger.error(f"Failed to generate thumbnail for video: {file_path}")
             # We'll still show the video with a default thumbnail or player
     
-    # Extract EXIF info (different approach based on media type)
-    exif_info = {}
-    date_taken = "Unknown"
-    
-    if media_type == 'image':
-        # Standard image handling
-        exif_info = get_exif_data(file_path) or {}
-        date_taken = exif_info.get('DateTimeOriginal', 'Unknown')
-    elif media_type == 'heic' and HEIF_SUPPORT:
-        # HEIC handling using pillow-heif
-        try:
-            img = Image.open(file_path)
-            exif_data = img.getexif()
-            # Extract basic EXIF info
-            for tag_id in exif_data:
-                tag_name = TAGS.get(tag_id, tag_id)
-                exif_info[tag_name] = exif_data[tag_id]
-            # Get date taken
-            if 36867 in exif_data:  # DateTimeOriginal tag
-                date_taken = exif_data[36867]
-        except Exception as e:
-            logger.error(f"Error extracting HEIC EXIF data: {e}")
-    elif media_type == 'video':
-        # Extract video metadata using ffmpeg
-        try:
-            ffmpeg_command = [
-                'ffmpeg', '-i', file_path, '-f', 'ffmetadata', '-']
-            result = subprocess.run(ffmpeg_command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-            metadata = result.stdout
-            stderr = result.stderr
-            
-            # Parse metadata
-            for line in metadata.splitlines():
-                if '=' in line:
-                    key, value = line.split('=', 1)
-                    exif_info[key.strip()] = value.strip()
-            
-            # Get creation time from metadata
-            if 'creation_time' in exif_info:
-                try:
-                    creation_time = exif_info['creation_time']
-                    # Handle ISO format (2023-05-30T12:34:56.000000Z)
-                    if 'Z' in creation_time:
-                        # Handle ISO format with Z (UTC timezone marker)
-                        clean_time = creation_time.replace('Z', '+00:00')
-                        # Format microseconds if needed
-                        if '.' in clean_time:
-                            parts = clean_time.split('.')
-                            if len(parts) == 2:
-                                base_time = parts[0]
-                                micro_part = parts[1]
-                                # If microseconds part is too long, truncate it
-                                tz_split = micro_part.split('+')
-                                if len(tz_split[0]) > 6:
-                                    micro_part = tz_split[0][:6]
-                                    if len(tz_split) > 1:
-                                        micro_part += '+' + tz_split[1]
-                                    clean_time = base_time + '.' + micro_part
-                        date_taken = clean_time
-                    else:
-                        date_taken = creation_time
-                except Exception as e:
-                    logger.error(f"Error formatting creation_time '{creation_time}': {str(e)}")
-                    date_taken = "Unknown (format error)"
-            else:
-                # Check stderr for creation time (ffmpeg often outputs metadata there)
-                for line in stderr.splitlines():
-                    if 'creation_time' in line.lower():
-                        parts = line.split('creation_time')
-                        if len(parts) > 1:
-                            date_taken = parts[1].strip(':').strip().split(',')[0].strip()
-                            break
-        except Exception as e:
-            logger.error(f"Error extracting video metadata: {e}")
+    exif_info = metadata['exif']
+    date_taken = metadata['date_taken'] or "Unknown"
     
     # Prepare GPS data for display
-    gps_info = exif_info.get('GPSInfo', {})
-    
-    # Check if gps_info is a dictionary (it might be an int or another type in some cases)
-    if not isinstance(gps_info, dict):
-        logger.warning(f"GPS info is not a dictionary but {type(gps_info).__name__}: {gps_info}")
-        gps_info = {}
-        
-    latitude = gps_info.get('GPSLatitude', 'Unknown')
-    longitude = gps_info.get('GPSLongitude', 'Unknown')
+    gps = metadata['gps']
+    exif_info['GPSLatitude'] = gps[0] if gps else 'Unknown'
+    exif_info['GPSLongitude'] = gps[1] if gps else 'Unknown'
+    latitude = exif_info['GPSLatitude']
+    longitude = exif_info['GPSLongitude']
     
-    # Convert to decimal if needed
-    if isinstance(latitude, tuple):
-        latitude = rational_to_decimal(latitude)
-    if isinstance(longitude, tuple):
-        longitude = rational_to_decimal(longitude)
-    
-    # Update exif_info with processed values
-    exif_info['GPSLatitude'] = latitude
-    exif_info['GPSLongitude'] = longitude
-    
-    # Prepare GPS points for heatmap (list of [lat, lon])
-    gps_points = []
-    for e in reviewer.entries:
-        try:
-            lat = float(e.get('latitude', ''))
-            lon = float(e.get('longitude', ''))
-            if lat != 0.0 or lon != 0.0:
-                gps_points.append([lat, lon])
-        except Exception:
-            continue
-            
     # Get source type and proxy GPS status from session or determine from entries
     source_type = session.get('source_type', 'unknown')
     use_proxy = session.get('find_closest', False)
-    has_proxy_gps = any(e.get('gps_source') == 'proxy' for e in reviewer.entries)
+    has_proxy_gps = reviewer.has_proxy_gps
+    save_job = job_manager.active('save')
+    queued_write = write_queue.get(file_path)
     
     # Create a file URL for direct access
     file_url = f"file:///{file_path.replace(os.sep, '/')}"
+
+    # Let the browser fetch the next entry's preview, at the width it picked last, while this one is reviewed
+    next_preview_url = None
+    if reviewer.current_index + 1 < len(reviewer.entries):
+        next_path = os.path.abspath(reviewer.entries[reviewer.current_index + 1]['path'])
+        next_type = get_media_type(next_path)
+        if next_type == 'image' or (next_type == 'heic' and HEIF_SUPPORT):
+            next_preview_url = url_for('serve_preview', filepath=next_path, w=preview_requests['width'])
     
     return render_template('review.html',
                          image_url=os.path.basename(file_path),
@@ -1289,34 +1537,59 @@ def review():
                          longitude=longitude,
                          file_location=os.path.abspath(file_path),
                          exif_info=exif_info,
-                         all_entries=reviewer.entries,
-                         gps_points=gps_points,
                          source_type=source_type,
                          use_proxy=use_proxy,
-                         has_proxy_gps=has_proxy_gps)
+                         has_proxy_gps=has_proxy_gps,
+                         preview_widths=app.config['PREVIEW_WIDTHS'],
+                         next_preview_url=next_preview_url,
+                         save_job_id=save_job.id if save_job else None,
+                         queued_write=queued_write,
+                         has_backup=backup_journal.has_backup(file_path) or os.path.exists(file_path + '.bak') or queued_write is not None)
+
+def run_save_job(job, target):
+    """Background bulk save: write every entry and report per-file progress"""
+    # Let queued review page updates (including failed ones) land first so the save covers them
+    write_queue.retry()
+    while not write_queue.wait_idle(timeout=1):
+        if job.cancel_requested:
+            raise JobCancelled()
+    job.add_discovered(len(target.entries))
+
+    def progress(path, ok, bytes_written):
+        job.add_processed(1, failed=0 if ok else 1, bytes_written=bytes_written, message=path)
+
+    results = target.save_all(progress=progress)
+    if 'error' in results:
+        raise RuntimeError(results['error'])
+    return results
+
+def start_save_job():
+    """Start a bulk save of the current reviewer, or return the save already running"""
+    with save_job_lock:
+        job = job_manager.active('save')
+        if job is None:
+            job = job_manager.submit('save', run_save_job, reviewer,
+                                     description=f"Saving {len(reviewer.entries)} entries")
+        return job
 
 @app.route('/save_all', methods=['POST'])
 def save_all():
+    """Start saving all entries in a background job; progress is streamed from /jobs/<id>/events"""
     global reviewer
     if not reviewer:
         logger.warning("Save attempt without initialized reviewer")
         return jsonify({'status': 'error', 'message': 'No reviewer initialized'})
 
     try:
-        results = reviewer.save_all()
-        changes_made = results['success']  # Assuming 'success' represents the number of changes made
-        current_index = results['current_index']  # The index of the current image being saved
-        total_entries = results['total_entries']  # The total number of images to save
-
-        logger.info(f"Saved {results['success']} / {results['total']} entries.")
+        job = start_save_job()
         return jsonify({
-            'status': 'success',
-            'message': f"Saved {results['success']} of {results['total']} entries.",
-            'changes_made': changes_made,
-            'current_index': current_index,
-            'total_entries': total_entries,
-            'details': results
-        })
+            'status': 'started',
+            'job_id': job.id,
+            'events_url': url_for('job_events', job_id=job.id),
+            'status_url': url_for('job_status', job_id=job.id),
+            'cancel_url': url_for('cancel_job', job_id=job.id),
+            'total_entries': len(reviewer.entries)
+        }), 202
     except Exception as e:
         logger.error(f"Save failed: {e}", exc_info=True)
         return jsonify({
@@ -1324,6 +1597,147 @@ def save_all():
             'message': f"Save failed: {str(e)}"
         })
 
+@app.route('/backups')
+def list_backups():
+    """List files with journaled original metadata"""
+    return jsonify({'status': 'success', 'backups': backup_journal.list_backups()})
+
+@app.route('/backups/restore', methods=['POST'])
+def restore_backups():
+    """
+    Restore the original metadata of the given paths, or of every journaled file.
+
+    Only journaled files and files within data/photos (for legacy .bak copies and
+    queued writes) are accepted, since a restore moves files around.
+    """
+    data = request.get_json(silent=True) or {}
+    paths = data.get('paths') or [b['path'] for b in backup_journal.list_backups()]
+    photos_dir = os.path.abspath(app.config['PHOTOS_FOLDER']) + os.sep
+    rejected = [path for path in paths
+                if not backup_journal.has_backup(path) and not os.path.abspath(path).startswith(photos_dir)]
+    if rejected:
+        logger.warning(f"Refused to restore files outside data/photos: {rejected}")
+        return jsonify({'status': 'error', 'message': f"Not a backed up file within data/photos: {rejected[0]}"}), 400
+    restored, failed = [], []
+    for path in paths:
+        (restored if restore_original(path) else failed).append(path)
+    logger.info(f"Restored {len(restored)} files, {len(failed)} failed")
+    return jsonify({'status': 'success' if not failed else 'partial', 'restored': restored, 'failed': failed})
+
+@app.route('/write_queue')
+def write_queue_status():
+    """Queued, in-progress and failed write-behind updates"""
+    return jsonify({'status': 'success', 'write_behind': app.config['WRITE_BEHIND'], **write_queue.status()})
+
+@app.route('/write_queue/retry', methods=['POST'])
+def retry_queued_writes():
+    """Requeue failed write-behind updates, of one path or all of them"""
+    data = request.get_json(silent=True) or {}
+    requeued = write_queue.retry(data.get('path'))
+    logger.info(f"Requeued {requeued} failed GPS writes")
+    return jsonify({'status': 'success', 'requeued': requeued})
+
+@app.route('/write_queue/discard', methods=['POST'])
+def discard_queued_write():
+    """Give up on a failed write-behind update"""
+    data = request.get_json(silent=True) or {}
+    if not data.get('path'):
+        return jsonify({'status': 'error', 'message': 'path is required'}), 400
+    write_queue.discard(data['path'])
+    return jsonify({'status': 'success'})
+
+def entry_json(active, index, pending):
+    """API representation of a review entry; pending is the set from Reviewer.pending_indexes()"""
+    entry = active.entries[index]
+    return {
+        'index': index,
+        'path': entry['path'],
+        'datetime': entry.get('datetime', ''),
+        'latitude': entry.get('latitude', ''),
+        'longitude': entry.get('longitude', ''),
+        'gps_source': entry.get('gps_source', ''),
+        'pending': index in pending
+    }
+
+def api_since(active):
+    """
+    The version a client asks for changes since, or None for a full response.
+
+    Deltas are only served for the set of entries the client already has, identified by the
+    reviewer token of its earlier response; after a new scan or CSV load it gets everything again.
+    """
+    since = request.args.get('since')
+    if since is None or request.args.get('reviewer') != active.token:
+        return None
+    return int(since)
+
+@app.route('/api/entries')
+def api_entries():
+    """
+    Page through the review entries as JSON.
+
+    offset and limit (at most API_PAGE_LIMIT) select a page of the entries matching
+    filter (see Reviewer.filter_indexes). With since=<version> and the reviewer token of
+    an earlier response, only the entries changed after that version are returned, in
+    'changed' and unfiltered, so the client can patch the list it has. Responses carry
+    an ETag of the reviewer version (which queued writes bump when they land), so unchanged
+    lists are answered with 304.
+    """
+    active = reviewer
+    if not active:
+        return jsonify({'status': 'error', 'message': 'No entries loaded'}), 404
+    version = active.version
+    etag = f"{active.token}-{version}"
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    try:
+        offset = max(0, int(request.args.get('offset', 0)))
+        limit = min(max(1, int(request.args.get('limit', app.config['API_PAGE_SIZE']))), app.config['API_PAGE_LIMIT'])
+        since = api_since(active)
+    except ValueError:
+        return jsonify({'status': 'error', 'message': 'offset, limit and since must be integers'}), 400
+
+    payload = {'status': 'success', 'reviewer': active.token, 'version': version}
+    pending = active.pending_indexes()
+    if since is not None:
+        payload['changed'] = [entry_json(active, i, pending) for i in active.changed_since(since)]
+    else:
+        indexes = active.filter_indexes(request.args.get('filter', 'all'))
+        if indexes is None:
+            return jsonify({'status': 'error', 'message': f"Unknown filter: {request.args.get('filter')}"}), 400
+        payload.update(total=len(indexes), offset=offset, limit=limit,
+                       entries=[entry_json(active, i, pending) for i in indexes[offset:offset + limit]])
+    return set_cache_headers(jsonify(payload), etag)
+
+@app.route('/api/gps_points')
+def api_gps_points():
+    """
+    Heatmap points of the review entries as JSON: one [lat, lon], or null, per entry index.
+
+    With since=<version> and the reviewer token of an earlier response, only the points
+    of entries changed after that version are returned, in 'changed' as {index: point}.
+    """
+    active = reviewer
+    if not active:
+        return jsonify({'status': 'error', 'message': 'No entries loaded'}), 404
+    version = active.version
+    etag = f"{active.token}-{version}"
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    try:
+        since = api_since(active)
+    except ValueError:
+        return jsonify({'status': 'error', 'message': 'since must be an integer'}), 400
+
+    payload = {'status': 'success', 'reviewer': active.token, 'version': version}
+    if since is not None:
+        payload['changed'] = {i: active.gps_point(active.entries[i]) for i in active.changed_since(since)}
+    else:
+        payload['points'] = active.gps_points()
+    return set_cache_headers(jsonify(payload), etag)
+
 @app.route('/geocode', methods=['POST'])
 def geocode():
     address = request.json.get('address')
@@ -1427,9 +1841,10 @@ def browse_subdirectory(subpath):
                     file_lower.endswith(video_extensions)):
                     
                     # Get media info
-                    gps = get_media_gps(item_path)
-                    dt = get_media_datetime(item_path)
-                    media_type = get_media_type(item_path)
+                    info = get_media_info(item_path)
+                    gps = info['gps']
+                    dt = info['datetime']
+                    media_type = info['media_type']
                     
                     # Skip unsupported HEIC files if pillow-heif is not available
                     if file_lower.endswith(heic_extensions) and not HEIF_SUPPORT:
@@ -1506,13 +1921,137 @@ def browse_subdirectory(subpath):
         flash(f"Error browsing directory: {str(e)}", "error")
         return redirect(url_for('directory_list'))
 
+def build_directory_entries(directory, find_closest=False, time_frame=1, hide_with_gps=False, job=None):
+    """Scan a directory and build the review entries for it"""
+    if find_closest:
+        entries = scan_directory_with_closest(directory, time_frame, job)
+        if hide_with_gps:
+            # Only show images without original GPS (only proxy GPS)
+            entries = [e for e in entries if e.get('gps_source') in PROXY_SOURCES]
+        else:
+            # Show all images (with or without GPS)
+            for e in entries:
+                if '__include_if_not_hide_gps' in e:
+                    del e['__include_if_not_hide_gps']
+        return entries
+
+    media_files = scan_directory_for_media(directory, job)
+    entries = []
+    for m in media_files:
+        gps = m['gps']
+        dt = m['datetime']
+        if gps and gps != (0.0, 0.0):
+            entry = {
+                'path': m['path'],
+                'datetime': dt.isoformat() if dt else '',
+                'latitude': gps[0],
+                'longitude': gps[1],
+                'gps_source': 'original'
+            }
+            entries.append(entry)
+        else:
+            entry = {
+                'path': m['path'],
+                'datetime': dt.isoformat() if dt else '',
+                'latitude': '',
+                'longitude': '',
+                'gps_source': 'scan'
+            }
+            entries.append(entry)
+    if hide_with_gps:
+        # Only show images without GPS
+        entries = [e for e in entries if not e['latitude'] or not e['longitude']]
+    return entries
+
+def build_file_list_entries(file_paths, find_closest=False, time_frame=1, hide_with_gps=False, job=None):
+    """Build review entries for files picked in the browser (JPEGs only)"""
+    # Build media_files list as in scan_directory_for_media
+    media_files = []
+    jpg_paths = [f for f in file_paths if f.lower().endswith(('.jpg', '.jpeg'))]
+    if job:
+        job.add_discovered(len(jpg_paths))
+    for file_path, info, error in get_media_infos(jpg_paths, progress=job.add_processed if job else None):
+        if error:
+            logger.error(f"Error processing {file_path}: {error}")
+            continue
+        dt = info['datetime']
+        gps = info['gps']
+        logger.debug(f"File: {file_path}\n  Datetime: {dt}\n  GPS: {gps}")
+        media_files.append({
+            'path': file_path,
+            'datetime': dt,
+            'gps': gps,
+            'orig_gps': gps
+        })
+
+    if find_closest:
+        # Use the same logic as scan_directory_with_closest, but only for the selected files
+        gps_files = [m for m in media_files if m['gps'] is not None and m['gps'] != (0.0, 0.0)]
+        logger.debug(f"Reference files with valid GPS: {len(gps_files)}")
+        media_files = assign_proxy_gps(media_files, GpsTimeIndex.from_media(gps_files), time_frame)
+
+    entries = []
+    for m in media_files:
+        orig_gps = m['orig_gps']
+        if (not orig_gps or orig_gps == (0.0, 0.0)) and m['gps'] and m['gps'] != (0.0, 0.0):
+            lat = m['gps'][0]
+            lon = m['gps'][1]
+            gps_source = m.get('proxy_source', 'proxy') if find_closest else 'scan'
+            entry = {
+                'path': m['path'],
+                'datetime': m['datetime'].isoformat() if m['datetime'] else '',
+                'latitude': lat,
+                'longitude': lon,
+                'gps_source': gps_source,
+                'proxy_confidence': m.get('proxy_confidence')
+            }
+            logger.debug(f"Entry for review: {entry}")
+            entries.append(entry)
+        elif orig_gps and orig_gps != (0.0, 0.0):
+            # Already has GPS
+            lat = orig_gps[0]
+            lon = orig_gps[1]
+            gps_source = 'original'
+            entry = {
+                'path': m['path'],
+                'datetime': m['datetime'].isoformat() if m['datetime'] else '',
+                'latitude': lat,
+                'longitude': lon,
+                'gps_source': gps_source
+            }
+            entry['__include_if_not_hide_gps'] = True
+            entries.append(entry)
+
+    if hide_with_gps:
+        # Only keep entries without original GPS
+        entries = [e for e in entries if e.get('gps_source') != 'original']
+    else:
+        # Remove marker key
+        for e in entries:
+            if '__include_if_not_hide_gps' in e:
+                del e['__include_if_not_hide_gps']
+    return entries
+
+def run_scan_job(job, build_entries, *args):
+    """Background scan: build the entries and hand them to a new Reviewer"""
+    global reviewer
+    entries = build_entries(*args, job=job)
+    if not entries:
+        raise ValueError("No images found for review.")
+    job.check_cancelled()
+    reviewer = Reviewer.from_entries(entries)
+    logger.info(f"Starting review with {len(entries)} entries")
+    return {'entries': len(entries)}
+
+def start_scan_job(description, build_entries, *args):
+    """Start a scan job and return it"""
+    return job_manager.submit('scan', run_scan_job, build_entries, *args, description=description)
+
 @app.route('/scan/')
 @app.route('/scan')
 @app.route('/scan/<path:directory_path>')
 def scan_photo_directory(directory_path=''):
-    """Scan a specific directory from data/photos"""
-    global reviewer
-    
+    """Scan a specific directory from data/photos in a background job"""
     photos_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'photos')
     
     # Handle both absolute and relative paths
@@ -1540,69 +2079,23 @@ def scan_photo_directory(directory_path=''):
     time_frame = int(request.args.get('time_frame', '1'))
     hide_with_gps = request.args.get('hide_with_gps', 'false').lower() == 'true'  # Default to false
     
-    try:
-        logger.info(f"Scanning directory: {scan_path}")
-        
-        if find_closest:
-            entries = scan_directory_with_closest(scan_path, time_frame)
-            if hide_with_gps:
-                # Only show images without original GPS (only proxy GPS)
-                entries = [e for e in entries if e.get('gps_source') == 'proxy']
-            else:
-                # Show all images (with or without GPS)
-                for e in entries:
-                    if '__include_if_not_hide_gps' in e:
-                        del e['__include_if_not_hide_gps']
-        else:
-            media_files = scan_directory_for_media(scan_path)
-            entries = []
-            for m in media_files:
-                gps = m['gps']
-                dt = m['datetime']
-                if gps and gps != (0.0, 0.0):
-                    entry = {
-                        'path': m['path'],
-                        'datetime': dt.isoformat() if dt else '',
-                        'latitude': gps[0],
-                        'longitude': gps[1],
-                        'gps_source': 'original'
-                    }
-                    entries.append(entry)
-                else:
-                    entry = {
-                        'path': m['path'],
-                        'datetime': dt.isoformat() if dt else '',
-                        'latitude': '',
-                        'longitude': '',
-                        'gps_source': 'scan'
-                    }
-                    entries.append(entry)
-            if hide_with_gps:
-                # Only show images without GPS
-                entries = [e for e in entries if not e['latitude'] or not e['longitude']]
-                
-        if not entries:
-            logger.warning(f"No images found for review in {scan_path}")
-            flash("No images found for review in the selected directory.", "warning")
-            return redirect(url_for('directory_list'))
-            
-        reviewer = Reviewer.from_entries(entries)
-        # Set session variables for tracking source type
-        session['source_type'] = 'directory'
-        session['find_closest'] = find_closest
-        session['has_proxy_gps'] = any(entry.get('gps_source') == 'proxy' for entry in reviewer.entries)
-        
-        logger.info(f"Starting review with {len(entries)} entries")
-        return redirect(url_for('review'))
-        
-    except Exception as e:
-        logger.error(f"Error scanning directory {scan_path}: {e}", exc_info=True)
-        flash(f"Error scanning directory: {str(e)}", "error")
-        return redirect(url_for('directory_list'))
+    logger.info(f"Scanning directory: {scan_path}")
+    job = start_scan_job(scan_path, build_directory_entries, scan_path, find_closest, time_frame, hide_with_gps)
+
+    # Set session variables for tracking source type
+    session['source_type'] = 'directory'
+    session['find_closest'] = find_closest
+
+    return render_template('scan_progress.html',
+                           job_id=job.id,
+                           directory=scan_path,
+                           status_url=url_for('job_status', job_id=job.id),
+                           cancel_url=url_for('cancel_job', job_id=job.id),
+                           review_url=url_for('review'),
+                           back_url=url_for('directory_list'))
 
 @app.route('/scan_directory', methods=['POST'])
 def scan_directory():
-    global reviewer
     data = request.get_json()
     file_list = data.get('file_list')
     directory = data.get('directory')
@@ -1623,14 +2116,7 @@ def scan_directory():
 
     # If file_list is provided (from folder picker), use it. Otherwise, fall back to directory scan.
     if file_list and isinstance(file_list, list) and len(file_list) > 0:
-        # file_list contains relative paths (webkitRelativePath), but we need absolute paths
-        # Assume all files are under the same root (the first path's root)
-        # Try to reconstruct the root directory from the first file
-        first_path = file_list[0]
-        # Remove the relative part to get the root directory
-        # e.g. Edenred-100.jpg or subfolder/IMG_001.jpg
-        # The user selects a folder, so the files are relative to that folder
-        # Use the directory as the root directory
+        # file_list contains relative paths (webkitRelativePath) under the selected directory
         root_dir = directory
         abs_file_paths = [os.path.join(root_dir, rel_path) for rel_path in file_list]
         logger.debug(f"Received file_list with {len(abs_file_paths)} files. Root dir: {root_dir}")
@@ -1641,125 +2127,129 @@ def scan_directory():
             logger.warning("No valid files found in the selected directory")
             return jsonify({'status': 'error', 'message': 'No valid files found in the selected directory.'}), 200
 
-        # Build media_files list as in scan_directory_for_media
-        media_files = []
-        for file_path in abs_file_paths:
-            if file_path.lower().endswith(('.jpg', '.jpeg')):
-                dt = get_media_datetime(file_path)
-                gps = get_media_gps(file_path)
-                logger.debug(f"File: {file_path}\n  Datetime: {dt}\n  GPS: {gps}")
-                media_files.append({
-                    'path': file_path,
-                    'datetime': dt,
-                    'gps': gps
-                })
-
-        if find_closest:
-            # Use the same logic as scan_directory_with_closest, but only for the selected files
-            gps_files = [m for m in media_files if m['gps'] is not None and m['gps'] != (0.0, 0.0)]
-            logger.debug(f"Reference files with valid GPS: {len(gps_files)}")
-            for media in media_files:
-                if (media['gps'] is None or media['gps'] == (0.0, 0.0)) and media['datetime'] is not None:
-                    logger.debug(f"Looking for proxy GPS for: {media['path']}")
-                    proxy_gps = find_closest_gps(gps_files, media, time_frame)
-                    if proxy_gps and proxy_gps != (0.0, 0.0):
-                        logger.debug(f"Assigned proxy GPS {proxy_gps} to {media['path']}")
-                        media['gps'] = proxy_gps
-                    else:
-                        logger.debug(f"No proxy GPS assigned to {media['path']}")
-                        media['gps'] = None
-
-        entries = []
-        for m in media_files:
-            orig_gps = get_media_gps(m['path'])
-            if (not orig_gps or orig_gps == (0.0, 0.0)) and m['gps'] and m['gps'] != (0.0, 0.0):
-                lat = m['gps'][0]
-                lon = m['gps'][1]
-                gps_source = 'proxy' if find_closest else 'scan'
-                entry = {
-                    'path': m['path'],
-                    'datetime': m['datetime'].isoformat() if m['datetime'] else '',
-                    'latitude': lat,
-                    'longitude': lon,
-                    'gps_source': gps_source
-                }
-                logger.debug(f"Entry for review: {entry}")
-                entries.append(entry)
-            elif orig_gps and orig_gps != (0.0, 0.0):
-                # Already has GPS
-                lat = orig_gps[0]
-                lon = orig_gps[1]
-                gps_source = 'original'
-                entry = {
-                    'path': m['path'],
-                    'datetime': m['datetime'].isoformat() if m['datetime'] else '',
-                    'latitude': lat,
-                    'longitude': lon,
-                    'gps_source': gps_source
-                }
-                entry['__include_if_not_hide_gps'] = True
-                entries.append(entry)
-
-        if hide_with_gps:
-            # Only keep entries without original GPS
-            entries = [e for e in entries if e.get('gps_source') != 'original']
-        else:
-            # Remove marker key
-            for e in entries:
-                if '__include_if_not_hide_gps' in e:
-                    del e['__include_if_not_hide_gps']
-
-        if not entries:
-            logger.warning("No images found for review after filtering")
-            return jsonify({'status': 'error', 'message': 'No images found for review.'}), 200
-        reviewer = Reviewer.from_entries(entries)
-        logger.info(f"Starting review with {len(entries)} entries")
-        return jsonify({'status': 'success', 'redirect': url_for('review')}), 200
+        job = start_scan_job(f"{len(abs_file_paths)} selected files", build_file_list_entries,
+                             abs_file_paths, find_closest, time_frame, hide_with_gps)
+    else:
+        # Fallback: legacy directory scan
+        if not directory or not os.path.isdir(directory):
+            return jsonify({'status': 'error', 'message': 'Invalid or missing directory'}), 400
+        job = start_scan_job(directory, build_directory_entries, directory, find_closest, time_frame, hide_with_gps)
+
+    session['source_type'] = 'directory'
+    session['find_closest'] = find_closest
+    return jsonify({
+        'status': 'started',
+        'job_id': job.id,
+        'status_url': url_for('job_status', job_id=job.id),
+        'cancel_url': url_for('cancel_job', job_id=job.id),
+        'redirect': url_for('review')
+    }), 202
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    """Report progress of a background job: discovered, processed, failed, throughput and ETA"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'status': 'error', 'message': 'Unknown job'}), 404
+    status = job.to_dict()
+    status['result'] = job.result if isinstance(job.result, dict) else None
+    return jsonify(status)
+
+@app.route('/jobs/<job_id>/events')
+def job_events(job_id):
+    """Stream job progress as Server-Sent Events until the job finishes"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({'status': 'error', 'message': 'Unknown job'}), 404
+
+    def generate():
+        version = -1
+        while True:
+            status = job.to_dict()
+            if status['version'] != version:
+                version = status['version']
+                yield f"event: progress\ndata: {json.dumps(status)}\n\n"
+            if job.finished:
+                status['result'] = job.result if isinstance(job.result, dict) else None
+                yield f"event: done\ndata: {json.dumps(status)}\n\n"
+                return
+            if job.wait_for_update(version, timeout=JOB_EVENT_HEARTBEAT) == version:
+                # Comment line keeps proxies from closing an idle stream
+                yield ": heartbeat\n\n"
+            else:
+                # Coalesce bursts of per-file updates into one event
+                time.sleep(JOB_EVENT_MIN_INTERVAL)
+
+    # The job runs on its own thread, so a closed tab only ends this stream
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    """Request cancellation of a background job"""
+    job = job_manager.cancel(job_id)
+    if job is None:
+        return jsonify({'status': 'error', 'message': 'Unknown job'}), 404
+    return jsonify(job.to_dict())
+
+@app.route('/gpx')
+def gpx_status():
+    """Return the GPX tracks currently loaded as a proxy GPS source"""
+    return jsonify(gpx_store.status())
+
+@app.route('/gpx/upload', methods=['POST'])
+def upload_gpx():
+    """Save uploaded GPX files to the GPX folder and load them into the track store"""
+    gpx_files = [f for f in request.files.getlist('gpx_files') if f and f.filename]
+    if not gpx_files:
+        return jsonify({'status': 'error', 'message': 'No GPX file selected'}), 400
+
+    added = 0
+    for gpx_file in gpx_files:
+        if not gpx_file.filename.lower().endswith(GPX_EXTENSIONS):
+            logger.warning(f"Skipping non-GPX upload: {gpx_file.filename}")
+            continue
+        gpx_path = os.path.join(app.config['GPX_FOLDER'], secure_filename(gpx_file.filename))
+        try:
+            gpx_file.save(gpx_path)
+            added += gpx_store.add_file(gpx_path)
+        except Exception as e:
+            logger.error(f"Error loading GPX file {gpx_path}: {e}")
+            return jsonify({'status': 'error', 'message': f"Could not load {gpx_file.filename}: {e}"}), 400
+
+    logger.info(f"Added {added} trackpoints from {len(gpx_files)} uploaded GPX files")
+    return jsonify({'status': 'success', 'added': added, **gpx_store.status()})
+
+@app.route('/gpx/load', methods=['POST'])
+def load_gpx_path():
+    """Load GPX tracks from a .gpx file or directory on the server (within data/)"""
+    data = request.get_json(silent=True) or request.form
+    path = (data.get('path') or '').strip()
+    if not path:
+        return jsonify({'status': 'error', 'message': 'No path given'}), 400
+    if not os.path.isabs(path):
+        path = os.path.join(app.config['PHOTOS_FOLDER'], path)
+
+    # The data/ directory the configured folders live in
+    data_dir = os.path.dirname(os.path.abspath(app.config['PHOTOS_FOLDER']))
+    if os.path.abspath(path) != data_dir and not os.path.abspath(path).startswith(data_dir + os.sep):
+        logger.warning(f"Attempted to load GPX from outside data/: {path}")
+        return jsonify({'status': 'error', 'message': 'Only paths within data/ can be loaded.'}), 400
+    if not os.path.exists(path):
+        return jsonify({'status': 'error', 'message': f"Path not found: {path}"}), 404
 
-    # Fallback: legacy directory scan
-    if not directory or not os.path.isdir(directory):
-        return jsonify({'status': 'error', 'message': 'Invalid or missing directory'}), 400
     try:
-        if find_closest:
-            entries = scan_directory_with_closest(directory, time_frame)
-            if hide_with_gps:
-                entries = [e for e in entries if e.get('gps_source') == 'proxy']
-            else:
-                for e in entries:
-                    if '__include_if_not_hide_gps' in e:
-                        del e['__include_if_not_hide_gps']
-        else:
-            media_files = scan_directory_for_media(directory)
-            entries = []
-            for m in media_files:
-                gps = m['gps']
-                dt = m['datetime']
-                if gps and gps != (0.0, 0.0):
-                    entry = {
-                        'path': m['path'],
-                        'datetime': dt.isoformat() if dt else '',
-                        'latitude': gps[0],
-                        'longitude': gps[1],
-                        'gps_source': 'original'
-                    }
-                    entries.append(entry)
-                else:
-                    entry = {
-                        'path': m['path'],
-                        'datetime': dt.isoformat() if dt else '',
-                        'latitude': '',
-                        'longitude': '',
-                        'gps_source': 'scan'
-                    }
-                    entries.append(entry)
-            if hide_with_gps:
-                entries = [e for e in entries if not e['latitude'] or not e['longitude']]
-        if not entries:
-            return jsonify({'status': 'error', 'message': 'No images found for review.'}), 200
-        reviewer = Reviewer.from_entries(entries)
-        return jsonify({'status': 'success', 'redirect': url_for('review')}), 200
+        added = gpx_store.add_path(path)
     except Exception as e:
-        return jsonify({'status': 'error', 'message': str(e)}), 500
+        logger.error(f"Error loading GPX from {path}: {e}")
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    return jsonify({'status': 'success', 'added': added, **gpx_store.status()})
+
+@app.route('/gpx/clear', methods=['POST'])
+def clear_gpx():
+    """Unload all GPX tracks (uploaded files stay in the GPX folder and are reloaded on restart)"""
+    gpx_store.clear()
+    return jsonify({'status': 'success', **gpx_store.status()})
 
 # Add route to get available photo directories from data/photos
 @app.route('/get_photo_directories')
@@ -1790,6 +2280,59 @@ def get_photo_directories():
         logger.error(f"Error listing photo directories: {e}", exc_info=True)
         return jsonify({'directories': [], 'error': str(e)})
 
+def media_etag(file_path, variant=''):
+    """
+    Strong ETag of a version of a file, from its size, nanosecond mtime and write generation.
+
+    An in-place patch or restore can keep the size and land within the mtime
+    resolution, so the count of GPS writes made through update_image_gps and
+    restore_original is included to change the ETag on every write.
+
+    Args:
+        file_path (str): Source file
+        variant (str): Distinguishes responses derived from one file (e.g. a preview width)
+    """
+    stat = os.stat(file_path)
+    generation = media_write_generations.get(media_generation_key(file_path), 0)
+    etag = f"{stat.st_size:x}-{stat.st_mtime_ns:x}-{media_etag_epoch}{generation:x}"
+    return f"{etag}-{variant}" if variant else etag
+
+def set_cache_headers(response, etag, max_age=None):
+    """Set the ETag and Cache-Control of a response: revalidate on every use unless max_age marks it immutable."""
+    response.set_etag(etag)
+    if max_age:
+        response.cache_control.no_cache = None
+        response.cache_control.public = True
+        response.cache_control.max_age = max_age
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True
+    return response
+
+def not_modified(etag):
+    """Return a 304 response if the browser already holds the version with this ETag, otherwise None."""
+    if not request.if_none_match.contains(etag):
+        return None
+    return set_cache_headers(Response(status=304), etag)
+
+def send_media(file_path, etag=None, max_age=None):
+    """
+    Send a file with a strong ETag, answering If-None-Match with 304 and Range with 206.
+
+    Args:
+        file_path (str): File to send
+        etag (str): ETag of the response, media_etag(file_path) by default
+        max_age (int): Seconds the browser may reuse it without asking; by default it revalidates every time
+
+    Returns:
+        Response: 200 with the file, 206 with the requested byte range, 304 or 416
+    """
+    etag = etag or media_etag(file_path)
+    response = send_file(os.path.abspath(file_path), conditional=True, etag=etag, max_age=max_age)
+    # Werkzeug only advertises ranges on range responses; video players look for it on the first one
+    response.headers.setdefault('Accept-Ranges', 'bytes')
+    return set_cache_headers(response, etag, max_age)
+
 @app.route('/image/<path:filepath>')
 def serve_image(filepath):
     """Serve an image or thumbnail directly from its filepath"""
@@ -1807,11 +2350,12 @@ def serve_image(filepath):
         # Fix long paths on Windows
         full_path = fix_long_path(full_path)
         
-        # Allow temp directory for thumbnails of videos
+        # Allow temp directory and the thumbnail cache for thumbnails of videos
         is_in_temp = os.path.abspath(full_path).startswith(os.path.abspath(temp_dir))
         is_in_photos = os.path.abspath(full_path).startswith(os.path.abspath(photos_dir))
+        is_thumbnail = thumbnail_cache.contains_path(full_path)
         
-        if not (is_in_photos or is_in_temp):
+        if not (is_in_photos or is_in_temp or is_thumbnail):
             logger.warning(f"Attempted to access file outside allowed directories: {full_path}")
             return "Access denied", 403
             
@@ -1819,40 +2363,148 @@ def serve_image(filepath):
             logger.warning(f"Requested file not found: {full_path}")
             return "File not found", 404
             
-        # For thumbnails in temp directory
+        # Cached video thumbnails are named by the digest of their source version, so they never change
+        if is_thumbnail:
+            return send_media(full_path, max_age=app.config['IMMUTABLE_MAX_AGE'])
         if is_in_temp and "thumb_" in os.path.basename(full_path):
-            directory = os.path.dirname(full_path)
-            filename = os.path.basename(full_path)
-            return send_from_directory(directory, filename)
+            return send_media(full_path)
             
-        # For HEIC files, convert to JPEG on-the-fly if supported
+        # For HEIC files, serve a cached JPEG conversion if supported
         if full_path.lower().endswith(('.heic', '.heif')) and HEIF_SUPPORT:
+            # Tagged by the HEIC file, so a revalidation needs no conversion or cache lookup
+            etag = media_etag(full_path, 'full')
+            cached = not_modified(etag)
+            if cached:
+                return cached
             try:
-                # Create a temporary JPEG version
-                temp_jpeg = os.path.join(
-                    app.config['TEMP_FOLDER'], 
-                    f"convert_{os.path.basename(full_path)}_{hash(full_path)}.jpg"
-                )
-                
-                # Check if already converted
-                if not os.path.exists(temp_jpeg):
-                    # Convert HEIC to JPEG
-                    img = Image.open(full_path)
-                    img.save(temp_jpeg, format='JPEG', quality=90)
-                
-                return send_from_directory(os.path.dirname(temp_jpeg), os.path.basename(temp_jpeg))
+                preview = preview_cache.get_or_create(full_path, lambda out: convert_heic_to_jpeg(full_path, out),
+                                                      variant='full')
+                if preview:
+                    return send_media(preview, etag=etag)
             except Exception as e:
                 logger.error(f"Error converting HEIC file {full_path}: {e}")
         
-        # For regular files in photos directory
-        directory = os.path.dirname(full_path)
-        filename = os.path.basename(full_path)
-        
-        return send_from_directory(directory, filename)
+        # For regular files in photos directory, including byte ranges for seeking in videos
+        return send_media(full_path)
     except Exception as e:
         logger.error(f"Error serving image {filepath}: {e}")
         return "Error serving image", 500
 
+def preview_width(requested):
+    """Round a requested preview width up to the nearest configured width."""
+    widths = app.config['PREVIEW_WIDTHS']
+    return next((w for w in widths if w >= requested), widths[-1])
+
+def render_preview(image_path, jpeg_path, width):
+    """Write a JPEG of an image scaled down to at most width pixels, upright per its EXIF orientation."""
+    with Image.open(image_path) as img:
+        # For JPEGs, let the decoder downscale in the DCT domain (1/2, 1/4, 1/8) to at least width on both sides,
+        # so the width still suffices after a 90 degree rotation
+        img.draft('RGB', (width, width))
+        img = ImageOps.exif_transpose(img)
+        img.thumbnail((width, width * 8), Image.LANCZOS)
+        img.convert('RGB').save(jpeg_path, format='JPEG', quality=app.config['PREVIEW_QUALITY'], progressive=True)
+    return True
+
+def resolve_photo_path(filepath):
+    """
+    Resolve a requested path (absolute, or relative to data/photos) to a file inside data/photos.
+
+    Returns:
+        tuple: (full_path, None), or (None, error_response) if access is denied or the file is missing
+    """
+    photos_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'photos')
+    full_path = filepath if os.path.isabs(filepath) else os.path.normpath(os.path.join(photos_dir, filepath))
+    full_path = fix_long_path(full_path)
+
+    if not os.path.abspath(full_path).startswith(os.path.abspath(photos_dir)):
+        logger.warning(f"Attempted to access file outside allowed directories: {full_path}")
+        return None, ("Access denied", 403)
+    if not os.path.isfile(full_path):
+        logger.warning(f"Requested file not found: {full_path}")
+        return None, ("File not found", 404)
+    return full_path, None
+
+@app.route('/preview/<path:filepath>')
+def serve_preview(filepath):
+    """Serve a downscaled JPEG preview of a photo; ?w= is rounded up to one of PREVIEW_WIDTHS"""
+    full_path, error = resolve_photo_path(filepath)
+    if error:
+        return error
+    try:
+        width = preview_width(int(request.args.get('w', app.config['PREVIEW_WIDTHS'][1])))
+    except ValueError:
+        return "Invalid width", 400
+    preview_requests['width'] = width
+    etag = media_etag(full_path, f"w{width}")
+    cached = not_modified(etag)
+    if cached:
+        return cached
+
+    preview = None
+    if not full_path.lower().endswith(('.heic', '.heif')) or HEIF_SUPPORT:
+        try:
+            preview = preview_cache.get_or_create(full_path, lambda out: render_preview(full_path, out, width),
+                                                  variant=f"w{width}")
+        except Exception as e:
+            logger.error(f"Error creating preview of {full_path}: {e}")
+    if not preview:
+        # Let the original be served instead
+        return redirect(url_for('serve_image', filepath=filepath))
+    return send_media(preview, etag=etag)
+
+@app.route('/thumbnail/<path:filepath>')
+def serve_thumbnail(filepath):
+    """
+    Serve a small thumbnail for the directory browser.
+
+    The JPEG thumbnail embedded in the EXIF (JPEG, TIFF) or HEIF container is
+    used when there is one, so nothing is decoded; videos get their cached
+    ffmpeg frame and other images a reduced-size decode from the preview cache.
+    """
+    full_path, error = resolve_photo_path(filepath)
+    if error:
+        return error
+    etag = media_etag(full_path, 'thumb')
+    cached = not_modified(etag)
+    if cached:
+        return cached
+    try:
+        embedded = read_embedded_thumbnail(full_path)
+        if embedded:
+            thumbnail_stats['embedded'] += 1
+            return set_cache_headers(Response(upright_thumbnail(*embedded), mimetype='image/jpeg'), etag)
+
+        thumbnail_stats['decoded'] += 1
+        if get_media_type(full_path) == 'video':
+            thumbnail = get_video_thumbnail(full_path)
+        elif full_path.lower().endswith(('.heic', '.heif')) and not HEIF_SUPPORT:
+            thumbnail = None
+        else:
+            width = app.config['GRID_THUMBNAIL_WIDTH']
+            thumbnail = preview_cache.get_or_create(full_path, lambda out: render_preview(full_path, out, width),
+                                                    variant=f"w{width}")
+        if thumbnail:
+            return send_media(thumbnail, etag=etag)
+    except Exception as e:
+        logger.error(f"Error creating thumbnail of {full_path}: {e}")
+    return "Thumbnail not available", 404
+
+def convert_heic_to_jpeg(heic_path, jpeg_path):
+    """Convert a HEIC/HEIF image to a full-resolution JPEG."""
+    with Image.open(heic_path) as img:
+        img.convert('RGB').save(jpeg_path, format='JPEG', quality=90)
+    return True
+
+@app.route('/metrics')
+def metrics():
+    """Cache sizes and hit rates"""
+    return jsonify({
+        'thumbnail_cache': thumbnail_cache.stats(),
+        'preview_cache': preview_cache.stats(),
+        'grid_thumbnails': dict(thumbnail_stats)
+    })
+
 @app.route('/csv_list')
 def csv_list():
     """Display available CSV files in data/csv"""
@@ -1930,7 +2582,7 @@ def load_csv(csv_filename):
         # Set session variables for tracking source type
         session['source_type'] = 'csv'
         session['find_closest'] = False
-        session['has_proxy_gps'] = any(entry.get('gps_source') == 'proxy' for entry in reviewer.entries)
+        session['has_proxy_gps'] = reviewer.has_proxy_gps
         
         logger.info(f"Starting review with {len(reviewer.entries)} entries from CSV")
         flash(f"Loaded {len(reviewer.entries)} entries from CSV", "success")
@@ -1949,7 +2601,7 @@ def browse_root():
     return browse_subdirectory('')
 
 def get_video_thumbnail(video_path):
-    """Generate a thumbnail for a video file using ffmpeg."""
+    """Return the cached thumbnail of a video, generating it with ffmpeg once per file version."""
     try:
         # Fix long path issue on Windows
         video_path = fix_long_path(video_path)
@@ -1959,72 +2611,53 @@ def get_video_thumbnail(video_path):
             logger.error(f"Video file not found: {video_path}")
             return None
             
-        # Create a unique temporary file for the thumbnail
-        thumb_file = os.path.join(
-            app.config['TEMP_FOLDER'], 
-            f"thumb_{os.path.basename(video_path)}_{hash(video_path)}.jpg"
-        )
-        
-        # Use FFmpeg to extract a frame at 1 second
-        ffmpeg_command = [
-            'ffmpeg', '-y', '-i', video_path, 
-            '-ss', '00:00:01.000', '-vframes', '1',
-            '-vf', 'scale=640:-1',
-            thumb_file
-        ]
-        
-        # Run the command
+        return thumbnail_cache.get_or_create(video_path, lambda thumb_file: render_video_thumbnail(video_path, thumb_file))
+    except Exception as e:
+        logger.error(f"Error creating video thumbnail: {str(e)}")
+        return None
+
+def render_video_thumbnail(video_path, thumb_file):
+    """Extract a 640 px wide frame of a video into thumb_file using ffmpeg."""
+    # Use FFmpeg to extract a frame at 1 second
+    ffmpeg_command = [
+        'ffmpeg', '-y', '-i', video_path, 
+        '-ss', '00:00:01.000', '-vframes', '1',
+        '-vf', 'scale=640:-1',
+        thumb_file
+    ]
+    
+    # Run the command
+    result = subprocess.run(
+        ffmpeg_command, 
+        stdout=subprocess.PIPE, 
+        stderr=subprocess.PIPE, 
+        text=True
+    )
+    
+    if result.returncode != 0:
+        logger.error(f"Error generating thumbnail for {video_path}: {result.stderr}")
+        # Try at 0 seconds if 1 second fails
+        ffmpeg_command[4] = '00:00:00.000'
         result = subprocess.run(
             ffmpeg_command, 
             stdout=subprocess.PIPE, 
             stderr=subprocess.PIPE, 
             text=True
         )
-        
         if result.returncode != 0:
-            logger.error(f"Error generating thumbnail for {video_path}: {result.stderr}")
-            # Try at 0 seconds if 1 second fails
-            ffmpeg_command[4] = '00:00:00.000'
-            result = subprocess.run(
-                ffmpeg_command, 
-                stdout=subprocess.PIPE, 
-                stderr=subprocess.PIPE, 
-                text=True
-            )
-            if result.returncode != 0:
-                logger.error(f"Failed again to generate thumbnail: {result.stderr}")
-                return None
-        
-        # Check if thumbnail was created
-        if os.path.exists(thumb_file):
-            logger.debug(f"Generated thumbnail for {video_path} at {thumb_file}")
-            return thumb_file
-        else:
-            logger.error(f"Thumbnail file not created: {thumb_file}")
-            return None
-            
-    except Exception as e:
-        logger.error(f"Error creating video thumbnail: {str(e)}")
-        return None
+            logger.error(f"Failed again to generate thumbnail: {result.stderr}")
+            return False
+    
+    # Check if thumbnail was created
+    if os.path.exists(thumb_file):
+        logger.debug(f"Generated thumbnail for {video_path}")
+        return True
+    logger.error(f"Thumbnail file not created for {video_path}")
+    return False
 
 def is_media_file(file_path):
     """Check if the file is a supported media file (image, HEIC, or video)."""
-    file_lower = file_path.lower()
-    image_extensions = ('.jpg', '.jpeg', '.png', '.tiff')
-    heic_extensions = ('.heic', '.heif')
-    video_extensions = ('.mp4', '.mov', '.avi', '.mkv')
-    
-    # Check if it's a standard image format
-    if file_lower.endswith(image_extensions):
-        return 'image'
-    # Check if it's a HEIC/HEIF file
-    elif file_lower.endswith(heic_extensions) and HEIF_SUPPORT:
-        return 'heic'
-    # Check if it's a video file
-    elif file_lower.endswith(video_extensions):
-        return 'video'
-    else:
-        return None
+    return detect_media_type(file_path)
 
 def get_media_type(file_path):
     """Determine the type of media file."""
@@ -2035,6 +2668,15 @@ def get_media_type(file_path):
         logger.debug(f"Not a supported media file: {file_path}")
     return media_type
 
+def get_write_media_type(file_path):
+    """
+    Media type used to write and back up a file. Unlike get_media_type, HEIC/HEIF files
+    are 'heic' without pillow-heif too, as their Exif item is edited without decoding them.
+    """
+    if file_path.lower().endswith(HEIC_EXTENSIONS):
+        return 'heic'
+    return get_media_type(file_path)
+
 if __name__ == "__main__":
     try:
         # Start the Flask application
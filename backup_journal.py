@@ -0,0 +1,340 @@
+import os
+import time
+import struct
+import shutil
+import sqlite3
+import hashlib
+import threading
+import subprocess
+import tempfile
+
+import piexif
+
+from utils import setup_logger
+from media_index import get_index_path
+from exif_fast import JPEG_EXTENSIONS, TIFF_EXTENSIONS, ExifFormatError, find_jpeg_exif
+from exif_patch import PNG_EXTENSIONS, find_gps_span, read_span, write_span
+from heif_meta import read_heif_exif
+from heif_write import write_heif_exif
+from mp4_write import write_quicktime_udta
+from mp4_atoms import QUICKTIME_EXTENSIONS, load_moov, find_box, iter_boxes, parse_user_data_text
+
+# Setup logger
+logger = setup_logger()
+
+# Full copies of files whose metadata cannot be backed up on its own
+BACKUP_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'backups')
+
+# Kinds of backup recorded in the journal
+KIND_JPEG_EXIF = 'jpeg_exif'  # APP1 Exif segment payload, b'' if the JPEG had none
+KIND_MP4_UDTA = 'mp4_udta'    # moov/udta box including its header, b'' if the file had none
+KIND_GPS_SPAN = 'gps_span'    # File offset (8 bytes) + original bytes of GPS tags patched in place (TIFF, PNG)
+KIND_HEIF_EXIF = 'heif_exif'  # TIFF data of the HEIC Exif item
+KIND_FULL = 'full'            # Full copy of the file in BACKUP_FOLDER
+
+# Read size used when hashing and copying full backups
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+def checksum(data):
+    """SHA-256 hex digest of a metadata block."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def capture_jpeg_exif(file_path):
+    """
+    Read the APP1 Exif segment payload of a JPEG (b'Exif\\x00\\x00' + TIFF data).
+
+    Returns:
+        bytes: The payload, or b'' if the JPEG has no Exif segment
+    """
+    with open(file_path, 'rb') as f:
+        found = find_jpeg_exif(f)
+    return b'Exif\x00\x00' + found[0] if found else b''
+
+
+def capture_mp4_udta(file_path):
+    """
+    Read the moov/udta box of a QuickTime/MP4 file, header included.
+
+    Returns:
+        bytes: The box, b'' if the file has no udta box, or None if the container could not be parsed
+    """
+    file_size = os.path.getsize(file_path)
+    with open(file_path, 'rb') as f:
+        loaded = load_moov(f, file_size)
+    if loaded is None:
+        return None
+    moov = loaded[0]
+    udta = find_box(moov, [b'udta'])
+    if not udta:
+        return b''
+    start, end = udta
+    # Box header precedes the payload (8 bytes, or 16 for a 64-bit size)
+    header_start = start - 8 if moov[start - 4:start] == b'udta' else start - 16
+    return moov[header_start:end]
+
+
+def udta_location(block):
+    """Return the ISO 6709 ©xyz location stored in a udta box, or None."""
+    if not block:
+        return None
+    header_size = 16 if block[4:8] == b'udta' and int.from_bytes(block[:4], 'big') == 1 else 8
+    for box_type, start, end in iter_boxes(block, header_size):
+        if box_type == b'\xa9xyz':
+            return parse_user_data_text(block, start, end)
+    return None
+
+
+def copy_with_checksum(src, dst):
+    """Copy a file, returning the SHA-256 hex digest of its content."""
+    digest = hashlib.sha256()
+    with open(src, 'rb') as fin, open(dst, 'wb') as fout:
+        while True:
+            chunk = fin.read(COPY_CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+            fout.write(chunk)
+    shutil.copystat(src, dst)
+    return digest.hexdigest()
+
+
+def file_checksum(file_path):
+    """SHA-256 hex digest of a file's content."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        while True:
+            chunk = f.read(COPY_CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class BackupJournal:
+    """
+    Journal of the original metadata of files before their GPS was rewritten.
+
+    For JPEGs the Exif APP1 segment is recorded, for TIFF and PNG the bytes of
+    the GPS tags patched in place, for HEIC the Exif item and for QuickTime/MP4
+    videos the udta box, so undoing a change only rewrites the metadata instead
+    of restoring a full copy. Other formats, and HEIC files without Exif, fall
+    back to a full copy kept in BACKUP_FOLDER. Only the first backup of a file is kept, so a restore
+    always returns to the metadata the file had before it was first edited.
+    """
+
+    def __init__(self, db_path=None, backup_folder=None):
+        self.db_path = db_path or get_index_path('backup_journal.db')
+        self.backup_folder = backup_folder or BACKUP_FOLDER
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        os.makedirs(self.backup_folder, exist_ok=True)
+        self._init_db()
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return conn
+
+    def _init_db(self):
+        conn = self._connect()
+        with self._lock:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS backups ('
+                ' path TEXT PRIMARY KEY,'
+                ' kind TEXT NOT NULL,'
+                ' block BLOB,'
+                ' copy_path TEXT,'
+                ' checksum TEXT NOT NULL,'
+                ' size INTEGER NOT NULL,'
+                ' created_at REAL NOT NULL)'
+            )
+            conn.commit()
+
+    @staticmethod
+    def _key(file_path):
+        return os.path.abspath(file_path)
+
+    def get(self, file_path):
+        """Return the journal row for a file as a dict, or None."""
+        row = self._connect().execute(
+            'SELECT path, kind, block, copy_path, checksum, size, created_at FROM backups WHERE path = ?',
+            (self._key(file_path),)
+        ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(('path', 'kind', 'block', 'copy_path', 'checksum', 'size', 'created_at'), row))
+
+    def has_backup(self, file_path):
+        return self.get(file_path) is not None
+
+    def list_backups(self):
+        """Summaries of all journal entries, without the metadata blocks."""
+        rows = self._connect().execute(
+            'SELECT path, kind, length(block), copy_path, size, created_at FROM backups ORDER BY path'
+        ).fetchall()
+        return [
+            {'path': path, 'kind': kind, 'block_size': block_size or 0, 'copy_path': copy_path,
+             'size': size, 'created_at': created_at}
+            for path, kind, block_size, copy_path, size, created_at in rows
+        ]
+
+    def _capture(self, file_path, media_type):
+        """Return (kind, block) for formats whose metadata can be backed up on its own, else None."""
+        lower = file_path.lower()
+        try:
+            if media_type == 'image' and lower.endswith(JPEG_EXTENSIONS):
+                return KIND_JPEG_EXIF, capture_jpeg_exif(file_path)
+            if media_type == 'image' and lower.endswith(TIFF_EXTENSIONS + PNG_EXTENSIONS):
+                # These are only ever patched in place, so the patched bytes are all that change
+                span = find_gps_span(file_path)
+                if span is not None:
+                    start, end = span[2], span[3]
+                    return KIND_GPS_SPAN, struct.pack('>Q', start) + read_span(file_path, start, end - start)
+            if media_type == 'heic':
+                tiff = read_heif_exif(file_path)
+                if tiff:
+                    return KIND_HEIF_EXIF, tiff
+            if media_type == 'video' and lower.endswith(QUICKTIME_EXTENSIONS):
+                block = capture_mp4_udta(file_path)
+                if block is not None:
+                    return KIND_MP4_UDTA, block
+        except (ExifFormatError, OSError, ValueError) as e:
+            logger.warning(f"Could not capture metadata of {file_path}, making a full copy: {e}")
+        return None
+
+    def backup(self, file_path, media_type):
+        """
+        Record the original metadata of a file before it is modified.
+
+        Does nothing if the file already has a journal entry.
+
+        Args:
+            file_path (str): Path of the media file
+            media_type (str): 'image', 'heic' or 'video'
+
+        Returns:
+            bool: True if the file is backed up, False if the backup failed
+        """
+        key = self._key(file_path)
+        try:
+            if self.has_backup(key):
+                return True
+            size = os.path.getsize(key)
+            captured = self._capture(key, media_type)
+            if captured is not None:
+                kind, block = captured
+                copy_path = None
+                digest = checksum(block)
+            else:
+                kind, block = KIND_FULL, None
+                name = hashlib.sha1(key.encode('utf-8')).hexdigest()[:16] + '_' + os.path.basename(key)
+                copy_path = os.path.join(self.backup_folder, name)
+                digest = copy_with_checksum(key, copy_path)
+            conn = self._connect()
+            conn.execute(
+                'INSERT OR IGNORE INTO backups (path, kind, block, copy_path, checksum, size, created_at)'
+                ' VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (key, kind, block, copy_path, digest, size, time.time())
+            )
+            conn.commit()
+            logger.debug(f"Backed up {file_path} ({kind}, {len(block) if block is not None else size} bytes)")
+            return True
+        except Exception as e:
+            logger.error(f"Backup of {file_path} failed: {e}")
+            return False
+
+    def restore(self, file_path):
+        """
+        Re-apply the original metadata of a file and drop its journal entry.
+
+        Returns:
+            bool: True if the file was restored
+        """
+        entry = self.get(file_path)
+        if entry is None:
+            logger.warning(f"No backup recorded for {file_path}")
+            return False
+        key = entry['path']
+        try:
+            if entry['kind'] == KIND_FULL:
+                if file_checksum(entry['copy_path']) != entry['checksum']:
+                    raise ValueError(f"Checksum mismatch for backup copy {entry['copy_path']}")
+                shutil.copy2(entry['copy_path'], key)
+            else:
+                block = entry['block'] or b''
+                if checksum(block) != entry['checksum']:
+                    raise ValueError("Checksum mismatch for journaled metadata")
+                if entry['kind'] == KIND_JPEG_EXIF:
+                    restore_jpeg_exif(key, block)
+                elif entry['kind'] == KIND_GPS_SPAN:
+                    write_span(key, struct.unpack('>Q', block[:8])[0], block[8:])
+                elif entry['kind'] == KIND_HEIF_EXIF:
+                    if not write_heif_exif(key, block):
+                        raise ValueError("Could not write the HEIF Exif item")
+                elif entry['kind'] == KIND_MP4_UDTA:
+                    # Put the original udta box back as-is, remuxing with ffmpeg only if that fails
+                    if not write_quicktime_udta(key, block):
+                        restore_mp4_location(key, udta_location(block))
+                else:
+                    raise ValueError(f"Unknown backup kind {entry['kind']}")
+        except Exception as e:
+            logger.error(f"Restore of {file_path} failed: {e}")
+            return False
+        self.discard(key)
+        logger.info(f"Restored original metadata of {file_path} ({entry['kind']})")
+        return True
+
+    def discard(self, file_path):
+        """Forget the backup of a file, deleting its full copy if there is one."""
+        entry = self.get(file_path)
+        if entry is None:
+            return
+        if entry['copy_path'] and os.path.exists(entry['copy_path']):
+            os.remove(entry['copy_path'])
+        conn = self._connect()
+        conn.execute('DELETE FROM backups WHERE path = ?', (entry['path'],))
+        conn.commit()
+
+
+def restore_jpeg_exif(file_path, payload):
+    """Put back the original Exif segment of a JPEG, or remove Exif if it had none."""
+    if payload:
+        piexif.insert(payload, file_path)
+    else:
+        piexif.remove(file_path)
+
+
+def restore_mp4_location(file_path, location):
+    """Rewrite the location metadata of a video with ffmpeg, clearing it when location is None."""
+    handle, temp_file = tempfile.mkstemp(suffix=os.path.splitext(file_path)[1], dir=os.path.dirname(file_path))
+    os.close(handle)
+    try:
+        result = subprocess.run(
+            ['ffmpeg', '-y', '-i', file_path, '-map_metadata', '0',
+             '-metadata', f'location={location or ""}', '-codec', 'copy', temp_file],
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
+        )
+        if result.returncode != 0:
+            raise RuntimeError(f"FFmpeg error: {result.stderr}")
+        shutil.move(temp_file, file_path)
+    finally:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+
+
+_default_journal = None
+_default_journal_lock = threading.Lock()
+
+
+def get_backup_journal():
+    """Return the shared BackupJournal instance, creating it on first use."""
+    global _default_journal
+    with _default_journal_lock:
+        if _default_journal is None:
+            _default_journal = BackupJournal()
+        return _default_journal
@@ -0,0 +1,131 @@
+import io
+import os
+import struct
+
+from PIL import Image
+
+from utils import setup_logger
+from exif_fast import JPEG_EXTENSIONS, TIFF_EXTENSIONS, ExifFormatError, TiffReader, find_jpeg_exif
+from heif_meta import HEIF_EXTENSIONS, HeifFormatError, read_heif_meta, exif_item_tiff
+
+# Setup logger
+logger = setup_logger()
+
+# IFD tags of the embedded thumbnail and the image orientation
+TAG_ORIENTATION = 0x0112
+TAG_JPEG_IF_OFFSET = 0x0201
+TAG_JPEG_IF_LENGTH = 0x0202
+
+# EXIF orientation -> transpose that makes the image upright
+ORIENTATION_TRANSPOSE = {
+    2: Image.FLIP_LEFT_RIGHT,
+    3: Image.ROTATE_180,
+    4: Image.FLIP_TOP_BOTTOM,
+    5: Image.TRANSPOSE,
+    6: Image.ROTATE_270,
+    7: Image.TRANSVERSE,
+    8: Image.ROTATE_90,
+}
+
+# Embedded thumbnails are small; anything larger is probably a bogus offset
+MAX_THUMBNAIL_SIZE = 1024 * 1024
+
+
+def tiff_thumbnail(read):
+    """
+    Extract the JPEG thumbnail from IFD1 of a TIFF/EXIF structure.
+
+    Args:
+        read (callable): read(offset, length) relative to the TIFF header
+
+    Returns:
+        tuple: (jpeg_bytes, orientation) or None if there is no JPEG thumbnail
+    """
+    tiff = TiffReader(read)
+    ifd0 = tiff.read_ifd(tiff.ifd0_offset)
+    orientation = tiff.long(ifd0[TAG_ORIENTATION]) if TAG_ORIENTATION in ifd0 else 1
+    ifd1_offset = tiff.next_ifd_offset(tiff.ifd0_offset)
+    if not ifd1_offset:
+        return None
+    ifd1 = tiff.read_ifd(ifd1_offset)
+    if TAG_JPEG_IF_OFFSET not in ifd1 or TAG_JPEG_IF_LENGTH not in ifd1:
+        return None
+    offset, length = tiff.long(ifd1[TAG_JPEG_IF_OFFSET]), tiff.long(ifd1[TAG_JPEG_IF_LENGTH])
+    if not 0 < length <= MAX_THUMBNAIL_SIZE:
+        return None
+    data = read(offset, length)
+    if len(data) != length or data[:2] != b'\xff\xd8':
+        return None
+    return data, orientation
+
+
+def heif_thumbnail(f, file_size):
+    """
+    Extract an embedded JPEG thumbnail from a HEIF file.
+
+    Prefers a 'jpeg' item referencing the primary image with 'thmb', then the
+    IFD1 thumbnail of the Exif item. HEVC-coded thumbnails (the usual case on
+    iPhones) would need a decoder and are skipped.
+
+    Returns:
+        tuple: (jpeg_bytes, orientation) or None
+    """
+    meta = read_heif_meta(f, file_size)
+    for item_id in meta.referencing('thmb', meta.primary_item):
+        if meta.items.get(item_id) == 'jpeg':
+            data = meta.read_item(f, item_id)
+            if data[:2] == b'\xff\xd8' and len(data) <= MAX_THUMBNAIL_SIZE:
+                # HEIF rotation is applied through item properties, not EXIF, and the thumbnail follows it
+                return data, 1
+    exif_item = meta.exif_item()
+    if exif_item is None:
+        return None
+    tiff = exif_item_tiff(meta.read_item(f, exif_item))
+    if not tiff:
+        return None
+    found = tiff_thumbnail(lambda offset, length: tiff[offset:offset + length])
+    # The HEIF container already rotates the primary image, so ignore the EXIF orientation
+    return (found[0], 1) if found else None
+
+
+def read_embedded_thumbnail(file_path):
+    """
+    Read the thumbnail embedded in a JPEG, TIFF or HEIC file without decoding the image.
+
+    Args:
+        file_path (str): Path of the image
+
+    Returns:
+        tuple: (jpeg_bytes, orientation) where orientation is the EXIF orientation of the
+               image (1 = upright), or None if the file has no usable embedded thumbnail
+    """
+    file_lower = file_path.lower()
+    try:
+        with open(file_path, 'rb') as f:
+            if file_lower.endswith(JPEG_EXTENSIONS):
+                found = find_jpeg_exif(f)
+                if found is None:
+                    return None
+                block = found[0]
+                return tiff_thumbnail(lambda offset, length: block[offset:offset + length])
+            if file_lower.endswith(TIFF_EXTENSIONS):
+                def read(offset, length):
+                    f.seek(offset)
+                    return f.read(length)
+                return tiff_thumbnail(read)
+            if file_lower.endswith(HEIF_EXTENSIONS):
+                return heif_thumbnail(f, os.fstat(f.fileno()).st_size)
+    except (ExifFormatError, HeifFormatError, struct.error, IndexError, OSError) as e:
+        logger.debug(f"No embedded thumbnail in {file_path}: {e}")
+    return None
+
+
+def upright_thumbnail(data, orientation):
+    """Apply an EXIF orientation to thumbnail JPEG bytes, re-encoding only when it is not upright."""
+    method = ORIENTATION_TRANSPOSE.get(orientation)
+    if method is None:
+        return data
+    with Image.open(io.BytesIO(data)) as img:
+        out = io.BytesIO()
+        img.transpose(method).convert('RGB').save(out, format='JPEG', quality=85)
+    return out.getvalue()
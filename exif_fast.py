@@ -0,0 +1,251 @@
+import struct
+from datetime import datetime, timedelta, timezone
+
+from utils import setup_logger
+
+# Setup logger
+logger = setup_logger()
+
+JPEG_EXTENSIONS = ('.jpg', '.jpeg')
+TIFF_EXTENSIONS = ('.tif', '.tiff')
+
+# How much of a JPEG to read up front; the Exif APP1 segment almost always fits
+JPEG_HEAD_SIZE = 64 * 1024
+
+# TIFF/EXIF tag ids
+TAG_EXIF_IFD = 0x8769
+TAG_GPS_IFD = 0x8825
+TAG_DATETIME_ORIGINAL = 0x9003
+TAG_OFFSET_TIME_ORIGINAL = 0x9011
+GPS_LATITUDE_REF = 1
+GPS_LATITUDE = 2
+GPS_LONGITUDE_REF = 3
+GPS_LONGITUDE = 4
+
+# TIFF field type -> size in bytes of a single value
+TYPE_SIZES = {1: 1, 2: 1, 3: 2, 4: 4, 5: 8, 7: 1, 9: 4, 10: 8}
+
+# Guard against corrupt IFDs claiming huge entry counts
+MAX_IFD_ENTRIES = 1024
+
+
+class ExifFormatError(Exception):
+    """Raised when a file does not fit the fast path and a full EXIF parser should be used."""
+
+
+def find_jpeg_exif(f):
+    """
+    Locate the Exif APP1 segment of a JPEG, reading only the header segments.
+
+    Returns:
+        tuple: (tiff_bytes, tiff_offset_in_file), or None if the JPEG has no EXIF
+    """
+    f.seek(0)
+    head = f.read(JPEG_HEAD_SIZE)
+    if head[:2] != b'\xff\xd8':
+        raise ExifFormatError("Not a JPEG file")
+
+    pos = 2
+    while True:
+        if pos + 4 > len(head):
+            more = f.read(JPEG_HEAD_SIZE)
+            if not more:
+                return None
+            head += more
+            if pos + 4 > len(head):
+                raise ExifFormatError("Truncated JPEG header")
+        if head[pos] != 0xFF:
+            raise ExifFormatError(f"Invalid JPEG marker at offset {pos}")
+        marker = head[pos + 1]
+        if marker == 0xFF:
+            # Fill byte
+            pos += 1
+            continue
+        if marker in (0xD9, 0xDA):
+            # End of image or start of scan: no more metadata segments
+            return None
+        if 0xD0 <= marker <= 0xD7 or marker == 0x01:
+            pos += 2
+            continue
+        length = struct.unpack_from('>H', head, pos + 2)[0]
+        segment_end = pos + 2 + length
+        if segment_end > len(head):
+            head += f.read(segment_end - len(head))
+            if segment_end > len(head):
+                raise ExifFormatError("Truncated JPEG segment")
+        if marker == 0xE1 and head[pos + 4:pos + 10] == b'Exif\x00\x00':
+            return head[pos + 10:segment_end], pos + 10
+        pos = segment_end
+
+
+class TiffReader:
+    """Minimal TIFF IFD reader over a read(offset, length) callable."""
+
+    def __init__(self, read):
+        self.read = read
+        header = read(0, 8)
+        if len(header) < 8:
+            raise ExifFormatError("Truncated TIFF header")
+        if header[:2] == b'II':
+            self.endian = '<'
+        elif header[:2] == b'MM':
+            self.endian = '>'
+        else:
+            raise ExifFormatError("Invalid TIFF byte order")
+        magic, self.ifd0_offset = struct.unpack(self.endian + 'HI', header[2:8])
+        if magic != 42:
+            raise ExifFormatError("Invalid TIFF magic number")
+
+    def read_ifd(self, offset):
+        """
+        Read an IFD's entries.
+
+        Returns:
+            dict: tag -> (field_type, count, value_offset, inline_bytes)
+        """
+        raw_count = self.read(offset, 2)
+        if len(raw_count) < 2:
+            raise ExifFormatError(f"IFD offset {offset} out of range")
+        count = struct.unpack(self.endian + 'H', raw_count)[0]
+        if count > MAX_IFD_ENTRIES:
+            raise ExifFormatError(f"Implausible IFD entry count {count}")
+        table = self.read(offset + 2, count * 12)
+        if len(table) < count * 12:
+            raise ExifFormatError("Truncated IFD")
+
+        entries = {}
+        for i in range(count):
+            tag, field_type, n = struct.unpack_from(self.endian + 'HHI', table, i * 12)
+            inline = table[i * 12 + 8:i * 12 + 12]
+            value_offset = offset + 2 + i * 12 + 8
+            if TYPE_SIZES.get(field_type, 1) * n > 4:
+                value_offset = struct.unpack(self.endian + 'I', inline)[0]
+            entries[tag] = (field_type, n, value_offset)
+        return entries
+
+    def next_ifd_offset(self, offset):
+        """Return the offset of the IFD chained after the one at offset (0 if none)."""
+        raw_count = self.read(offset, 2)
+        if len(raw_count) < 2:
+            raise ExifFormatError(f"IFD offset {offset} out of range")
+        count = struct.unpack(self.endian + 'H', raw_count)[0]
+        raw_next = self.read(offset + 2 + count * 12, 4)
+        if len(raw_next) < 4:
+            return 0
+        return struct.unpack(self.endian + 'I', raw_next)[0]
+
+    def value_bytes(self, entry):
+        """Return the raw bytes of an IFD entry's value."""
+        field_type, n, value_offset = entry
+        size = TYPE_SIZES.get(field_type, 1) * n
+        data = self.read(value_offset, size)
+        if len(data) < size:
+            raise ExifFormatError("IFD value out of range")
+        return data
+
+    def ascii(self, entry):
+        return self.value_bytes(entry).split(b'\x00', 1)[0].decode('ascii', 'replace').strip()
+
+    def long(self, entry):
+        field_type = entry[0]
+        fmt = 'H' if field_type == 3 else 'I'
+        return struct.unpack(self.endian + fmt, self.value_bytes(entry)[:struct.calcsize(fmt)])[0]
+
+    def rationals(self, entry):
+        field_type, n, _ = entry
+        if field_type not in (5, 10):
+            raise ExifFormatError(f"Expected RATIONAL, got type {field_type}")
+        fmt = 'i' if field_type == 10 else 'I'
+        values = struct.unpack(self.endian + fmt * (2 * n), self.value_bytes(entry))
+        return [values[i] / values[i + 1] if values[i + 1] else 0.0 for i in range(0, len(values), 2)]
+
+
+def parse_offset(offset_str):
+    """Parse an EXIF OffsetTime value (e.g. '+02:00') into a tzinfo, or None."""
+    try:
+        sign = -1 if offset_str[0] == '-' else 1
+        hours, minutes = offset_str[1:].split(':')
+        return timezone(sign * timedelta(hours=int(hours), minutes=int(minutes)))
+    except (ValueError, IndexError):
+        return None
+
+
+def exif_datetime(dt_str, offset_str=None):
+    """
+    Build an aware datetime from DateTimeOriginal and OffsetTimeOriginal.
+
+    Without an offset the time is treated as UTC, matching the rest of the application.
+    """
+    dt = datetime.strptime(dt_str.strip(), '%Y:%m:%d %H:%M:%S')
+    tz = parse_offset(offset_str) if offset_str else None
+    return dt.replace(tzinfo=tz or timezone.utc)
+
+
+def read_tiff_metadata(tiff):
+    """Decode DateTimeOriginal, OffsetTimeOriginal and GPS from a TiffReader."""
+    result = {'datetime': None, 'date_taken': None, 'gps': None}
+    ifd0 = tiff.read_ifd(tiff.ifd0_offset)
+
+    if TAG_EXIF_IFD in ifd0:
+        exif_ifd = tiff.read_ifd(tiff.long(ifd0[TAG_EXIF_IFD]))
+        if TAG_DATETIME_ORIGINAL in exif_ifd:
+            dt_str = tiff.ascii(exif_ifd[TAG_DATETIME_ORIGINAL])
+            offset_str = tiff.ascii(exif_ifd[TAG_OFFSET_TIME_ORIGINAL]) if TAG_OFFSET_TIME_ORIGINAL in exif_ifd else None
+            result['date_taken'] = dt_str
+            try:
+                result['datetime'] = exif_datetime(dt_str, offset_str)
+            except ValueError:
+                logger.debug(f"Unparsable DateTimeOriginal: {dt_str}")
+
+    if TAG_GPS_IFD in ifd0:
+        gps_ifd = tiff.read_ifd(tiff.long(ifd0[TAG_GPS_IFD]))
+        if GPS_LATITUDE in gps_ifd and GPS_LONGITUDE in gps_ifd:
+            lat = tiff.rationals(gps_ifd[GPS_LATITUDE])
+            lon = tiff.rationals(gps_ifd[GPS_LONGITUDE])
+            if len(lat) < 3 or len(lon) < 3:
+                raise ExifFormatError("Incomplete GPS coordinates")
+            lat = lat[0] + lat[1] / 60 + lat[2] / 3600
+            lon = lon[0] + lon[1] / 60 + lon[2] / 3600
+            if GPS_LATITUDE_REF in gps_ifd and tiff.ascii(gps_ifd[GPS_LATITUDE_REF]) == 'S':
+                lat = -lat
+            if GPS_LONGITUDE_REF in gps_ifd and tiff.ascii(gps_ifd[GPS_LONGITUDE_REF]) == 'W':
+                lon = -lon
+            result['gps'] = (lat, lon)
+
+    return result
+
+
+def read_fast_exif(file_path):
+    """
+    Read DateTimeOriginal/OffsetTimeOriginal and GPS from a JPEG or TIFF header.
+
+    Only the APP1 segment of a JPEG (or the IFDs of a TIFF) is read; thumbnails
+    and unrelated IFDs are never touched.
+
+    Args:
+        file_path (str): Path of the .jpg/.jpeg/.tif/.tiff file
+
+    Returns:
+        dict: 'datetime', 'date_taken' and 'gps' ((lat, lon) or None, not yet validated),
+              or None when the file doesn't fit the fast path and a full parser should be used
+    """
+    file_lower = file_path.lower()
+    try:
+        with open(file_path, 'rb') as f:
+            if file_lower.endswith(JPEG_EXTENSIONS):
+                found = find_jpeg_exif(f)
+                if found is None:
+                    return {'datetime': None, 'date_taken': None, 'gps': None}
+                block = found[0]
+                tiff = TiffReader(lambda offset, length: block[offset:offset + length])
+            elif file_lower.endswith(TIFF_EXTENSIONS):
+                def read(offset, length):
+                    f.seek(offset)
+                    return f.read(length)
+                tiff = TiffReader(read)
+            else:
+                return None
+            return read_tiff_metadata(tiff)
+    except (ExifFormatError, struct.error, IndexError, ValueError) as e:
+        logger.debug(f"Fast EXIF path not applicable to {file_path}: {e}")
+        return None
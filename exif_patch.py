@@ -0,0 +1,308 @@
+import os
+import struct
+import zlib
+
+from utils import setup_logger
+from exif_fast import (JPEG_EXTENSIONS, TIFF_EXTENSIONS, TAG_GPS_IFD, GPS_LATITUDE_REF, GPS_LATITUDE,
+                       GPS_LONGITUDE_REF, GPS_LONGITUDE, ExifFormatError, TiffReader, find_jpeg_exif)
+from heif_meta import HEIF_EXTENSIONS, HeifFormatError, read_heif_meta
+
+# Setup logger
+logger = setup_logger()
+
+PNG_EXTENSIONS = ('.png',)
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+# Refuse in-place patches whose GPS fields are spread over more than this many bytes
+MAX_PATCH_SPAN = 64 * 1024
+
+# TIFF field types used by the GPS position tags
+TYPE_ASCII = 2
+TYPE_RATIONAL = 5
+
+# GPS position tags patched in place: tag -> (field type, value count, bytes written)
+GPS_FIELDS = {
+    GPS_LATITUDE_REF: (TYPE_ASCII, 2, 2),
+    GPS_LATITUDE: (TYPE_RATIONAL, 3, 24),
+    GPS_LONGITUDE_REF: (TYPE_ASCII, 2, 2),
+    GPS_LONGITUDE: (TYPE_RATIONAL, 3, 24),
+}
+
+
+def dms_rationals(decimal):
+    """Decimal degrees to ((deg, 1), (min, 1), (sec * 1000, 1000)), as written by the full EXIF rewrite."""
+    decimal = abs(decimal)
+    degrees = int(decimal)
+    remainder = (decimal - degrees) * 60
+    minutes = int(remainder)
+    seconds = (remainder - minutes) * 60
+    return ((degrees, 1), (minutes, 1), (int(seconds * 1000), 1000))
+
+
+def find_png_exif_chunk(f, file_size):
+    """
+    Locate the eXIf chunk of a PNG by walking the chunk headers.
+
+    Returns:
+        tuple: (data_offset, data_length) of the chunk, or None if the PNG has no eXIf chunk
+    """
+    f.seek(0)
+    if f.read(8) != PNG_SIGNATURE:
+        raise ExifFormatError("Not a PNG file")
+    pos = 8
+    while pos + 8 <= file_size:
+        f.seek(pos)
+        length, chunk_type = struct.unpack('>I4s', f.read(8))
+        if pos + 12 + length > file_size:
+            raise ExifFormatError("Truncated PNG chunk")
+        if chunk_type == b'eXIf':
+            return pos + 8, length
+        if chunk_type == b'IEND':
+            return None
+        pos += 12 + length
+    return None
+
+
+def locate_tiff_block(f, file_path):
+    """
+    Find the TIFF structure holding a file's EXIF.
+
+    Returns:
+        tuple: (base_offset, limit, read) where base_offset is the file offset of the TIFF header,
+               limit the number of bytes the TIFF structure may span and read(offset, length) reads
+               relative to the header; or None if the file has no EXIF
+    """
+    file_lower = file_path.lower()
+    file_size = os.fstat(f.fileno()).st_size
+    if file_lower.endswith(JPEG_EXTENSIONS):
+        found = find_jpeg_exif(f)
+        if found is None:
+            return None
+        block, base = found
+        return base, len(block), lambda offset, length: block[offset:offset + length]
+    if file_lower.endswith(TIFF_EXTENSIONS):
+        base, limit = 0, file_size
+    elif file_lower.endswith(PNG_EXTENSIONS):
+        chunk = find_png_exif_chunk(f, file_size)
+        if chunk is None:
+            return None
+        base, limit = chunk
+        f.seek(base)
+        if f.read(6) == b'Exif\x00\x00':
+            # Some writers keep the JPEG APP1 prefix inside eXIf
+            base, limit = base + 6, limit - 6
+    elif file_lower.endswith(HEIF_EXTENSIONS):
+        meta = read_heif_meta(f, file_size)
+        exif_item = meta.exif_item()
+        item_range = meta.item_range(exif_item) if exif_item is not None else None
+        if item_range is None:
+            return None
+        start, length = item_range
+        # Exif item payload: u32 offset to the TIFF header, usually pointing past b'Exif\0\0'
+        f.seek(start)
+        tiff_offset = struct.unpack('>I', f.read(4))[0]
+        base, limit = start + 4 + tiff_offset, length - 4 - tiff_offset
+        f.seek(base)
+        if f.read(6) == b'Exif\x00\x00':
+            base, limit = base + 6, limit - 6
+        if limit <= 0:
+            raise ExifFormatError("Empty Exif item")
+    else:
+        return None
+
+    def read(offset, length):
+        length = max(0, min(length, limit - offset))
+        f.seek(base + offset)
+        return f.read(length)
+    return base, limit, read
+
+
+def trimmed_gps_ifd(tiff, ifd_offset):
+    """
+    Entry table of a GPS IFD reduced to GPSVersionID and the four position tags.
+
+    The full rewrite replaces the whole GPS IFD, so altitude, timestamps,
+    direction and the like describe the old position and must go. Dropping
+    entries from the end of the table keeps the kept entries (and inline
+    values such as the refs) at their offsets; their count shrinks and the
+    next-IFD offset moves up. Values of dropped entries stay as unreferenced bytes.
+
+    Returns:
+        bytes: Replacement for the count, entries and next-IFD offset (same length, zero padded),
+               b'' if there is nothing to drop, or None if the table cannot be trimmed in place
+    """
+    count = struct.unpack(tiff.endian + 'H', tiff.read(ifd_offset, 2))[0]
+    table = tiff.read(ifd_offset + 2, count * 12 + 4)
+    if len(table) < count * 12 + 4:
+        raise ExifFormatError("Truncated GPS IFD")
+    tags = [struct.unpack_from(tiff.endian + 'H', table, i * 12)[0] for i in range(count)]
+    kept = sum(1 for tag in tags if tag <= GPS_LONGITUDE)
+    if kept == count:
+        return b''
+    if any(tag > GPS_LONGITUDE for tag in tags[:kept]):
+        # Position tags are not a prefix of the (unsorted) table; moving entries would move inline values
+        return None
+    trimmed = struct.pack(tiff.endian + 'H', kept) + table[:kept * 12] + table[count * 12:]
+    return trimmed + b'\x00' * (2 + len(table) - len(trimmed))
+
+
+def locate_gps_fields(f, file_path):
+    """
+    Find the byte positions of GPSLatitudeRef, GPSLatitude, GPSLongitudeRef and GPSLongitude.
+
+    Only succeeds when all four tags exist with the types and counts the new
+    values need (ASCII refs, three RATIONALs per coordinate), which is what
+    makes patching them in place possible.
+
+    Returns:
+        tuple: (endian, positions, trim) where positions maps the tag to its absolute file offset
+               and trim is None or (file offset, bytes) of the GPS IFD table without the tags
+               beyond the position (see trimmed_gps_ifd); or None if the fields cannot be patched in place
+    """
+    located = locate_tiff_block(f, file_path)
+    if located is None:
+        return None
+    base, limit, read = located
+    tiff = TiffReader(read)
+    ifd0 = tiff.read_ifd(tiff.ifd0_offset)
+    if TAG_GPS_IFD not in ifd0:
+        return None
+    gps_ifd_offset = tiff.long(ifd0[TAG_GPS_IFD])
+    gps_ifd = tiff.read_ifd(gps_ifd_offset)
+    trimmed = trimmed_gps_ifd(tiff, gps_ifd_offset)
+    if trimmed is None:
+        return None
+    trim = (base + gps_ifd_offset, trimmed) if trimmed else None
+
+    positions = {}
+    for tag, (field_type, count, size) in GPS_FIELDS.items():
+        entry = gps_ifd.get(tag)
+        if entry is None or entry[0] != field_type or entry[1] < count or (field_type == TYPE_RATIONAL and entry[1] != count):
+            return None
+        value_offset = entry[2]
+        if value_offset + size > limit:
+            raise ExifFormatError(f"GPS tag {tag} value out of range")
+        positions[tag] = base + value_offset
+    return tiff.endian, positions, trim
+
+
+def fix_png_chunk_crc(f, offset):
+    """Recompute the CRC of the PNG chunk containing the file offset."""
+    file_size = os.fstat(f.fileno()).st_size
+    chunk = find_png_exif_chunk(f, file_size)
+    if chunk is None or not chunk[0] <= offset < chunk[0] + chunk[1]:
+        raise ExifFormatError("Patched bytes are not inside the eXIf chunk")
+    data_offset, length = chunk
+    f.seek(data_offset - 4)
+    crc = zlib.crc32(f.read(4 + length)) & 0xFFFFFFFF
+    f.seek(data_offset + length)
+    f.write(struct.pack('>I', crc))
+
+
+def read_span(file_path, offset, length):
+    """Read length bytes at offset, e.g. to journal the bytes a patch will overwrite."""
+    with open(file_path, 'rb') as f:
+        f.seek(offset)
+        return f.read(length)
+
+
+def write_span(file_path, offset, data):
+    """
+    Overwrite bytes at offset with a single write, keeping PNG chunk CRCs valid.
+
+    Used both for GPS patches and to put journaled bytes back.
+    """
+    with open(file_path, 'r+b') as f:
+        f.seek(offset)
+        f.write(data)
+        if file_path.lower().endswith(PNG_EXTENSIONS):
+            fix_png_chunk_crc(f, offset)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def find_gps_span(file_path):
+    """
+    Find the byte range an in-place GPS patch of this file would overwrite.
+
+    Returns:
+        tuple: (endian, positions, start, end, trim) or None if the file needs a full EXIF rewrite
+    """
+    try:
+        with open(file_path, 'rb') as f:
+            located = locate_gps_fields(f, file_path)
+    except (ExifFormatError, HeifFormatError, struct.error, OSError, ValueError) as e:
+        logger.debug(f"In-place GPS patch not applicable to {file_path}: {e}")
+        return None
+    if located is None:
+        return None
+    endian, positions, trim = located
+    ranges = [(positions[tag], positions[tag] + size) for tag, (_, _, size) in GPS_FIELDS.items()]
+    if trim is not None:
+        ranges.append((trim[0], trim[0] + len(trim[1])))
+    start = min(r[0] for r in ranges)
+    end = max(r[1] for r in ranges)
+    if end - start > MAX_PATCH_SPAN:
+        logger.debug(f"GPS fields of {file_path} span {end - start} bytes, not patching in place")
+        return None
+    return endian, positions, start, end, trim
+
+
+def gps_patch(file_path, lat, lon):
+    """
+    Plan an in-place GPS patch.
+
+    Returns:
+        tuple: (offset, original_bytes, patched_bytes) covering all four GPS fields,
+               or None if the file needs a full EXIF rewrite
+    """
+    span = find_gps_span(file_path)
+    if span is None:
+        return None
+    endian, positions, start, end, trim = span
+
+    values = {
+        GPS_LATITUDE_REF: b'N\x00' if lat >= 0 else b'S\x00',
+        GPS_LATITUDE: struct.pack(endian + 'II' * 3, *(n for pair in dms_rationals(lat) for n in pair)),
+        GPS_LONGITUDE_REF: b'E\x00' if lon >= 0 else b'W\x00',
+        GPS_LONGITUDE: struct.pack(endian + 'II' * 3, *(n for pair in dms_rationals(lon) for n in pair)),
+    }
+    original = read_span(file_path, start, end - start)
+    if len(original) != end - start:
+        return None
+    patched = bytearray(original)
+    if trim is not None:
+        pos = trim[0] - start
+        patched[pos:pos + len(trim[1])] = trim[1]
+    for tag, value in values.items():
+        pos = positions[tag] - start
+        patched[pos:pos + len(value)] = value
+    return start, original, bytes(patched)
+
+
+def patch_gps_in_place(file_path, lat, lon):
+    """
+    Overwrite the GPS position of a JPEG, TIFF, PNG (eXIf) or HEIC (Exif item) in place.
+
+    When the file already has a GPS IFD whose position tags can hold the new
+    values, only the bytes of those tags are rewritten with a single small
+    write instead of re-serializing the EXIF and copying the whole file.
+    Other GPS tags (altitude, timestamps, direction, ...) are dropped from the
+    IFD in the same write, matching the full rewrite, which replaces the IFD.
+
+    Args:
+        file_path (str): Path of the image
+        lat (float): Latitude in decimal degrees
+        lon (float): Longitude in decimal degrees
+
+    Returns:
+        bool: True if the file was patched, False if a full rewrite is needed
+    """
+    patch = gps_patch(file_path, lat, lon)
+    if patch is None:
+        return False
+    offset, original, patched = patch
+    if patched != original:
+        write_span(file_path, offset, patched)
+    logger.debug(f"Patched GPS of {file_path} in place ({len(patched)} bytes at offset {offset})")
+    return True
@@ -0,0 +1,187 @@
+import os
+import uuid
+import hashlib
+import threading
+from collections import OrderedDict
+
+from utils import setup_logger
+
+# Setup logger
+logger = setup_logger()
+
+# Root of the on-disk caches (thumbnails, previews)
+CACHE_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'cache')
+
+
+def source_digest(file_path, variant=''):
+    """
+    Stable cache key for a version of a file: digest of its path, size and mtime.
+
+    Unlike hash(), the digest is the same in every process, and it changes
+    whenever the file is rewritten, so stale entries are never served.
+
+    Args:
+        file_path (str): Source file
+        variant (str): Distinguishes several derived files of one source (e.g. a preview width)
+
+    Returns:
+        str: Hex digest
+    """
+    stat = os.stat(file_path)
+    raw = f"{os.path.abspath(file_path)}\0{stat.st_size}\0{stat.st_mtime_ns}\0{variant}"
+    return hashlib.sha1(raw.encode('utf-8', 'surrogateescape')).hexdigest()
+
+
+class FileCache:
+    """
+    Directory of derived files (thumbnails, previews) with a byte budget and LRU eviction.
+
+    Entries are keyed by source_digest(), so a file is generated at most once
+    per version of its source. The index is an OrderedDict kept in LRU order,
+    giving O(1) lookups; it is rebuilt from the directory at startup using
+    file mtimes, which are bumped on every hit so the order survives restarts.
+    New entries are written to a temporary name and renamed into place.
+    """
+
+    def __init__(self, directory, max_bytes, suffix='.jpg', name='cache'):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # key -> size in bytes, least recently used first
+        self._total = 0
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + self.suffix)
+
+    def _load(self):
+        """Index the files already in the cache directory, oldest access first."""
+        found = []
+        for entry in os.scandir(self.directory):
+            if not entry.is_file():
+                continue
+            if entry.name.startswith('.'):
+                # Leftover from an interrupted write
+                os.remove(entry.path)
+                continue
+            if entry.name.endswith(self.suffix):
+                stat = entry.stat()
+                found.append((stat.st_mtime, entry.name[:-len(self.suffix)], stat.st_size))
+        for _, key, size in sorted(found):
+            self._entries[key] = size
+            self._total += size
+        logger.info(f"{self.name}: {len(self._entries)} entries, {self._total} bytes in {self.directory}")
+        self._evict()
+
+    def _evict(self):
+        """Drop least recently used entries until the cache fits its budget. Call with the lock held."""
+        while self._total > self.max_bytes and self._entries:
+            key, size = self._entries.popitem(last=False)
+            self._total -= size
+            self.evictions += 1
+            try:
+                os.remove(self._path(key))
+            except OSError as e:
+                logger.debug(f"Could not remove evicted {self.name} entry {key}: {e}")
+
+    def get(self, key):
+        """Return the path of a cached entry and mark it recently used, or None."""
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+        path = self._path(key)
+        try:
+            os.utime(path)
+        except OSError:
+            # Removed behind our back
+            with self._lock:
+                size = self._entries.pop(key, None)
+                if size is not None:
+                    self._total -= size
+            return None
+        return path
+
+    def put(self, key, temp_path):
+        """Move a finished temporary file into the cache under key and return its final path."""
+        path = self._path(key)
+        os.replace(temp_path, path)
+        size = os.path.getsize(path)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._total -= old
+            self._entries[key] = size
+            self._total += size
+            self._evict()
+        return path
+
+    def get_or_create(self, file_path, create, variant=''):
+        """
+        Return the cached file derived from file_path, generating it with create() on a miss.
+
+        Concurrent requests for the same entry wait for a single generation.
+
+        Args:
+            file_path (str): Source file the entry is derived from
+            create (callable): create(output_path) writes the entry and returns True on success
+            variant (str): Passed to source_digest() to tell derived files of one source apart
+
+        Returns:
+            str: Path of the cached file, or None if it could not be generated
+        """
+        key = source_digest(file_path, variant)
+        path = self.get(key)
+        if path:
+            self.hits += 1
+            return path
+
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            try:
+                path = self.get(key)
+                if path:
+                    self.hits += 1
+                    return path
+                self.misses += 1
+                temp_path = os.path.join(self.directory, f".{key}.{uuid.uuid4().hex[:8]}{self.suffix}")
+                try:
+                    if not create(temp_path) or not os.path.exists(temp_path):
+                        self.errors += 1
+                        return None
+                    return self.put(key, temp_path)
+                finally:
+                    if os.path.exists(temp_path):
+                        os.remove(temp_path)
+            finally:
+                with self._lock:
+                    self._key_locks.pop(key, None)
+
+    def contains_path(self, path):
+        """Check whether a path lies inside the cache directory."""
+        return os.path.dirname(os.path.abspath(path)) == os.path.abspath(self.directory)
+
+    def stats(self):
+        """Entry count, size and hit/miss counters of the cache."""
+        with self._lock:
+            entries, total = len(self._entries), self._total
+        lookups = self.hits + self.misses
+        return {
+            'entries': entries,
+            'bytes': total,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'errors': self.errors,
+            'evictions': self.evictions,
+            'hit_rate': round(self.hits / lookups, 3) if lookups else None
+        }
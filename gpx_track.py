@@ -0,0 +1,235 @@
+import os
+import calendar
+import threading
+import xml.etree.ElementTree as ET
+from array import array
+from functools import lru_cache
+
+from utils import setup_logger
+from proxy_gps import GpsTimeIndex
+
+# Setup logger
+logger = setup_logger()
+
+GPX_EXTENSIONS = ('.gpx',)
+
+# Read GPX files in chunks of this size
+READ_CHUNK_SIZE = 1024 * 1024
+
+
+@lru_cache(maxsize=4096)
+def _day_epoch(date_text):
+    """Epoch seconds of midnight UTC for a YYYY-MM-DD string (tracks span few distinct days)."""
+    return calendar.timegm((int(date_text[0:4]), int(date_text[5:7]), int(date_text[8:10]), 0, 0, 0, 0, 0, 0))
+
+
+def parse_gpx_time(text):
+    """
+    Parse a GPX <time> value (ISO 8601, e.g. 2023-05-30T12:34:56.250Z) into epoch seconds.
+
+    Slices the fixed-width fields directly instead of going through strptime,
+    which matters for tracks with millions of points.
+    """
+    text = text.strip()
+    try:
+        seconds = _day_epoch(text[:10]) + int(text[11:13]) * 3600 + int(text[14:16]) * 60 + int(text[17:19])
+        rest = text[19:]
+        if rest.startswith('.'):
+            end = 1
+            while end < len(rest) and rest[end].isdigit():
+                end += 1
+            seconds += float('0' + rest[:end])
+            rest = rest[end:]
+        if rest and rest not in ('Z', 'z'):
+            # Explicit offset: +hh:mm, +hhmm or +hh
+            sign = -1 if rest[0] == '-' else 1
+            digits = rest[1:].replace(':', '')
+            seconds -= sign * (int(digits[:2]) * 3600 + int(digits[2:4] or 0) * 60)
+        return seconds
+    except (ValueError, IndexError):
+        return None
+
+
+def _local_name(tag):
+    """Strip the XML namespace from a tag name."""
+    return tag.rsplit('}', 1)[-1]
+
+
+class _TrackpointTarget:
+    """XMLParser target that appends timed trackpoints to arrays without building a tree."""
+
+    def __init__(self):
+        self.times = array('d')
+        self.lats = array('d')
+        self.lons = array('d')
+        self.skipped = 0
+        self._point = None
+        self._time = None
+        self._time_text = None
+
+    def start(self, tag, attrib):
+        name = _local_name(tag)
+        if name == 'trkpt':
+            self._point = (attrib.get('lat'), attrib.get('lon'))
+            self._time = None
+        elif name == 'time' and self._point is not None:
+            self._time_text = []
+
+    def data(self, text):
+        if self._time_text is not None:
+            self._time_text.append(text)
+
+    def end(self, tag):
+        name = _local_name(tag)
+        if name == 'time' and self._time_text is not None:
+            self._time = parse_gpx_time(''.join(self._time_text))
+            self._time_text = None
+        elif name == 'trkpt' and self._point is not None:
+            try:
+                lat, lon = float(self._point[0]), float(self._point[1])
+            except (TypeError, ValueError):
+                self._time = None
+            if self._time is None:
+                self.skipped += 1
+            else:
+                self.times.append(self._time)
+                self.lats.append(lat)
+                self.lons.append(lon)
+            self._point = None
+
+    def close(self):
+        return self
+
+
+def read_gpx_points(file_path):
+    """
+    Stream the timed trackpoints of a GPX file into parallel arrays.
+
+    The file is fed to the XML parser in chunks and no element tree is built,
+    so memory use stays proportional to the arrays rather than the document.
+
+    Args:
+        file_path (str): Path of the GPX file
+
+    Returns:
+        tuple: (times, lats, lons) as array('d') in file order
+    """
+    parser = ET.XMLParser(target=_TrackpointTarget())
+    with open(file_path, 'rb') as f:
+        while True:
+            chunk = f.read(READ_CHUNK_SIZE)
+            if not chunk:
+                break
+            parser.feed(chunk)
+    target = parser.close()
+    if target.skipped:
+        logger.warning(f"Skipped {target.skipped} trackpoints without a usable time or position in {file_path}")
+    return target.times, target.lats, target.lons
+
+
+class GpxTrackStore:
+    """
+    Trackpoints from any number of GPX files merged into a single time index.
+
+    Points are kept per file as compact arrays of epoch seconds, latitudes
+    and longitudes, so a file that changed on disk can be reloaded on its
+    own, and queried through GpsTimeIndex (binary search plus linear
+    interpolation between trackpoints).
+    """
+
+    def __init__(self):
+        self.files = {}  # Absolute path -> (size, mtime_ns, number of trackpoints) when loaded
+        self._tracks = {}  # Absolute path -> (times, lats, lons)
+        self._count = 0
+        self._index = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._count
+
+    def add_file(self, file_path):
+        """
+        Load a GPX file into the store.
+
+        Files already loaded are skipped while their size and mtime are unchanged;
+        a changed file (e.g. a corrected track uploaded under the same name) has
+        its old points replaced.
+
+        Returns:
+            int: Number of trackpoints loaded
+        """
+        key = os.path.abspath(file_path)
+        st = os.stat(file_path)
+        signature = (st.st_size, st.st_mtime_ns)
+        with self._lock:
+            loaded = self.files.get(key)
+            if loaded and loaded[:2] == signature:
+                logger.debug(f"GPX file already loaded: {file_path}")
+                return 0
+        times, lats, lons = read_gpx_points(file_path)
+        with self._lock:
+            old = self._tracks.pop(key, None)
+            if old is not None:
+                self._count -= len(old[0])
+            self._tracks[key] = (times, lats, lons)
+            self._count += len(times)
+            self.files[key] = signature + (len(times),)
+            self._index = None
+        logger.info(f"{'Reloaded' if loaded else 'Loaded'} {len(times)} trackpoints from {file_path}")
+        return len(times)
+
+    def add_path(self, path):
+        """
+        Load a GPX file, or every .gpx file below a directory.
+
+        Returns:
+            int: Number of trackpoints added
+        """
+        if not os.path.isdir(path):
+            return self.add_file(path)
+        added = 0
+        for root, _, files in os.walk(path):
+            for file in sorted(files):
+                if file.lower().endswith(GPX_EXTENSIONS):
+                    try:
+                        added += self.add_file(os.path.join(root, file))
+                    except (ET.ParseError, OSError) as e:
+                        logger.error(f"Error loading GPX file {os.path.join(root, file)}: {e}")
+        return added
+
+    def clear(self):
+        """Remove all loaded tracks."""
+        with self._lock:
+            self.files = {}
+            self._tracks = {}
+            self._count = 0
+            self._index = None
+
+    def get_index(self):
+        """Return the GpsTimeIndex over all loaded trackpoints, building it on first use."""
+        with self._lock:
+            if self._index is None:
+                times, lats, lons = array('d'), array('d'), array('d')
+                for track_times, track_lats, track_lons in self._tracks.values():
+                    times.extend(track_times)
+                    lats.extend(track_lats)
+                    lons.extend(track_lons)
+                self._index = GpsTimeIndex.from_arrays(times, lats, lons)
+            return self._index
+
+    def interpolate_many(self, times, window_seconds):
+        """Interpolate positions for many epoch times; see GpsTimeIndex.interpolate_many."""
+        if not len(self):
+            return [None] * len(times)
+        return self.get_index().interpolate_many(times, window_seconds)
+
+    def status(self):
+        """Summary of the loaded tracks for display."""
+        with self._lock:
+            times = [track[0] for track in self._tracks.values() if len(track[0])]
+            return {
+                'files': [{'path': path, 'points': loaded[2]} for path, loaded in sorted(self.files.items())],
+                'points': self._count,
+                'start': min(min(t) for t in times) if times else None,
+                'end': max(max(t) for t in times) if times else None
+            }
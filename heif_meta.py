@@ -0,0 +1,320 @@
+import os
+import struct
+
+from utils import setup_logger
+from mp4_atoms import iter_top_level_boxes, iter_boxes
+from exif_fast import TiffReader, ExifFormatError, read_tiff_metadata
+
+# Setup logger
+logger = setup_logger()
+
+HEIF_EXTENSIONS = ('.heic', '.heif')
+
+# Brands that identify an ISO/HEIF image file
+HEIF_BRANDS = {b'heic', b'heix', b'heim', b'heis', b'hevc', b'hevx', b'mif1', b'msf1', b'avif'}
+
+# Refuse to load absurdly large meta boxes into memory
+MAX_META_SIZE = 16 * 1024 * 1024
+
+
+class HeifFormatError(Exception):
+    """Raised when a file is not a HEIF container this module can parse."""
+
+
+def _read_uint(data, pos, size):
+    """Read a big-endian unsigned integer of 0, 4 or 8 bytes (as used by iloc)."""
+    if size == 0:
+        return 0
+    if size == 4:
+        return struct.unpack_from('>I', data, pos)[0]
+    if size == 8:
+        return struct.unpack_from('>Q', data, pos)[0]
+    raise HeifFormatError(f"Unsupported iloc field size {size}")
+
+
+class HeifMeta:
+    """
+    Parsed HEIF 'meta' box: item types, item locations and item references.
+
+    Offsets recorded here are absolute file offsets so writers can patch the
+    boxes in place.
+    """
+
+    def __init__(self):
+        self.items = {}          # item_ID -> item type (e.g. 'hvc1', 'Exif')
+        self.locations = {}      # item_ID -> dict(construction_method, data_reference_index, base_offset,
+                                 #                 extents=[(offset, length)], extent_indexes, field_offsets)
+        self.references = []     # (ref_type, from_item_ID, [to_item_IDs])
+        self.primary_item = None
+        self.meta_offset = None  # File offset of the meta box header
+        self.meta_size = None
+        self.meta_header_size = None
+        self.meta_payload = None # Raw bytes of the meta box payload
+        self.iloc_offset = None  # File offset of the iloc box header
+        self.iloc_size = None
+        self.iloc_version = None
+        self.iloc_sizes = None   # (offset_size, length_size, base_offset_size, index_size)
+        self.idat_offset = None  # File offset of the idat payload
+
+    def find_items(self, item_type):
+        """Return the IDs of all items of the given type."""
+        return [item_id for item_id, t in self.items.items() if t == item_type]
+
+    def referencing(self, ref_type, to_item):
+        """Return IDs of items that reference to_item with ref_type (e.g. 'thmb', 'cdsc')."""
+        return [from_id for t, from_id, to_ids in self.references if t == ref_type and to_item in to_ids]
+
+    def exif_item(self):
+        """Return the ID of the Exif item describing the primary image (or any Exif item), or None."""
+        exif_items = self.find_items('Exif')
+        if not exif_items:
+            return None
+        described = [i for i in self.referencing('cdsc', self.primary_item) if i in exif_items]
+        return (described or exif_items)[0]
+
+    def item_range(self, item_id):
+        """
+        Return (file_offset, length) of an item stored in a single extent, or None.
+
+        An extent length of 0 means "to the end of the data" and is not resolved here.
+        """
+        location = self.locations.get(item_id)
+        if location is None or len(location['extents']) != 1:
+            return None
+        offset, length = location['extents'][0]
+        if length == 0:
+            return None
+        if location['construction_method'] == 0:
+            return location['base_offset'] + offset, length
+        if location['construction_method'] == 1 and self.idat_offset is not None:
+            return self.idat_offset + location['base_offset'] + offset, length
+        return None
+
+    def read_item(self, f, item_id):
+        """Read the full payload of an item from the file."""
+        location = self.locations.get(item_id)
+        if location is None:
+            raise HeifFormatError(f"No location for item {item_id}")
+        if location['construction_method'] == 0:
+            base = location['base_offset']
+        elif location['construction_method'] == 1 and self.idat_offset is not None:
+            base = self.idat_offset + location['base_offset']
+        else:
+            raise HeifFormatError(f"Unsupported construction method {location['construction_method']}")
+
+        chunks = []
+        for offset, length in location['extents']:
+            f.seek(base + offset)
+            chunk = f.read(length)
+            if len(chunk) < length:
+                raise HeifFormatError(f"Item {item_id} extends past end of file")
+            chunks.append(chunk)
+        return b''.join(chunks)
+
+
+def _parse_iinf(meta, data, start, end):
+    version = data[start]
+    if version == 0:
+        pos = start + 6
+    else:
+        pos = start + 8
+    for box_type, payload_start, payload_end in iter_boxes(data, pos, end):
+        if box_type != b'infe':
+            continue
+        infe_version = data[payload_start]
+        if infe_version < 2:
+            continue
+        if infe_version == 2:
+            item_id = struct.unpack_from('>H', data, payload_start + 4)[0]
+            type_pos = payload_start + 8
+        else:
+            item_id = struct.unpack_from('>I', data, payload_start + 4)[0]
+            type_pos = payload_start + 10
+        meta.items[item_id] = data[type_pos:type_pos + 4].decode('latin-1')
+
+
+def _parse_iloc(meta, data, start, end, absolute=0):
+    """Parse iloc; absolute is the file offset of data[0], used to record where each field lives."""
+    version = data[start]
+    if version > 2:
+        raise HeifFormatError(f"Unsupported iloc version {version}")
+    offset_size = data[start + 4] >> 4
+    length_size = data[start + 4] & 0x0F
+    base_offset_size = data[start + 5] >> 4
+    index_size = data[start + 5] & 0x0F if version in (1, 2) else 0
+    meta.iloc_version = version
+    meta.iloc_sizes = (offset_size, length_size, base_offset_size, index_size)
+
+    pos = start + 6
+    if version < 2:
+        item_count = struct.unpack_from('>H', data, pos)[0]
+        pos += 2
+    else:
+        item_count = struct.unpack_from('>I', data, pos)[0]
+        pos += 4
+
+    for _ in range(item_count):
+        if version < 2:
+            item_id = struct.unpack_from('>H', data, pos)[0]
+            pos += 2
+        else:
+            item_id = struct.unpack_from('>I', data, pos)[0]
+            pos += 4
+        construction_method = 0
+        construction_method_pos = None
+        if version in (1, 2):
+            construction_method_pos = absolute + pos
+            construction_method = struct.unpack_from('>H', data, pos)[0] & 0x0F
+            pos += 2
+        data_reference_index = struct.unpack_from('>H', data, pos)[0]
+        pos += 2
+        base_offset_pos = absolute + pos
+        base_offset = _read_uint(data, pos, base_offset_size)
+        pos += base_offset_size
+        extent_count = struct.unpack_from('>H', data, pos)[0]
+        pos += 2
+        extents = []
+        extent_indexes = []
+        extent_fields = []
+        for _ in range(extent_count):
+            extent_indexes.append(_read_uint(data, pos, index_size))
+            pos += index_size
+            extent_offset = _read_uint(data, pos, offset_size)
+            extent_fields.append((absolute + pos, absolute + pos + offset_size))
+            pos += offset_size
+            extent_length = _read_uint(data, pos, length_size)
+            pos += length_size
+            extents.append((extent_offset, extent_length))
+        if pos > end:
+            raise HeifFormatError("Truncated iloc box")
+        meta.locations[item_id] = {
+            'construction_method': construction_method,
+            'data_reference_index': data_reference_index,
+            'base_offset': base_offset,
+            'extents': extents,
+            'extent_indexes': extent_indexes,
+            # Absolute file offsets of the fields, for patching the location in place
+            'field_offsets': {
+                'construction_method': construction_method_pos,
+                'base_offset': base_offset_pos,
+                'extents': extent_fields
+            }
+        }
+
+
+def _parse_iref(meta, data, start, end):
+    version = data[start]
+    id_size = 2 if version == 0 else 4
+    id_fmt = '>H' if version == 0 else '>I'
+    for box_type, payload_start, payload_end in iter_boxes(data, start + 4, end):
+        pos = payload_start
+        from_id = struct.unpack_from(id_fmt, data, pos)[0]
+        pos += id_size
+        count = struct.unpack_from('>H', data, pos)[0]
+        pos += 2
+        to_ids = [struct.unpack_from(id_fmt, data, pos + i * id_size)[0] for i in range(count)]
+        meta.references.append((box_type.decode('latin-1'), from_id, to_ids))
+
+
+def read_heif_meta(f, file_size):
+    """
+    Parse the top-level 'meta' box of a HEIF file without touching image data.
+
+    Returns:
+        HeifMeta: Parsed items, locations and references
+    """
+    meta = HeifMeta()
+    brand_ok = False
+    for box_type, offset, header_size, size in iter_top_level_boxes(f, file_size):
+        if box_type == b'ftyp':
+            f.seek(offset + header_size)
+            ftyp = f.read(min(size - header_size, 256))
+            brands = {ftyp[i:i + 4] for i in range(0, len(ftyp) - 3, 4)}
+            brand_ok = bool(brands & HEIF_BRANDS)
+        elif box_type == b'meta':
+            if not brand_ok:
+                raise HeifFormatError("Missing HEIF ftyp brand")
+            if size > MAX_META_SIZE:
+                raise HeifFormatError(f"meta box too large ({size} bytes)")
+            meta.meta_offset = offset
+            meta.meta_size = size
+            meta.meta_header_size = header_size
+            f.seek(offset + header_size)
+            data = f.read(size - header_size)
+            meta.meta_payload = data
+            break
+    else:
+        raise HeifFormatError("No meta box found")
+
+    # meta is a full box: skip version/flags
+    for box_type, payload_start, payload_end in iter_boxes(data, 4):
+        absolute = offset + header_size
+        if box_type == b'pitm':
+            version = data[payload_start]
+            fmt = '>H' if version == 0 else '>I'
+            meta.primary_item = struct.unpack_from(fmt, data, payload_start + 4)[0]
+        elif box_type == b'iinf':
+            _parse_iinf(meta, data, payload_start, payload_end)
+        elif box_type == b'iloc':
+            _parse_iloc(meta, data, payload_start, payload_end, absolute)
+            header_len = 8 if data[payload_start - 4:payload_start] == b'iloc' else 16
+            meta.iloc_offset = absolute + payload_start - header_len
+            meta.iloc_size = payload_end - payload_start + header_len
+        elif box_type == b'iref':
+            _parse_iref(meta, data, payload_start, payload_end)
+        elif box_type == b'idat':
+            meta.idat_offset = absolute + payload_start
+    return meta
+
+
+def exif_item_tiff(payload):
+    """Strip the Exif item header (u32 TIFF header offset, usually followed by 'Exif\\0\\0')."""
+    if len(payload) < 4:
+        raise HeifFormatError("Truncated Exif item")
+    tiff_offset = struct.unpack_from('>I', payload, 0)[0]
+    tiff = payload[4 + tiff_offset:]
+    if tiff[:6] == b'Exif\x00\x00':
+        tiff = tiff[6:]
+    return tiff
+
+
+def read_heif_exif(file_path):
+    """
+    Read the raw TIFF/EXIF block of a HEIC/HEIF file from its Exif item.
+
+    Returns:
+        bytes: The TIFF block (b'' when the file has no Exif item), or None if the
+               container could not be parsed
+    """
+    try:
+        file_size = os.path.getsize(file_path)
+        with open(file_path, 'rb') as f:
+            meta = read_heif_meta(f, file_size)
+            exif_item = meta.exif_item()
+            if exif_item is None:
+                return b''
+            return exif_item_tiff(meta.read_item(f, exif_item))
+    except (HeifFormatError, struct.error, IndexError, OSError) as e:
+        logger.debug(f"Could not read HEIF metadata from {file_path}: {e}")
+        return None
+
+
+def read_fast_heif_exif(file_path):
+    """
+    Read DateTimeOriginal/OffsetTimeOriginal and GPS from a HEIC/HEIF file without decoding it.
+
+    Returns:
+        dict: 'datetime', 'date_taken' and 'gps' ((lat, lon) or None, not yet validated),
+              or None when the container can't be parsed and PIL should be used
+    """
+    tiff_block = read_heif_exif(file_path)
+    if tiff_block is None:
+        return None
+    if not tiff_block:
+        return {'datetime': None, 'date_taken': None, 'gps': None}
+    try:
+        tiff = TiffReader(lambda offset, length: tiff_block[offset:offset + length])
+        return read_tiff_metadata(tiff)
+    except (ExifFormatError, struct.error, ValueError) as e:
+        logger.debug(f"Could not decode HEIF Exif item in {file_path}: {e}")
+        return None
@@ -0,0 +1,328 @@
+import os
+import struct
+import shutil
+import tempfile
+
+from utils import setup_logger
+from mp4_atoms import iter_top_level_boxes, iter_boxes
+from heif_meta import HeifFormatError, read_heif_meta
+
+# Setup logger
+logger = setup_logger()
+
+# Copy size used when a file has to be rewritten
+COPY_CHUNK_SIZE = 1024 * 1024
+
+UINT16_MAX = 0xFFFF
+UINT32_MAX = 0xFFFFFFFF
+
+
+def exif_item_payload(tiff):
+    """Wrap a TIFF block as an Exif item: u32 offset to the TIFF header, b'Exif\\0\\0', then the TIFF data."""
+    return struct.pack('>I', 6) + b'Exif\x00\x00' + tiff
+
+
+def _box(box_type, payload):
+    return struct.pack('>I4s', 8 + len(payload), box_type) + payload
+
+
+def _full_box(box_type, version, flags, payload):
+    return _box(box_type, struct.pack('>I', (version << 24) | flags) + payload)
+
+
+def _pack_uint(value, size):
+    """Pack an iloc field of 0, 4 or 8 bytes, refusing values that don't fit."""
+    if size == 0:
+        if value:
+            raise HeifFormatError(f"Value {value} does not fit a zero-size iloc field")
+        return b''
+    if size == 4:
+        if value > UINT32_MAX:
+            raise HeifFormatError(f"Value {value} does not fit a 4-byte iloc field")
+        return struct.pack('>I', value)
+    if size == 8:
+        return struct.pack('>Q', value)
+    raise HeifFormatError(f"Unsupported iloc field size {size}")
+
+
+def _fits(value, size):
+    return size == 8 or (size == 4 and value <= UINT32_MAX)
+
+
+def _patch_location(f, meta, item_id, file_offset, length):
+    """
+    Point a single-extent item at file_offset/length by overwriting its iloc fields in place.
+
+    Returns:
+        bool: False if the existing iloc fields are too narrow to hold the new location
+    """
+    location = meta.locations[item_id]
+    offset_size, length_size, base_offset_size, _ = meta.iloc_sizes
+    if len(location['extents']) != 1 or not _fits(length, length_size):
+        return False
+    # The absolute offset goes into whichever field can hold it; the other becomes 0
+    if _fits(file_offset, offset_size):
+        base_offset, extent_offset = 0, file_offset
+    elif _fits(file_offset, base_offset_size):
+        base_offset, extent_offset = file_offset, 0
+    else:
+        return False
+
+    fields = location['field_offsets']
+    offset_pos, length_pos = fields['extents'][0]
+    writes = [(length_pos, _pack_uint(length, length_size))]
+    if offset_size:
+        writes.append((offset_pos, _pack_uint(extent_offset, offset_size)))
+    if base_offset_size:
+        writes.append((fields['base_offset'], _pack_uint(base_offset, base_offset_size)))
+    if fields['construction_method'] is not None:
+        # Data now lives in the file itself rather than in idat
+        writes.append((fields['construction_method'], struct.pack('>H', 0)))
+    for pos, data in writes:
+        f.seek(pos)
+        f.write(data)
+    return True
+
+
+def _write_in_place(file_path, meta, item_id, payload):
+    """
+    Replace an existing single-extent Exif item without moving any other data.
+
+    The payload overwrites the old one when it fits; otherwise it is appended
+    in a new mdat box at the end of the file and the item's iloc entry is
+    re-pointed. The iloc box keeps its size, so nothing else shifts.
+
+    Returns:
+        bool: False if the item's location cannot be patched in place
+    """
+    item_range = meta.item_range(item_id)
+    if item_range is None:
+        return False
+    offset_size, length_size, base_offset_size, _ = meta.iloc_sizes
+    if length_size not in (4, 8):
+        return False
+
+    with open(file_path, 'r+b') as f:
+        start, length = item_range
+        if len(payload) <= length:
+            f.seek(start)
+            f.write(payload)
+            f.seek(meta.locations[item_id]['field_offsets']['extents'][0][1])
+            f.write(_pack_uint(len(payload), length_size))
+        else:
+            f.seek(0, os.SEEK_END)
+            end = f.tell()
+            if not (_fits(end + 8, offset_size) or _fits(end + 8, base_offset_size)):
+                return False
+            f.write(_box(b'mdat', payload))
+            # Make sure the new data is on disk before the iloc points at it
+            f.flush()
+            os.fsync(f.fileno())
+            if not _patch_location(f, meta, item_id, end + 8, len(payload)):
+                f.truncate(end)
+                return False
+        f.flush()
+        os.fsync(f.fileno())
+    return True
+
+
+def _serialize_iloc(version, sizes, locations):
+    offset_size, length_size, base_offset_size, index_size = sizes
+    id_fmt = '>H' if version < 2 else '>I'
+    body = bytes([(offset_size << 4) | length_size, (base_offset_size << 4) | (index_size if version else 0)])
+    body += struct.pack(id_fmt, len(locations))
+    for item_id, location in locations.items():
+        body += struct.pack(id_fmt, item_id)
+        if version in (1, 2):
+            body += struct.pack('>H', location['construction_method'])
+        body += struct.pack('>H', location['data_reference_index'])
+        body += _pack_uint(location['base_offset'], base_offset_size)
+        body += struct.pack('>H', len(location['extents']))
+        for (offset, length), index in zip(location['extents'], location['extent_indexes']):
+            if version in (1, 2):
+                body += _pack_uint(index, index_size)
+            body += _pack_uint(offset, offset_size) + _pack_uint(length, length_size)
+    return _full_box(b'iloc', version, 0, body)
+
+
+def _field_size(current, values):
+    """Smallest iloc field size (keeping at least the current one) that holds all values."""
+    largest = max(values, default=0)
+    if largest > UINT32_MAX:
+        return 8
+    if largest and current == 0:
+        return 4
+    return current
+
+
+def _shift_locations(meta, threshold, delta):
+    """Copy the item locations, moving file offsets at or past threshold by delta."""
+    locations = {}
+    for item_id, location in meta.locations.items():
+        location = dict(location)
+        if location['construction_method'] == 0 and delta:
+            if location['base_offset']:
+                if location['base_offset'] >= threshold:
+                    location['base_offset'] += delta
+            else:
+                location['extents'] = [(offset + delta if offset >= threshold else offset, length)
+                                       for offset, length in location['extents']]
+        locations[item_id] = location
+    return locations
+
+
+def _build_meta(meta, locations, iloc_version, new_item_id):
+    """
+    Serialize the meta box with a new iloc and, for a new Exif item, extra infe and cdsc entries.
+    """
+    data = meta.meta_payload
+    children = []
+    have_iref = False
+    box_start = 4
+    for box_type, payload_start, payload_end in iter_boxes(data, 4):
+        raw = data[box_start:payload_end]
+        if box_type == b'iloc':
+            sizes = meta.iloc_sizes
+            sizes = (
+                _field_size(max(sizes[0], 4), [o for loc in locations.values() for o, _ in loc['extents']]),
+                _field_size(max(sizes[1], 4), [n for loc in locations.values() for _, n in loc['extents']]),
+                _field_size(sizes[2], [loc['base_offset'] for loc in locations.values()]),
+                sizes[3]
+            )
+            raw = _serialize_iloc(iloc_version, sizes, locations)
+        elif box_type == b'iinf' and new_item_id is not None:
+            version = data[payload_start]
+            count_size = 2 if version == 0 else 4
+            count = int.from_bytes(data[payload_start + 4:payload_start + 4 + count_size], 'big') + 1
+            if count > UINT16_MAX:
+                version, count_size = 1, 4
+            if new_item_id <= UINT16_MAX:
+                infe = _full_box(b'infe', 2, 0, struct.pack('>HH', new_item_id, 0) + b'Exif\x00')
+            else:
+                infe = _full_box(b'infe', 3, 0, struct.pack('>IH', new_item_id, 0) + b'Exif\x00')
+            entries = data[payload_start + 4 + (2 if data[payload_start] == 0 else 4):payload_end]
+            raw = _full_box(b'iinf', version, 0, count.to_bytes(count_size, 'big') + entries + infe)
+        elif box_type == b'iref' and new_item_id is not None:
+            have_iref = True
+            version = data[payload_start]
+            flags = int.from_bytes(data[payload_start + 1:payload_start + 4], 'big')
+            raw = _full_box(b'iref', version, flags,
+                            data[payload_start + 4:payload_end] + _cdsc_box(version, new_item_id, meta.primary_item))
+        children.append(raw)
+        box_start = payload_end
+
+    if new_item_id is not None and not have_iref:
+        version = 0 if max(new_item_id, meta.primary_item) <= UINT16_MAX else 1
+        children.append(_full_box(b'iref', version, 0, _cdsc_box(version, new_item_id, meta.primary_item)))
+    return _box(b'meta', data[:4] + b''.join(children))
+
+
+def _cdsc_box(iref_version, from_id, to_id):
+    """'cdsc' reference from the Exif item to the image it describes."""
+    if iref_version == 0:
+        if max(from_id, to_id) > UINT16_MAX:
+            raise HeifFormatError("Item ID too large for iref version 0")
+        return _box(b'cdsc', struct.pack('>HHH', from_id, 1, to_id))
+    return _box(b'cdsc', struct.pack('>IHI', from_id, 1, to_id))
+
+
+def _copy_range(src, dst, offset, length):
+    src.seek(offset)
+    while length > 0:
+        chunk = src.read(min(COPY_CHUNK_SIZE, length))
+        if not chunk:
+            raise HeifFormatError("Unexpected end of file while copying")
+        dst.write(chunk)
+        length -= len(chunk)
+
+
+def _rewrite_with_new_meta(file_path, meta, item_id, payload):
+    """
+    Rewrite the file with a rebuilt meta box when the Exif item cannot be patched in place.
+
+    Used when the file has no Exif item yet or its iloc entry is too narrow.
+    Image data is copied byte for byte; every absolute offset in iloc that
+    points past the meta box is shifted by the change in the meta box size,
+    and the Exif payload goes into a new mdat box at the end of the file.
+    """
+    file_size = os.path.getsize(file_path)
+    with open(file_path, 'rb') as f:
+        if any(box_type == b'moov' for box_type, _, _, _ in iter_top_level_boxes(f, file_size)):
+            # Image sequences keep absolute chunk offsets in moov as well
+            raise HeifFormatError("HEIF image sequences are not rewritten")
+    if meta.primary_item is None or meta.iloc_sizes is None:
+        raise HeifFormatError("No primary item or iloc box")
+
+    meta_end = meta.meta_offset + meta.meta_size
+    new_item_id = None
+    if item_id is None:
+        new_item_id = item_id = max(list(meta.items) + list(meta.locations)) + 1
+    iloc_version = meta.iloc_version
+    if item_id > UINT16_MAX and iloc_version < 2:
+        iloc_version = 2
+
+    delta = 0
+    for _ in range(4):
+        locations = _shift_locations(meta, meta_end, delta)
+        locations[item_id] = {
+            'construction_method': 0,
+            'data_reference_index': 0,
+            'base_offset': 0,
+            'extents': [(file_size + delta + 8, len(payload))],
+            'extent_indexes': [0]
+        }
+        new_meta = _build_meta(meta, locations, iloc_version, new_item_id)
+        new_delta = len(new_meta) - meta.meta_size
+        if new_delta == delta:
+            break
+        delta = new_delta
+    else:
+        raise HeifFormatError("Could not lay out the new meta box")
+
+    handle, temp_file = tempfile.mkstemp(prefix='.', suffix='.heic.tmp', dir=os.path.dirname(os.path.abspath(file_path)))
+    try:
+        with os.fdopen(handle, 'wb') as out, open(file_path, 'rb') as src:
+            _copy_range(src, out, 0, meta.meta_offset)
+            out.write(new_meta)
+            _copy_range(src, out, meta_end, file_size - meta_end)
+            out.write(_box(b'mdat', payload))
+            out.flush()
+            os.fsync(out.fileno())
+        shutil.copymode(file_path, temp_file)
+        os.replace(temp_file, file_path)
+    finally:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+
+
+def write_heif_exif(file_path, tiff):
+    """
+    Replace the Exif metadata of a HEIC/HEIF file without re-encoding the image.
+
+    Only the Exif item and the iloc entries are touched; coded image items
+    stay byte-identical. The existing Exif item is overwritten or re-pointed
+    in place when possible, otherwise the meta box is rebuilt and the file
+    rewritten with shifted offsets.
+
+    Args:
+        file_path (str): Path of the .heic/.heif file
+        tiff (bytes): New TIFF/EXIF block (as produced by piexif.dump without the 'Exif\\0\\0' prefix)
+
+    Returns:
+        bool: True if the Exif item was written
+    """
+    payload = exif_item_payload(tiff)
+    try:
+        file_size = os.path.getsize(file_path)
+        with open(file_path, 'rb') as f:
+            meta = read_heif_meta(f, file_size)
+        item_id = meta.exif_item()
+        if item_id is not None and _write_in_place(file_path, meta, item_id, payload):
+            logger.debug(f"Replaced Exif item {item_id} of {file_path} in place")
+            return True
+        _rewrite_with_new_meta(file_path, meta, item_id, payload)
+        logger.debug(f"Rewrote meta box of {file_path} with a new Exif location")
+        return True
+    except (HeifFormatError, struct.error, IndexError, ValueError, OSError) as e:
+        logger.error(f"Could not write HEIF Exif to {file_path}: {e}")
+        return False
@@ -0,0 +1,211 @@
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from utils import setup_logger
+
+# Setup logger
+logger = setup_logger()
+
+# Finished jobs kept around for status queries before the oldest are dropped
+MAX_FINISHED_JOBS = 50
+
+
+class JobCancelled(Exception):
+    """Raised inside a job's work function when cancellation was requested."""
+
+
+class Job:
+    """
+    State of a background job (directory scan, bulk save, ...).
+
+    The work function receives the job and reports progress through
+    add_discovered() and add_processed(); both raise JobCancelled once
+    cancel() has been called so the work stops at the next checkpoint.
+    Every change bumps a version number that wait_for_update() blocks on,
+    which lets the event stream push updates instead of polling.
+    """
+
+    def __init__(self, kind, description=''):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.description = description
+        self.status = 'queued'  # queued, running, completed, failed, cancelled
+        self.discovered = 0
+        self.processed = 0
+        self.failed = 0
+        self.bytes_written = 0
+        self.message = ''
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.version = 0
+        self._cancel_event = threading.Event()
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+
+    @property
+    def cancel_requested(self):
+        return self._cancel_event.is_set()
+
+    @property
+    def finished(self):
+        return self.status in ('completed', 'failed', 'cancelled')
+
+    def cancel(self):
+        """Ask the job to stop at its next progress checkpoint."""
+        self._cancel_event.set()
+
+    def check_cancelled(self):
+        """Raise JobCancelled if cancellation was requested."""
+        if self._cancel_event.is_set():
+            raise JobCancelled()
+
+    def _notify(self):
+        # Caller holds self._lock
+        self.version += 1
+        self._changed.notify_all()
+
+    def add_discovered(self, count):
+        """Record newly discovered work items (e.g. files found while walking a directory)."""
+        with self._lock:
+            self.discovered += count
+            self._notify()
+        self.check_cancelled()
+
+    def add_processed(self, count, failed=0, bytes_written=0, message=None):
+        """Record completed work items, failed ones included in count."""
+        with self._lock:
+            self.processed += count
+            self.failed += failed
+            self.bytes_written += bytes_written
+            if message is not None:
+                self.message = message
+            self._notify()
+        self.check_cancelled()
+
+    def set_message(self, message):
+        with self._lock:
+            self.message = message
+            self._notify()
+
+    def set_status(self, status):
+        with self._lock:
+            self.status = status
+            if status in ('completed', 'failed', 'cancelled'):
+                self.finished_at = time.time()
+            self._notify()
+
+    def wait_for_update(self, version, timeout=None):
+        """
+        Block until the job changes past the given version or the timeout expires.
+
+        Returns:
+            int: The current version
+        """
+        with self._lock:
+            if self.version == version and not self.finished:
+                self._changed.wait(timeout)
+            return self.version
+
+    def to_dict(self):
+        """Status snapshot with throughput (items/s) and ETA (seconds) for the status API."""
+        with self._lock:
+            end = self.finished_at or time.time()
+            elapsed = end - self.started_at if self.started_at else 0.0
+            throughput = self.processed / elapsed if elapsed > 0 else 0.0
+            remaining = max(0, self.discovered - self.processed)
+            eta = remaining / throughput if throughput > 0 and not self.finished else None
+            return {
+                'id': self.id,
+                'kind': self.kind,
+                'description': self.description,
+                'status': self.status,
+                'message': self.message,
+                'discovered': self.discovered,
+                'processed': self.processed,
+                'failed': self.failed,
+                'bytes_written': self.bytes_written,
+                'elapsed': round(elapsed, 2),
+                'throughput': round(throughput, 2),
+                'eta': round(eta, 1) if eta is not None else None,
+                'cancel_requested': self.cancel_requested,
+                'error': self.error,
+                'version': self.version
+            }
+
+
+class JobManager:
+    """Runs jobs on a small thread pool and keeps their state for the status API."""
+
+    def __init__(self, max_workers=2):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, kind, work, *args, description='', on_complete=None, **kwargs):
+        """
+        Start work(job, *args, **kwargs) in the background.
+
+        Args:
+            kind (str): Job type, e.g. 'scan'
+            work (callable): Function doing the work; its return value becomes job.result
+            description (str): Human readable description for the status API
+            on_complete (callable): Optional on_complete(job) called after a successful run
+
+        Returns:
+            Job: The new job
+        """
+        job = Job(kind, description)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+        self._executor.submit(self._run, job, work, args, kwargs, on_complete)
+        logger.info(f"Started {kind} job {job.id}: {description}")
+        return job
+
+    def _run(self, job, work, args, kwargs, on_complete):
+        job.started_at = time.time()
+        job.set_status('running')
+        try:
+            job.check_cancelled()
+            job.result = work(job, *args, **kwargs)
+            if on_complete:
+                on_complete(job)
+            job.set_status('completed')
+            logger.info(f"Job {job.id} completed: {job.processed} processed, {job.failed} failed")
+        except JobCancelled:
+            job.set_status('cancelled')
+            logger.info(f"Job {job.id} cancelled after {job.processed} items")
+        except Exception as e:
+            job.error = str(e)
+            job.set_status('failed')
+            logger.error(f"Job {job.id} failed: {e}", exc_info=True)
+
+    def _prune(self):
+        finished = sorted((j for j in self._jobs.values() if j.finished), key=lambda j: j.finished_at)
+        for job in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self._jobs[job.id]
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def active(self, kind):
+        """Return an unfinished job of the given kind, or None."""
+        with self._lock:
+            for job in self._jobs.values():
+                if job.kind == kind and not job.finished:
+                    return job
+        return None
+
+    def cancel(self, job_id):
+        """Request cancellation of a job; returns the job or None if unknown."""
+        job = self.get(job_id)
+        if job is not None and not job.finished:
+            job.cancel()
+            logger.info(f"Cancellation requested for job {job_id}")
+        return job
@@ -0,0 +1,194 @@
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+from utils import setup_logger
+
+# Setup logger
+logger = setup_logger()
+
+# Bump this whenever the way metadata is extracted changes so stale rows are discarded
+INDEX_SCHEMA_VERSION = 4
+
+# Number of pending writes before a batch commits automatically
+COMMIT_EVERY = 500
+
+
+def get_index_path(filename='media_index.db'):
+    """
+    Get the path to the persistent media index in the data/cache directory
+
+    Args:
+        filename (str): Name of the index database file
+
+    Returns:
+        str: Absolute path to the index database
+    """
+    cache_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'cache')
+    os.makedirs(cache_dir, exist_ok=True)
+    return os.path.join(cache_dir, filename)
+
+
+class MediaIndex:
+    """
+    On-disk index of media metadata keyed by (path, size, mtime_ns).
+
+    Unchanged files are served from the index; new or modified files are
+    re-parsed by the caller and written back with store(). Each store() is
+    committed at once so no thread holds the SQLite write lock between
+    calls, except inside batch(), which commits every COMMIT_EVERY rows and
+    when the batch ends.
+    """
+
+    def __init__(self, db_path=None):
+        self.db_path = db_path or get_index_path()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._init_db()
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pending = 0
+            self._local.batch_depth = 0
+        return conn
+
+    def _init_db(self):
+        conn = self._connect()
+        with self._lock:
+            version = conn.execute('PRAGMA user_version').fetchone()[0]
+            if version not in (0, INDEX_SCHEMA_VERSION):
+                logger.info(f"Media index schema changed ({version} -> {INDEX_SCHEMA_VERSION}), rebuilding {self.db_path}")
+                conn.execute('DROP TABLE IF EXISTS media')
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS media ('
+                ' path TEXT PRIMARY KEY,'
+                ' size INTEGER NOT NULL,'
+                ' mtime_ns INTEGER NOT NULL,'
+                ' datetime TEXT,'
+                ' latitude REAL,'
+                ' longitude REAL,'
+                ' media_type TEXT)'
+            )
+            conn.execute(f'PRAGMA user_version={INDEX_SCHEMA_VERSION}')
+            conn.commit()
+
+    @staticmethod
+    def _key(file_path):
+        return os.path.abspath(file_path)
+
+    def lookup(self, file_path, st=None):
+        """Return cached metadata for a file, or None if missing or out of date."""
+        try:
+            if st is None:
+                st = os.stat(file_path)
+            row = self._connect().execute(
+                'SELECT size, mtime_ns, datetime, latitude, longitude, media_type FROM media WHERE path = ?',
+                (self._key(file_path),)
+            ).fetchone()
+        except Exception as e:
+            logger.error(f"Media index lookup failed for {file_path}: {e}")
+            return None
+
+        if row is None or row[0] != st.st_size or row[1] != st.st_mtime_ns:
+            return None
+
+        dt = datetime.fromisoformat(row[2]) if row[2] else None
+        gps = (row[3], row[4]) if row[3] is not None and row[4] is not None else None
+        return {'datetime': dt, 'gps': gps, 'media_type': row[5]}
+
+    def store(self, file_path, info, st=None):
+        """Record metadata (datetime, gps, media_type) for a file at its current size and mtime."""
+        try:
+            if st is None:
+                st = os.stat(file_path)
+            dt = info.get('datetime')
+            gps = info.get('gps')
+            conn = self._connect()
+            conn.execute(
+                'INSERT OR REPLACE INTO media (path, size, mtime_ns, datetime, latitude, longitude, media_type)'
+                ' VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (
+                    self._key(file_path),
+                    st.st_size,
+                    st.st_mtime_ns,
+                    dt.isoformat() if dt else None,
+                    gps[0] if gps else None,
+                    gps[1] if gps else None,
+                    info.get('media_type')
+                )
+            )
+            self._local.pending += 1
+            if not self._local.batch_depth or self._local.pending >= COMMIT_EVERY:
+                self.commit()
+        except Exception as e:
+            logger.error(f"Media index store failed for {file_path}: {e}")
+
+    def get_or_extract(self, file_path, extract):
+        """
+        Return metadata for a file, calling extract(file_path) only on a cache miss.
+
+        Args:
+            file_path (str): Path of the media file
+            extract (callable): Returns a dict with 'datetime', 'gps' and 'media_type'
+
+        Returns:
+            dict: Metadata with 'datetime', 'gps' and 'media_type' keys
+        """
+        st = os.stat(file_path)
+        info = self.lookup(file_path, st)
+        if info is not None:
+            return info
+        info = extract(file_path)
+        self.store(file_path, info, st)
+        return info
+
+    def invalidate(self, file_path):
+        """Drop a file from the index (e.g. after its metadata was rewritten)."""
+        try:
+            conn = self._connect()
+            conn.execute('DELETE FROM media WHERE path = ?', (self._key(file_path),))
+            conn.commit()
+        except Exception as e:
+            logger.error(f"Media index invalidate failed for {file_path}: {e}")
+
+    @contextmanager
+    def batch(self):
+        """Group the store() calls of the current thread into few transactions, committed on exit."""
+        self._connect()
+        self._local.batch_depth += 1
+        try:
+            yield self
+        finally:
+            self._local.batch_depth -= 1
+            if not self._local.batch_depth:
+                self.commit()
+
+    def commit(self):
+        """Flush pending writes made from the current thread."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            try:
+                conn.commit()
+            except Exception as e:
+                logger.error(f"Media index commit failed: {e}")
+            self._local.pending = 0
+
+
+_default_index = None
+_default_index_lock = threading.Lock()
+
+
+def get_media_index():
+    """Return the shared MediaIndex instance, creating it on first use."""
+    global _default_index
+    with _default_index_lock:
+        if _default_index is None:
+            _default_index = MediaIndex()
+        return _default_index
@@ -0,0 +1,305 @@
+import io
+import os
+import re
+import json
+import subprocess
+from datetime import datetime, timezone
+
+import exifread
+from PIL import Image
+from PIL.ExifTags import TAGS, GPSTAGS
+
+from utils import setup_logger
+from mp4_atoms import QUICKTIME_EXTENSIONS, KEY_LOCATION, read_quicktime_metadata
+from exif_fast import read_fast_exif, exif_datetime
+from heif_meta import read_heif_exif, read_fast_heif_exif
+
+# Import pillow-heif for HEIC support
+try:
+    import pillow_heif
+    # Register the HEIF opener with PIL
+    pillow_heif.register_heif_opener()
+    HEIF_SUPPORT = True
+except ImportError:
+    HEIF_SUPPORT = False
+
+# Setup logger
+logger = setup_logger()
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.tiff')
+HEIC_EXTENSIONS = ('.heic', '.heif')
+VIDEO_EXTENSIONS = ('.mp4', '.mov', '.avi', '.mkv')
+
+# EXIF tag ids used when reading HEIC files through PIL
+TAG_DATETIME_ORIGINAL = 36867
+TAG_OFFSET_TIME_ORIGINAL = 36881
+EXIF_IFD = 0x8769
+GPS_IFD = 0x8825
+
+
+def detect_media_type(file_path):
+    """Return 'image', 'heic' or 'video' based on the file extension, or None if unsupported."""
+    file_lower = file_path.lower()
+    if file_lower.endswith(IMAGE_EXTENSIONS):
+        return 'image'
+    elif file_lower.endswith(HEIC_EXTENSIONS) and HEIF_SUPPORT:
+        return 'heic'
+    elif file_lower.endswith(VIDEO_EXTENSIONS):
+        return 'video'
+    return None
+
+
+def is_valid_gps(gps_coord):
+    """Check if GPS coordinates are valid and not (0,0)."""
+    if not gps_coord:
+        return False
+    lat, lon = gps_coord
+    return (-90 <= lat <= 90) and (-180 <= lon <= 180) and (lat, lon) != (0.0, 0.0)
+
+
+def parse_exif_datetime(dt_str, offset_str=None):
+    """Parse an EXIF 'YYYY:MM:DD HH:MM:SS' string, using OffsetTimeOriginal when present and UTC otherwise."""
+    return exif_datetime(str(dt_str), str(offset_str) if offset_str else None)
+
+
+def parse_creation_time(creation_time):
+    """Parse a video creation_time value (ISO 8601 in its many variants) into a datetime."""
+    creation_time = creation_time.strip()
+
+    # YYYY-MM-DDThh:mm:ss or YYYY-MM-DD hh:mm:ss, ignoring fractions and timezone suffixes
+    match = re.match(r'^(\d{4}-\d{2}-\d{2})[T ](\d{2}:\d{2}:\d{2})', creation_time)
+    if match:
+        dt = datetime.strptime(f"{match.group(1)} {match.group(2)}", '%Y-%m-%d %H:%M:%S')
+        return dt.replace(tzinfo=timezone.utc)
+
+    # Last resort: let fromisoformat try whatever is left
+    try:
+        return datetime.fromisoformat(creation_time.replace('Z', '+00:00'))
+    except Exception:
+        logger.error(f"Could not parse creation_time: {creation_time}")
+        return None
+
+
+def parse_iso6709(location):
+    """Parse an ISO 6709 location string (e.g. +38.7695-009.1297/) into (lat, lon)."""
+    loc = location.strip().strip('/')
+    if not loc or loc[0] not in ('+', '-'):
+        return None  # Invalid location format
+
+    split_indexes = [i for i in range(1, len(loc)) if loc[i] in ('+', '-') and loc[i-1] not in ('E', 'W', 'N', 'S')]
+    if len(split_indexes) < 1:
+        logger.warning(f"Could not parse GPS coordinates: {loc}")
+        return None
+
+    # A third signed component is the altitude, which we ignore
+    end = split_indexes[1] if len(split_indexes) > 1 else len(loc)
+    try:
+        lat = float(loc[:split_indexes[0]])
+        lon = float(loc[split_indexes[0]:end])
+    except ValueError:
+        logger.warning(f"Could not parse GPS coordinates: {loc}")
+        return None
+
+    if is_valid_gps((lat, lon)):
+        return (lat, lon)
+    logger.warning(f"Invalid GPS coordinates skipped: {lat}, {lon}")
+    return None
+
+
+def _dms_values_to_decimal(values, ref):
+    """Convert a (degrees, minutes, seconds) triple and its N/S/E/W ref to decimal degrees."""
+    decimal = float(values[0]) + float(values[1]) / 60 + float(values[2]) / 3600
+    if ref is not None and str(ref).strip() in ('S', 'W'):
+        decimal = -decimal
+    return decimal
+
+
+def _empty_metadata(media_type):
+    return {
+        'media_type': media_type,
+        'datetime': None,
+        'gps': None,
+        'date_taken': None,
+        'exif': {}
+    }
+
+
+def _read_image_metadata(file_path, metadata):
+    """Fill metadata from a single exifread pass over a JPEG/PNG/TIFF file."""
+    with open(file_path, 'rb') as f:
+        tags = exifread.process_file(f, details=False)
+    _apply_exifread_tags(file_path, tags, metadata)
+
+
+def _apply_exifread_tags(file_path, tags, metadata):
+    """Fill metadata from the tags returned by exifread.process_file()."""
+    for key, value in tags.items():
+        if key == 'JPEGThumbnail':
+            continue
+        name = key.split(' ', 1)[1] if ' ' in key else key
+        metadata['exif'][name] = str(value)
+
+    if 'EXIF DateTimeOriginal' in tags:
+        metadata['date_taken'] = str(tags['EXIF DateTimeOriginal'])
+        try:
+            metadata['datetime'] = parse_exif_datetime(metadata['date_taken'], tags.get('EXIF OffsetTimeOriginal'))
+        except ValueError as e:
+            logger.error(f"Error extracting datetime from image {file_path}: {str(e)}")
+    else:
+        logger.debug(f"No DateTimeOriginal found in {file_path}")
+
+    if 'GPS GPSLatitude' in tags and 'GPS GPSLongitude' in tags:
+        lat_ref = tags.get('GPS GPSLatitudeRef')
+        lon_ref = tags.get('GPS GPSLongitudeRef')
+        if lat_ref is None or lon_ref is None:
+            # Without ref tags we can't infer the hemisphere, so use the values as-is
+            logger.info(f"Missing GPS ref tags in {file_path}, inferring from coordinate signs")
+        lat = _dms_values_to_decimal(tags['GPS GPSLatitude'].values, lat_ref)
+        lon = _dms_values_to_decimal(tags['GPS GPSLongitude'].values, lon_ref)
+        if is_valid_gps((lat, lon)):
+            metadata['gps'] = (lat, lon)
+        else:
+            logger.warning(f"Invalid GPS coordinates skipped: {lat}, {lon}")
+
+
+def _read_heic_metadata(file_path, metadata):
+    """
+    Fill metadata from the Exif item of a HEIC/HEIF file.
+
+    The Exif item is located through the meta box and parsed with exifread, so
+    the HEVC image data is never decoded. Files whose container can't be parsed
+    fall back to a PIL/pillow-heif open.
+    """
+    tiff_block = read_heif_exif(file_path)
+    if tiff_block is not None:
+        tags = exifread.process_file(io.BytesIO(tiff_block), details=False) if tiff_block else {}
+        _apply_exifread_tags(file_path, tags, metadata)
+        return
+
+    with Image.open(file_path) as img:
+        exif_data = img.getexif()
+        exif_ifd = exif_data.get_ifd(EXIF_IFD)
+        gps_info = exif_data.get_ifd(GPS_IFD)
+
+    for tag_id, value in list(exif_data.items()) + list(exif_ifd.items()):
+        metadata['exif'][TAGS.get(tag_id, tag_id)] = value
+
+    dt_str = exif_ifd.get(TAG_DATETIME_ORIGINAL) or exif_data.get(TAG_DATETIME_ORIGINAL)
+    if dt_str:
+        metadata['date_taken'] = str(dt_str)
+        try:
+            metadata['datetime'] = parse_exif_datetime(dt_str, exif_ifd.get(TAG_OFFSET_TIME_ORIGINAL))
+        except ValueError as e:
+            logger.error(f"Error processing HEIC/HEIF file {file_path}: {str(e)}")
+    else:
+        logger.debug(f"No DateTimeOriginal found in HEIC/HEIF file: {file_path}")
+
+    if gps_info:
+        metadata['exif']['GPSInfo'] = {GPSTAGS.get(k, k): v for k, v in gps_info.items()}
+        lat = gps_info.get(2)  # GPSLatitude
+        lon = gps_info.get(4)  # GPSLongitude
+        if lat and lon:
+            lat = _dms_values_to_decimal(lat, gps_info.get(1, 'N'))
+            lon = _dms_values_to_decimal(lon, gps_info.get(3, 'E'))
+            if is_valid_gps((lat, lon)):
+                metadata['gps'] = (lat, lon)
+            else:
+                logger.warning(f"Invalid GPS coordinates skipped: {lat}, {lon}")
+
+
+def probe_video_tags(file_path):
+    """Run ffprobe on a video and return its format-level tags (fallback for non-QuickTime containers)."""
+    result = subprocess.run(
+        ['ffprobe', '-v', 'quiet', '-print_format', 'json', '-show_format', file_path],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
+    )
+    if not result.stdout:
+        logger.error(f"No output from ffprobe for {file_path}: {result.stderr}")
+        return {}
+    return json.loads(result.stdout).get('format', {}).get('tags', {})
+
+
+def _read_video_metadata(file_path, metadata):
+    """Fill metadata from the moov box of MP4/MOV files, or a single ffprobe call for other containers."""
+    native = None
+    if file_path.lower().endswith(QUICKTIME_EXTENSIONS):
+        native = read_quicktime_metadata(file_path)
+
+    if native is not None:
+        metadata['exif'].update(native['tags'])
+        metadata['datetime'] = native['creation_time']
+        if native['creation_time']:
+            metadata['date_taken'] = native['creation_time'].isoformat()
+        location = native['location']
+    else:
+        tags = probe_video_tags(file_path)
+        metadata['exif'].update(tags)
+        creation_time = tags.get('creation_time')
+        if creation_time:
+            metadata['date_taken'] = creation_time
+            metadata['datetime'] = parse_creation_time(creation_time)
+        location = tags.get('location') or tags.get(KEY_LOCATION)
+
+    if not metadata['datetime']:
+        logger.debug(f"No creation_time found in video metadata for {file_path}")
+    if location:
+        metadata['gps'] = parse_iso6709(location)
+
+
+def extract_media_metadata(file_path):
+    """
+    Extract datetime, GPS, media type and display EXIF from a single read or probe.
+
+    Args:
+        file_path (str): Path of the media file
+
+    Returns:
+        dict: 'media_type', 'datetime' (aware datetime or None), 'gps' ((lat, lon) or None),
+              'date_taken' (raw date string or None) and 'exif' (tag name -> value for display)
+    """
+    media_type = detect_media_type(file_path)
+    metadata = _empty_metadata(media_type)
+
+    if not os.path.exists(file_path):
+        logger.error(f"File not found when extracting metadata: {file_path}")
+        return metadata
+
+    try:
+        if media_type == 'image':
+            _read_image_metadata(file_path, metadata)
+        elif media_type == 'heic':
+            _read_heic_metadata(file_path, metadata)
+        elif media_type == 'video':
+            _read_video_metadata(file_path, metadata)
+        else:
+            logger.debug(f"Not a supported media file: {file_path}")
+    except Exception as e:
+        logger.error(f"Error extracting metadata from {file_path}: {str(e)}")
+
+    return metadata
+
+
+def extract_media_info(file_path):
+    """
+    Return just the indexable fields (datetime, gps, media_type) of a media file.
+
+    JPEG, TIFF and HEIC/HEIF files go through the header-only fast path, which reads
+    just the EXIF block; everything else (and any file the fast path rejects) falls
+    back to extract_media_metadata().
+    """
+    media_type = detect_media_type(file_path)
+    if media_type in ('image', 'heic'):
+        fast = read_fast_exif(file_path) if media_type == 'image' else read_fast_heif_exif(file_path)
+        if fast is not None:
+            gps = fast['gps']
+            if gps and not is_valid_gps(gps):
+                logger.warning(f"Invalid GPS coordinates skipped: {gps[0]}, {gps[1]}")
+                gps = None
+            return {'datetime': fast['datetime'], 'gps': gps, 'media_type': media_type}
+
+    metadata = extract_media_metadata(file_path)
+    return {
+        'datetime': metadata['datetime'],
+        'gps': metadata['gps'],
+        'media_type': metadata['media_type']
+    }
@@ -0,0 +1,173 @@
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from contextlib import nullcontext
+
+from utils import setup_logger
+
+# Setup logger
+logger = setup_logger()
+
+# Persistent executors, keyed by (kind, workers), reused across scans
+_executors = {}
+_executors_lock = threading.Lock()
+
+
+def default_scan_workers():
+    """Number of scan workers from the SCAN_WORKERS environment variable, defaulting to the CPU count."""
+    try:
+        workers = int(os.environ.get('SCAN_WORKERS', '0'))
+    except ValueError:
+        logger.warning(f"Invalid SCAN_WORKERS value: {os.environ.get('SCAN_WORKERS')}")
+        workers = 0
+    return workers if workers > 0 else (os.cpu_count() or 1)
+
+
+def get_executor(workers, use_threads=False):
+    """
+    Return a persistent executor with the given number of workers.
+
+    Args:
+        workers (int): Number of worker processes/threads
+        use_threads (bool): Use threads instead of processes (enough for ffmpeg-bound scans)
+
+    Returns:
+        Executor: A ProcessPoolExecutor or ThreadPoolExecutor shared between scans
+    """
+    kind = 'thread' if use_threads else 'process'
+    with _executors_lock:
+        executor = _executors.get((kind, workers))
+        if executor is None:
+            if use_threads:
+                executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='scan')
+            else:
+                executor = ProcessPoolExecutor(max_workers=workers)
+            _executors[(kind, workers)] = executor
+            logger.info(f"Started {kind} scan pool with {workers} workers")
+        return executor
+
+
+def _safe_extract(extract, file_path):
+    """Run extract(file_path) in a worker, returning (info, error) instead of raising."""
+    try:
+        return extract(file_path), None
+    except Exception as e:
+        return None, str(e)
+
+
+def _extract_chunk(extract, file_paths):
+    """Run _safe_extract over a chunk of paths in a worker."""
+    return [_safe_extract(extract, file_path) for file_path in file_paths]
+
+
+def collect_media_paths(directory, extensions, path_filter=None, progress=None):
+    """
+    Walk a directory and return the matching file paths in sorted (deterministic) order.
+
+    Args:
+        directory (str): Root directory to walk
+        extensions (tuple): Lower-case file extensions to include
+        path_filter (callable): Optional function applied to each joined path (e.g. fix_long_path)
+        progress (callable): Optional progress(found) called with the number of files found in each directory
+
+    Returns:
+        list: Sorted list of file paths
+    """
+    paths = []
+    for root, _, files in os.walk(directory):
+        found = 0
+        for file in files:
+            if file.lower().endswith(extensions):
+                file_path = os.path.join(root, file)
+                paths.append(path_filter(file_path) if path_filter else file_path)
+                found += 1
+        if progress and found:
+            progress(found)
+    paths.sort()
+    return paths
+
+
+def extract_many(paths, extract, index=None, workers=None, use_threads=False, progress=None):
+    """
+    Extract metadata for many files in parallel, preserving the order of paths.
+
+    Files unchanged since they were last indexed are served from the index in
+    the calling process; only the misses are fanned out to the worker pool and
+    their results are written back to the index.
+
+    Args:
+        paths (list): File paths to process
+        extract (callable): Picklable function returning a dict with 'datetime', 'gps' and 'media_type'
+        index (MediaIndex): Optional persistent index to read from and write to
+        workers (int): Number of workers, defaults to default_scan_workers(); 1 runs serially
+        use_threads (bool): Use a thread pool instead of a process pool
+        progress (callable): Optional progress(processed, failed) called as files complete. It may
+                             raise (e.g. to cancel a job), in which case pending work is cancelled,
+                             finished results stay in the index and the exception propagates.
+
+    Returns:
+        list: (path, info, error) tuples in the same order as paths
+    """
+    workers = workers or default_scan_workers()
+    results = [None] * len(paths)
+    misses = []
+    hits = 0
+    failed = 0
+
+    for i, file_path in enumerate(paths):
+        try:
+            st = os.stat(file_path)
+        except OSError as e:
+            results[i] = (file_path, None, str(e))
+            failed += 1
+            continue
+        info = index.lookup(file_path, st) if index is not None else None
+        if info is not None:
+            results[i] = (file_path, info, None)
+            hits += 1
+        else:
+            misses.append((i, file_path, st))
+
+    def collect(start, extracted):
+        errors = 0
+        for offset, (info, error) in enumerate(extracted):
+            i, file_path, st = misses[start + offset]
+            if info is not None and index is not None:
+                index.store(file_path, info, st)
+            results[i] = (file_path, info, error)
+            errors += error is not None
+        return errors
+
+    # Index rows are committed in batches instead of one transaction per file
+    with index.batch() if index is not None else nullcontext():
+        futures = []
+        try:
+            if progress and (hits or failed):
+                progress(hits + failed, failed)
+
+            if misses:
+                logger.info(f"Extracting metadata for {len(misses)} of {len(paths)} files with {workers} workers")
+                miss_paths = [file_path for _, file_path, _ in misses]
+                if workers == 1 or len(misses) == 1:
+                    for start, file_path in enumerate(miss_paths):
+                        errors = collect(start, [_safe_extract(extract, file_path)])
+                        if progress:
+                            progress(1, errors)
+                else:
+                    # Submit in chunks so progress can be reported and pending chunks cancelled
+                    chunksize = max(1, min(64, len(misses) // (workers * 4)))
+                    executor = get_executor(workers, use_threads)
+                    futures = {
+                        executor.submit(_extract_chunk, extract, miss_paths[start:start + chunksize]): start
+                        for start in range(0, len(miss_paths), chunksize)
+                    }
+                    for future in as_completed(futures):
+                        start = futures[future]
+                        chunk = future.result()
+                        errors = collect(start, chunk)
+                        if progress:
+                            progress(len(chunk), errors)
+        finally:
+            for future in futures:
+                future.cancel()
+    return results
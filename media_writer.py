@@ -0,0 +1,113 @@
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from utils import setup_logger
+
+# Setup logger
+logger = setup_logger()
+
+# Files from one directory handed to a worker at a time
+WRITE_BATCH_SIZE = 8
+
+
+def _env_workers(name, default):
+    """Positive integer from the environment variable name, or default."""
+    try:
+        workers = int(os.environ.get(name, '0'))
+    except ValueError:
+        logger.warning(f"Invalid {name} value: {os.environ.get(name)}")
+        workers = 0
+    return workers if workers > 0 else default
+
+
+def default_save_workers():
+    """Number of metadata writers from SAVE_WORKERS, defaulting to the CPU count."""
+    return _env_workers('SAVE_WORKERS', os.cpu_count() or 1)
+
+
+def default_video_save_workers():
+    """Number of concurrent video rewrites from SAVE_VIDEO_WORKERS, defaulting to 2."""
+    return _env_workers('SAVE_VIDEO_WORKERS', 2)
+
+
+def group_by_directory(tasks, batch_size=WRITE_BATCH_SIZE):
+    """
+    Split write tasks into batches that each stay within one directory.
+
+    Args:
+        tasks (list): (key, file_path, media_type) tuples
+        batch_size (int): Maximum number of files per batch
+
+    Returns:
+        list: Lists of tasks, ordered by directory
+    """
+    by_directory = {}
+    for task in tasks:
+        by_directory.setdefault(os.path.dirname(task[1]), []).append(task)
+    batches = []
+    for directory in sorted(by_directory):
+        group = by_directory[directory]
+        for start in range(0, len(group), batch_size):
+            batches.append(group[start:start + batch_size])
+    return batches
+
+
+def _write_batch(write, batch):
+    """Run write(key, file_path) over a batch, returning (key, ok, bytes_written, error) per task."""
+    results = []
+    for key, file_path, _ in batch:
+        try:
+            ok, bytes_written = write(key, file_path)
+            results.append((key, ok, bytes_written, None))
+        except Exception as e:
+            logger.error(f"Error writing {file_path}: {e}")
+            results.append((key, False, 0, str(e)))
+    return results
+
+
+def write_many(tasks, write, workers=None, video_workers=None, progress=None):
+    """
+    Write many files in parallel, keeping video rewrites on their own smaller pool.
+
+    Image writes are short and mostly I/O, so they get one worker per CPU;
+    video rewrites run a full ffmpeg remux each and are capped separately so
+    they cannot saturate the disk or starve the image writes. Work is handed
+    out in per-directory batches.
+
+    Args:
+        tasks (list): (key, file_path, media_type) tuples; key identifies the task in the results
+        write (callable): write(key, file_path) returning (ok, bytes_written); called from worker threads
+        workers (int): Image writers, defaults to default_save_workers()
+        video_workers (int): Concurrent video writers, defaults to default_video_save_workers()
+        progress (callable): Optional progress(key, ok, bytes_written) called in the calling thread as
+                             files complete. It may raise (e.g. to cancel a job), in which case pending
+                             batches are cancelled, running ones finish and the exception propagates.
+
+    Returns:
+        dict: key -> (ok, bytes_written, error)
+    """
+    workers = workers or default_save_workers()
+    video_workers = video_workers or default_video_save_workers()
+    video_tasks = [task for task in tasks if task[2] == 'video']
+    image_tasks = [task for task in tasks if task[2] != 'video']
+    results = {}
+
+    logger.info(f"Writing {len(image_tasks)} images with {workers} workers "
+                f"and {len(video_tasks)} videos with {video_workers} workers")
+    futures = []
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='save') as image_pool, \
+            ThreadPoolExecutor(max_workers=video_workers, thread_name_prefix='save-video') as video_pool:
+        try:
+            # Videos first so the long remuxes overlap with the image writes
+            futures = [video_pool.submit(_write_batch, write, [task]) for task in video_tasks]
+            futures += [image_pool.submit(_write_batch, write, batch) for batch in group_by_directory(image_tasks)]
+            for future in as_completed(futures):
+                for key, ok, bytes_written, error in future.result():
+                    results[key] = (ok, bytes_written, error)
+                    if progress:
+                        progress(key, ok, bytes_written)
+        finally:
+            # Batches already running are allowed to finish so no file is left half-written
+            for future in futures:
+                future.cancel()
+    return results
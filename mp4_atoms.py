@@ -0,0 +1,273 @@
+import os
+import re
+import struct
+from datetime import datetime, timedelta, timezone
+
+from utils import setup_logger
+
+# Setup logger
+logger = setup_logger()
+
+# Containers handled natively; anything else (AVI, MKV) falls back to ffprobe
+QUICKTIME_EXTENSIONS = ('.mp4', '.mov', '.m4v', '.3gp')
+
+# Box types that may legitimately appear at the top level of a QuickTime/MP4 file
+TOP_LEVEL_TYPES = {b'ftyp', b'moov', b'mdat', b'free', b'skip', b'wide', b'pnot', b'uuid', b'meta', b'moof', b'mfra', b'sidx'}
+
+# QuickTime timestamps count seconds from 1904-01-01 UTC
+QT_EPOCH = datetime(1904, 1, 1, tzinfo=timezone.utc)
+
+# Refuse to load absurdly large moov boxes into memory
+MAX_MOOV_SIZE = 64 * 1024 * 1024
+
+# Apple mdta keys we care about
+KEY_LOCATION = 'com.apple.quicktime.location.ISO6709'
+KEY_CREATION_DATE = 'com.apple.quicktime.creationdate'
+
+
+def read_box_header(f, offset, file_size):
+    """
+    Read the box header at offset.
+
+    Returns:
+        tuple: (box_type, header_size, box_size) or None if the header is invalid
+    """
+    f.seek(offset)
+    header = f.read(8)
+    if len(header) < 8:
+        return None
+    size, box_type = struct.unpack('>I4s', header)
+    header_size = 8
+    if size == 1:
+        large = f.read(8)
+        if len(large) < 8:
+            return None
+        size = struct.unpack('>Q', large)[0]
+        header_size = 16
+    elif size == 0:
+        # Box extends to the end of the file
+        size = file_size - offset
+    if size < header_size or offset + size > file_size:
+        return None
+    return box_type, header_size, size
+
+
+def iter_top_level_boxes(f, file_size):
+    """Yield (box_type, offset, header_size, box_size) for each top-level box, seeking over payloads."""
+    offset = 0
+    while offset < file_size:
+        header = read_box_header(f, offset, file_size)
+        if header is None:
+            return
+        box_type, header_size, size = header
+        yield box_type, offset, header_size, size
+        offset += size
+
+
+def iter_boxes(data, start=0, end=None):
+    """Yield (box_type, payload_start, payload_end) for each box in data[start:end]."""
+    end = len(data) if end is None else end
+    pos = start
+    while pos + 8 <= end:
+        size, box_type = struct.unpack_from('>I4s', data, pos)
+        header_size = 8
+        if size == 1:
+            if pos + 16 > end:
+                return
+            size = struct.unpack_from('>Q', data, pos + 8)[0]
+            header_size = 16
+        elif size == 0:
+            size = end - pos
+        if size < header_size or pos + size > end:
+            return
+        yield box_type, pos + header_size, pos + size
+        pos += size
+
+
+def find_box(data, path, start=0, end=None):
+    """Find a nested box by path (e.g. [b'udta', b'\\xa9xyz']) and return (payload_start, payload_end)."""
+    for box_type, payload_start, payload_end in iter_boxes(data, start, end):
+        if box_type == path[0]:
+            if len(path) == 1:
+                return payload_start, payload_end
+            return find_box(data, path[1:], payload_start, payload_end)
+    return None
+
+
+def _meta_children_start(data, start, end):
+    """
+    Return where the children of a 'meta' box begin.
+
+    ISO 'meta' is a full box (4 bytes of version/flags) while QuickTime 'meta'
+    is a plain container, so look for the 'hdlr' child at either position.
+    """
+    if end - start >= 12 and data[start + 8:start + 12] == b'hdlr':
+        return start + 4
+    return start
+
+
+def parse_mvhd_creation_time(data, start, end):
+    """Return the mvhd creation time as a UTC datetime, or None when unset."""
+    if end - start < 8:
+        return None
+    version = data[start]
+    if version == 1:
+        if end - start < 12:
+            return None
+        seconds = struct.unpack_from('>Q', data, start + 4)[0]
+    else:
+        seconds = struct.unpack_from('>I', data, start + 4)[0]
+    if seconds == 0:
+        return None
+    return QT_EPOCH + timedelta(seconds=seconds)
+
+
+def parse_user_data_text(data, start, end):
+    """Decode a QuickTime user data text atom (e.g. ©xyz, ©day)."""
+    if end - start >= 4:
+        length = struct.unpack_from('>H', data, start)[0]
+        if 0 < length <= end - start - 4:
+            return data[start + 4:start + 4 + length].decode('utf-8', 'replace').strip('\x00').strip()
+    return data[start:end].decode('utf-8', 'replace').strip('\x00').strip()
+
+
+def parse_mdta_metadata(data, start, end):
+    """Parse Apple mdta keys/ilst metadata in a 'meta' box payload into a {key: value} dict."""
+    children_start = _meta_children_start(data, start, end)
+    keys_box = find_box(data, [b'keys'], children_start, end)
+    ilst_box = find_box(data, [b'ilst'], children_start, end)
+    if not keys_box or not ilst_box:
+        return {}
+
+    keys = []
+    pos, keys_end = keys_box
+    if keys_end - pos < 8:
+        return {}
+    entry_count = struct.unpack_from('>I', data, pos + 4)[0]
+    pos += 8
+    for _ in range(entry_count):
+        if pos + 8 > keys_end:
+            break
+        key_size = struct.unpack_from('>I', data, pos)[0]
+        if key_size < 8 or pos + key_size > keys_end:
+            break
+        keys.append(data[pos + 8:pos + key_size].decode('utf-8', 'replace'))
+        pos += key_size
+
+    values = {}
+    for item_type, item_start, item_end in iter_boxes(data, ilst_box[0], ilst_box[1]):
+        index = struct.unpack('>I', item_type)[0]
+        if not 1 <= index <= len(keys):
+            continue
+        data_box = find_box(data, [b'data'], item_start, item_end)
+        if not data_box or data_box[1] - data_box[0] < 8:
+            continue
+        type_indicator = struct.unpack_from('>I', data, data_box[0])[0] & 0xFFFFFF
+        raw = data[data_box[0] + 8:data_box[1]]
+        # 1 = UTF-8, 2 = UTF-16; other well-known types are binary and not needed here
+        if type_indicator == 1:
+            values[keys[index - 1]] = raw.decode('utf-8', 'replace')
+        elif type_indicator == 2:
+            values[keys[index - 1]] = raw.decode('utf-16-be', 'replace')
+    return values
+
+
+def parse_apple_date(value):
+    """Parse an Apple creationdate (e.g. 2023-05-30T12:34:56+0200) into an aware datetime."""
+    match = re.match(r'^(\d{4}-\d{2}-\d{2})T(\d{2}:\d{2}:\d{2})(?:\.\d+)?(Z|[+-]\d{2}:?\d{2})?', value.strip())
+    if not match:
+        return None
+    dt = datetime.strptime(f"{match.group(1)} {match.group(2)}", '%Y-%m-%d %H:%M:%S')
+    tz = match.group(3)
+    if not tz or tz == 'Z':
+        return dt.replace(tzinfo=timezone.utc)
+    sign = -1 if tz[0] == '-' else 1
+    digits = tz[1:].replace(':', '')
+    offset = timedelta(hours=int(digits[:2]), minutes=int(digits[2:4]))
+    return dt.replace(tzinfo=timezone(sign * offset))
+
+
+def load_moov(f, file_size):
+    """
+    Locate and read the moov box, seeking over mdat and other top-level boxes.
+
+    Returns:
+        tuple: (moov_payload_bytes, ftyp_major_brand) or None if the file is not QuickTime/MP4
+    """
+    major_brand = None
+    first = True
+    for box_type, offset, header_size, size in iter_top_level_boxes(f, file_size):
+        if first and box_type not in TOP_LEVEL_TYPES:
+            return None
+        first = False
+        if box_type == b'ftyp' and size >= header_size + 4:
+            f.seek(offset + header_size)
+            major_brand = f.read(4).decode('latin-1', 'replace').strip()
+        elif box_type == b'moov':
+            if size > MAX_MOOV_SIZE:
+                logger.warning(f"moov box too large to parse natively ({size} bytes)")
+                return None
+            f.seek(offset + header_size)
+            return f.read(size - header_size), major_brand
+    return None
+
+
+def read_quicktime_metadata(file_path):
+    """
+    Read creation time and location from a QuickTime/MP4 file without touching the media data.
+
+    Args:
+        file_path (str): Path of the .mp4/.mov file
+
+    Returns:
+        dict: 'creation_time' (aware datetime or None), 'location' (ISO 6709 string or None)
+              and 'tags' (display metadata), or None if the container could not be parsed
+    """
+    try:
+        file_size = os.path.getsize(file_path)
+        with open(file_path, 'rb') as f:
+            loaded = load_moov(f, file_size)
+    except OSError as e:
+        logger.error(f"Error reading {file_path}: {e}")
+        return None
+
+    if loaded is None:
+        logger.debug(f"No parsable moov box in {file_path}")
+        return None
+
+    moov, major_brand = loaded
+    tags = {}
+    if major_brand:
+        tags['major_brand'] = major_brand
+
+    creation_time = None
+    mvhd = find_box(moov, [b'mvhd'])
+    if mvhd:
+        creation_time = parse_mvhd_creation_time(moov, *mvhd)
+
+    location = None
+    udta = find_box(moov, [b'udta'])
+    if udta:
+        for box_type, start, end in iter_boxes(moov, *udta):
+            if box_type == b'\xa9xyz':
+                location = parse_user_data_text(moov, start, end)
+            elif box_type == b'\xa9day':
+                tags['date'] = parse_user_data_text(moov, start, end)
+            elif box_type == b'meta':
+                tags.update(parse_mdta_metadata(moov, start, end))
+
+    meta = find_box(moov, [b'meta'])
+    if meta:
+        tags.update(parse_mdta_metadata(moov, *meta))
+
+    if not location and tags.get(KEY_LOCATION):
+        location = tags[KEY_LOCATION]
+    if creation_time is None and tags.get(KEY_CREATION_DATE):
+        creation_time = parse_apple_date(tags[KEY_CREATION_DATE])
+
+    if creation_time is not None:
+        tags['creation_time'] = creation_time.isoformat()
+    if location:
+        tags['location'] = location
+
+    return {'creation_time': creation_time, 'location': location, 'tags': tags}
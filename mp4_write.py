@@ -0,0 +1,259 @@
+import os
+import struct
+import shutil
+import tempfile
+
+from utils import setup_logger
+from mp4_atoms import TOP_LEVEL_TYPES, MAX_MOOV_SIZE, iter_top_level_boxes, iter_boxes, find_box
+
+# Setup logger
+logger = setup_logger()
+
+LOCATION_ATOM = b'\xa9xyz'
+
+# Language code stored with the location string ('eng' packed as ISO 639-2/T, as ffmpeg writes it)
+LANGUAGE_ENG = 0x15C7
+
+# Free space left after a moov that had to be moved, so later edits fit in place
+MOOV_PADDING = 4096
+
+# Copy size used when the media data has to be shifted (last resort, see rewrite_moov)
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+class QuickTimeWriteError(Exception):
+    """Raised when a QuickTime/MP4 file cannot be edited natively."""
+
+
+def format_iso6709(lat, lon):
+    """Format a position as an ISO 6709 string (e.g. +38.7695-009.1297/)."""
+    return f"{lat:+08.4f}{lon:+09.4f}/"
+
+
+def _box(box_type, payload):
+    if len(payload) + 8 <= 0xFFFFFFFF:
+        return struct.pack('>I4s', len(payload) + 8, box_type) + payload
+    return struct.pack('>I4sQ', 1, box_type, len(payload) + 16) + payload
+
+
+def _children(data, start, end):
+    """Yield (box_type, box_start, payload_start, box_end) for the boxes in data[start:end]."""
+    box_start = start
+    for box_type, payload_start, box_end in iter_boxes(data, start, end):
+        yield box_type, box_start, payload_start, box_end
+        box_start = box_end
+
+
+def location_atom(location):
+    """Build a ©xyz user data atom holding an ISO 6709 location string."""
+    text = location.encode('utf-8')
+    return _box(LOCATION_ATOM, struct.pack('>HH', len(text), LANGUAGE_ENG) + text)
+
+
+def set_udta(moov, udta_box):
+    """Return the moov payload with its udta box replaced by udta_box (header included), or removed if empty."""
+    for box_type, box_start, _, box_end in _children(moov, 0, len(moov)):
+        if box_type == b'udta':
+            return moov[:box_start] + udta_box + moov[box_end:]
+    return moov + udta_box
+
+
+def set_udta_location(moov, location):
+    """Return the moov payload with the ©xyz atom of moov/udta replaced, added or (location None) removed."""
+    atom = location_atom(location) if location else b''
+    udta = find_box(moov, [b'udta'])
+    if udta is None:
+        return set_udta(moov, _box(b'udta', atom)) if atom else moov
+    payload = moov[udta[0]:udta[1]]
+    children_end = 0
+    for box_type, box_start, _, box_end in _children(payload, 0, len(payload)):
+        if box_type == LOCATION_ATOM:
+            payload = payload[:box_start] + atom + payload[box_end:]
+            break
+        children_end = box_end
+    else:
+        # Keep anything after the last child, e.g. the QuickTime 32-bit zero terminator
+        payload = payload[:children_end] + atom + payload[children_end:]
+    return set_udta(moov, _box(b'udta', payload))
+
+
+def shift_chunk_offsets(moov, threshold, delta):
+    """
+    Add delta to every stco/co64 chunk offset at or past threshold.
+
+    Returns:
+        bytes: The patched moov payload (same size as the input)
+    """
+    moov = bytearray(moov)
+    for box_type, _, trak_start, trak_end in _children(moov, 0, len(moov)):
+        if box_type != b'trak':
+            continue
+        stbl = find_box(moov, [b'mdia', b'minf', b'stbl'], trak_start, trak_end)
+        if stbl is None:
+            continue
+        for table_type, _, start, end in _children(moov, *stbl):
+            if table_type not in (b'stco', b'co64'):
+                continue
+            fmt, size = ('>I', 4) if table_type == b'stco' else ('>Q', 8)
+            count = struct.unpack_from('>I', moov, start + 4)[0]
+            if start + 8 + count * size > end:
+                raise QuickTimeWriteError(f"Truncated {table_type.decode()} box")
+            for pos in range(start + 8, start + 8 + count * size, size):
+                offset = struct.unpack_from(fmt, moov, pos)[0]
+                if offset >= threshold:
+                    offset += delta
+                    if size == 4 and offset > 0xFFFFFFFF:
+                        raise QuickTimeWriteError("Chunk offset does not fit stco")
+                    struct.pack_into(fmt, moov, pos, offset)
+    return bytes(moov)
+
+
+def _write_at(file_path, offset, data, truncate=False):
+    """Overwrite bytes at offset with a single write, optionally cutting the file after them."""
+    with open(file_path, 'r+b') as f:
+        f.seek(offset)
+        f.write(data)
+        if truncate:
+            f.truncate(offset + len(data))
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _replace_range(file_path, start, end, data, file_size):
+    """Rewrite the file with bytes [start, end) replaced by data, via a temp file in the same directory."""
+    handle, temp_file = tempfile.mkstemp(prefix='.', suffix='.tmp', dir=os.path.dirname(os.path.abspath(file_path)))
+    try:
+        with os.fdopen(handle, 'wb') as out, open(file_path, 'rb') as src:
+            for copy_start, copy_end in ((0, start), (end, file_size)):
+                src.seek(copy_start)
+                remaining = copy_end - copy_start
+                while remaining > 0:
+                    chunk = src.read(min(COPY_CHUNK_SIZE, remaining))
+                    if not chunk:
+                        raise QuickTimeWriteError("Unexpected end of file while copying")
+                    out.write(chunk)
+                    remaining -= len(chunk)
+                if copy_start == 0:
+                    out.write(data)
+            out.flush()
+            os.fsync(out.fileno())
+        shutil.copymode(file_path, temp_file)
+        os.replace(temp_file, file_path)
+    finally:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+
+
+def rewrite_moov(file_path, edit):
+    """
+    Apply edit(moov_payload) -> new_payload to the moov box of a QuickTime/MP4 file.
+
+    The media data is left where it is whenever possible:
+      - the new moov is written over the old one, turning leftover space into
+        a 'free' box, or absorbing 'free'/'skip' boxes that follow it;
+      - a moov at the end of the file simply grows or shrinks the file;
+      - a moov in front of the media data that outgrows its space is appended
+        to the end of the file with MOOV_PADDING of free space after it, and
+        the old moov becomes a 'free' box. The media data does not move, so
+        the stco/co64 chunk offsets stay valid. The file loses its
+        "faststart" layout, which matters little now that media is served
+        with byte ranges.
+      - Only when nothing can be appended (the last box runs to the end of
+        the file by definition, or the file ends in something that is not a
+        box) is the rest of the file copied behind the new moov through a
+        temporary file, with the chunk offsets shifted to match. That costs
+        as much as a remux and is the last resort.
+
+    Returns:
+        str: 'in_place', 'end', 'relocated' or 'shifted' depending on how the moov was written
+
+    Raises:
+        QuickTimeWriteError: If the file cannot be edited natively
+    """
+    file_size = os.path.getsize(file_path)
+    with open(file_path, 'rb') as f:
+        boxes = list(iter_top_level_boxes(f, file_size))
+        if not boxes or boxes[0][0] not in TOP_LEVEL_TYPES:
+            raise QuickTimeWriteError("Not a QuickTime/MP4 file")
+        index = next((i for i, box in enumerate(boxes) if box[0] == b'moov'), None)
+        if index is None:
+            raise QuickTimeWriteError("No moov box")
+        _, moov_offset, header_size, moov_size = boxes[index]
+        if moov_size > MAX_MOOV_SIZE:
+            raise QuickTimeWriteError(f"moov box too large to edit natively ({moov_size} bytes)")
+        f.seek(moov_offset + header_size)
+        moov = f.read(moov_size - header_size)
+
+    new_payload = edit(moov)
+    new_moov = _box(b'moov', new_payload)
+
+    # Space the moov may grow into: its own plus any free/skip boxes right after it
+    available = moov_size
+    for box_type, _, _, size in boxes[index + 1:]:
+        if box_type not in (b'free', b'skip'):
+            break
+        available += size
+    gap = available - len(new_moov)
+
+    if gap == 0 or gap >= 8:
+        padding = _box(b'free', b'\x00' * (gap - 8)) if gap else b''
+        _write_at(file_path, moov_offset, new_moov + padding)
+        return 'in_place'
+    if moov_offset + available == file_size:
+        _write_at(file_path, moov_offset, new_moov, truncate=True)
+        return 'end'
+
+    if any(box[0] == b'moof' for box in boxes):
+        # Fragments carry their own absolute data offsets and must follow the moov
+        raise QuickTimeWriteError("Fragmented MP4 with moov before the media data")
+    padding = _box(b'free', b'\x00' * (MOOV_PADDING - 8))
+
+    _, last_offset, _, last_size = boxes[-1]
+    with open(file_path, 'rb') as f:
+        f.seek(last_offset)
+        last_extends_to_eof = struct.unpack('>I', f.read(4))[0] == 0
+    if last_offset + last_size == file_size and not last_extends_to_eof and available <= 0xFFFFFFFF:
+        # Write the new moov first: until the old one is freed, players keep using the old one
+        _write_at(file_path, file_size, new_moov + padding)
+        _write_at(file_path, moov_offset, struct.pack('>I4s', available, b'free'))
+        return 'relocated'
+
+    delta = len(new_moov) + len(padding) - available
+    new_moov = _box(b'moov', shift_chunk_offsets(new_payload, moov_offset + available, delta))
+    _replace_range(file_path, moov_offset, moov_offset + available, new_moov + padding, file_size)
+    return 'shifted'
+
+
+def write_quicktime_location(file_path, location):
+    """
+    Set the ©xyz location of a QuickTime/MP4 file without remuxing it.
+
+    Args:
+        file_path (str): Path of the .mp4/.mov file
+        location (str): ISO 6709 location (see format_iso6709), or None to remove it
+
+    Returns:
+        bool: True if the location was written, False if the file needs an ffmpeg remux
+    """
+    try:
+        how = rewrite_moov(file_path, lambda moov: set_udta_location(moov, location))
+        logger.debug(f"Wrote location of {file_path} ({how})")
+        return True
+    except (QuickTimeWriteError, struct.error, OSError) as e:
+        logger.warning(f"Could not write location of {file_path} natively: {e}")
+        return False
+
+
+def write_quicktime_udta(file_path, udta_box):
+    """
+    Replace the moov/udta box of a QuickTime/MP4 file, header included; b'' removes it.
+
+    Returns:
+        bool: True if the box was written, False if the file needs an ffmpeg remux
+    """
+    try:
+        rewrite_moov(file_path, lambda moov: set_udta(moov, udta_box))
+        return True
+    except (QuickTimeWriteError, struct.error, OSError) as e:
+        logger.warning(f"Could not write udta of {file_path} natively: {e}")
+        return False
@@ -0,0 +1,56 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from utils import setup_logger
+
+# Setup logger
+logger = setup_logger()
+
+
+class Prefetcher:
+    """
+    Warms caches for the review entries around the current one.
+
+    schedule() is called whenever the current entry changes; it hands the
+    next `ahead` entries and the previous `behind` ones to a small thread
+    pool that runs warm(path) on each. Paths already being warmed are not
+    queued twice, and queued paths that are no longer near the current
+    entry are skipped when their turn comes, so fast clicking does not
+    build up a backlog.
+    """
+
+    def __init__(self, warm, workers=2, ahead=3, behind=1):
+        self.warm = warm
+        self.ahead = ahead
+        self.behind = behind
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='prefetch')
+        self._lock = threading.Lock()
+        self._queued = set()
+        self._wanted = set()
+
+    def neighbours(self, count, index):
+        """Indexes to warm around index, nearest upcoming entries first."""
+        upcoming = range(index + 1, min(count, index + 1 + self.ahead))
+        previous = range(index - 1, max(-1, index - 1 - self.behind), -1)
+        return list(upcoming) + list(previous)
+
+    def schedule(self, paths):
+        """Warm the given paths in the background, dropping interest in any others still queued."""
+        with self._lock:
+            self._wanted = set(paths)
+            new = [path for path in paths if path not in self._queued]
+            self._queued.update(new)
+        for path in new:
+            self._executor.submit(self._run, path)
+
+    def _run(self, path):
+        try:
+            with self._lock:
+                if path not in self._wanted:
+                    return
+            self.warm(path)
+        except Exception as e:
+            logger.debug(f"Prefetch of {path} failed: {e}")
+        finally:
+            with self._lock:
+                self._queued.discard(path)
@@ -0,0 +1,165 @@
+import bisect
+import math
+from array import array
+
+from utils import setup_logger
+
+# Setup logger
+logger = setup_logger()
+
+EARTH_RADIUS_M = 6371000.0
+
+
+def haversine_m(lat1, lon1, lat2, lon2):
+    """Great-circle distance between two points in metres."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+
+def interpolate_position(lat1, lon1, lat2, lon2, fraction):
+    """Linearly interpolate between two positions, taking the short way across the antimeridian."""
+    dlon = lon2 - lon1
+    if dlon > 180:
+        dlon -= 360
+    elif dlon < -180:
+        dlon += 360
+    lon = lon1 + dlon * fraction
+    if lon > 180:
+        lon -= 360
+    elif lon < -180:
+        lon += 360
+    return lat1 + (lat2 - lat1) * fraction, lon
+
+
+class GpsTimeIndex:
+    """
+    Geotagged reference points sorted by capture time.
+
+    Timestamps and coordinates are kept in parallel arrays so that each lookup
+    is a binary search instead of a pass over every geotagged file.
+    """
+
+    def __init__(self, points):
+        """
+        Args:
+            points (iterable): (epoch_seconds, lat, lon, path) tuples, in any order
+        """
+        points = sorted(points, key=lambda p: p[0])
+        self.times = array('d', (p[0] for p in points))
+        self.lats = array('d', (p[1] for p in points))
+        self.lons = array('d', (p[2] for p in points))
+        self.paths = [p[3] for p in points]
+
+    @classmethod
+    def from_media(cls, media_files, datetime_key='datetime'):
+        """
+        Build an index from media dicts with a datetime and a 'gps' (lat, lon) tuple.
+
+        Files without a datetime or GPS are skipped; callers filter out invalid
+        coordinates beforehand.
+        """
+        points = []
+        for media in media_files:
+            dt = media.get(datetime_key)
+            gps = media.get('gps')
+            if dt is None or not gps:
+                continue
+            points.append((dt.timestamp(), gps[0], gps[1], media.get('path')))
+        logger.debug(f"Built GPS time index with {len(points)} reference points")
+        return cls(points)
+
+    @classmethod
+    def from_arrays(cls, times, lats, lons):
+        """
+        Build an index from parallel arrays of epoch seconds, latitudes and longitudes.
+
+        Used for large point sets such as GPS tracks, where building a tuple per
+        point would be wasteful. The arrays are only re-ordered if not already sorted.
+        """
+        index = cls(())
+        if any(times[i] > times[i + 1] for i in range(len(times) - 1)):
+            order = sorted(range(len(times)), key=times.__getitem__)
+            times = array('d', (times[i] for i in order))
+            lats = array('d', (lats[i] for i in order))
+            lons = array('d', (lons[i] for i in order))
+        index.times = array('d', times)
+        index.lats = array('d', lats)
+        index.lons = array('d', lons)
+        index.paths = None
+        return index
+
+    def __len__(self):
+        return len(self.times)
+
+    def nearest(self, dt, window_seconds):
+        """
+        Find the reference point closest in time to dt.
+
+        Args:
+            dt (datetime): Capture time of the file needing a proxy
+            window_seconds (float): Maximum allowed time difference
+
+        Returns:
+            tuple: ((lat, lon), time_diff_seconds, source_path), or None if no point is within the window
+        """
+        t = dt.timestamp()
+        i = bisect.bisect_left(self.times, t)
+        best = None
+        best_diff = None
+        # Only the neighbours on either side of the insertion point can be closest
+        for j in (i - 1, i):
+            if 0 <= j < len(self.times):
+                diff = abs(self.times[j] - t)
+                if diff <= window_seconds and (best_diff is None or diff < best_diff):
+                    best, best_diff = j, diff
+        if best is None:
+            return None
+        return (self.lats[best], self.lons[best]), best_diff, self.paths[best] if self.paths else None
+
+    def interpolate_many(self, times, window_seconds):
+        """
+        Interpolate a position for many capture times in one sweep over the index.
+
+        Each time is placed between the reference points just before and just
+        after it. When both lie within the window the position is interpolated
+        linearly in time; otherwise the nearer one within the window is used.
+
+        Args:
+            times (list): Epoch seconds of the files needing a proxy, in any order
+            window_seconds (float): Maximum allowed time difference to a reference point
+
+        Returns:
+            list: Aligned with times, each either None or ((lat, lon), confidence) where
+                  confidence is a dict with 'method' ('interpolated' or 'nearest'),
+                  'time_gap' (seconds spanned by the reference points used) and
+                  'distance' (metres between the bracketing points, None for 'nearest')
+        """
+        results = [None] * len(times)
+        n = len(self.times)
+        j = 0
+        # Walk the targets in time order so the reference pointer only moves forward
+        for k in sorted(range(len(times)), key=times.__getitem__):
+            t = times[k]
+            while j < n and self.times[j] < t:
+                j += 1
+            before = j - 1 if j > 0 and t - self.times[j - 1] <= window_seconds else None
+            after = j if j < n and self.times[j] - t <= window_seconds else None
+
+            if after is not None and self.times[after] == t:
+                results[k] = ((self.lats[after], self.lons[after]),
+                              {'method': 'nearest', 'time_gap': 0.0, 'distance': None})
+            elif before is not None and after is not None:
+                gap = self.times[after] - self.times[before]
+                position = interpolate_position(self.lats[before], self.lons[before],
+                                                self.lats[after], self.lons[after],
+                                                (t - self.times[before]) / gap)
+                distance = haversine_m(self.lats[before], self.lons[before], self.lats[after], self.lons[after])
+                results[k] = (position, {'method': 'interpolated', 'time_gap': gap, 'distance': distance})
+            elif before is not None or after is not None:
+                i = before if before is not None else after
+                results[k] = ((self.lats[i], self.lons[i]),
+                              {'method': 'nearest', 'time_gap': abs(self.times[i] - t), 'distance': None})
+        return results
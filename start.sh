@@ -2,7 +2,7 @@
 
 # Create data directories if they don't exist
 echo "Creating data directories..."
-mkdir -p data/csv data/log data/photos
+mkdir -p data/csv data/log data/photos data/cache data/gpx data/backups
 
 # Set proper permissions for data directories
 echo "Setting permissions..."
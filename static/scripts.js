@@ -214,7 +214,43 @@ function setupDirectoryBrowser() {
 // Heatmap Modal functionality
 // =====================================
 
-function setupHeatmapModal(gpsPoints) {
+/**
+ * Load the heatmap points of all review entries, one [lat, lon] or null per entry.
+ * The last result is kept in sessionStorage, so after the first load only the points
+ * changed since then are fetched; unchanged lists are answered with 304 from the ETag.
+ */
+function loadGpsPoints() {
+    let cached = null;
+    try {
+        cached = JSON.parse(sessionStorage.getItem('gpsPoints'));
+    } catch (e) {
+        cached = null;
+    }
+    const url = cached
+        ? `${window.GPS_POINTS_URL}?reviewer=${encodeURIComponent(cached.reviewer)}&since=${cached.version}`
+        : window.GPS_POINTS_URL;
+    return fetch(url)
+        .then(res => {
+            if (!res.ok) throw new Error(`HTTP ${res.status}`);
+            return res.json();
+        })
+        .then(data => {
+            let points = data.points;
+            if (data.changed) {
+                points = cached.points;
+                Object.entries(data.changed).forEach(([index, point]) => { points[index] = point; });
+            }
+            try {
+                sessionStorage.setItem('gpsPoints', JSON.stringify({ reviewer: data.reviewer, version: data.version, points }));
+            } catch (e) {
+                // Storage full; the next page load fetches the full list again
+                sessionStorage.removeItem('gpsPoints');
+            }
+            return points;
+        });
+}
+
+function setupHeatmapModal(gpsPointsPromise) {
     // Set up the focus management for accessibility (ARIA) fix
     const heatmapModalEl = document.getElementById('heatmapModal');
     const showHeatmapBtn = document.getElementById('showHeatmapBtn');
@@ -239,7 +275,16 @@ function setupHeatmapModal(gpsPoints) {
             if (window.heatmapInitialized) return;
             window.heatmapInitialized = true;
             heatmapModalShown = true;
-            // Filter out invalid points
+            gpsPointsPromise.then(showHeatmap).catch(() => {
+                mapDiv.innerHTML = '<div class="alert alert-danger m-3">Could not load the GPS points for the heatmap.</div>';
+                window.heatmapInitialized = false;
+                // Try again the next time the heatmap is opened
+                gpsPointsPromise = loadGpsPoints();
+            });
+        }
+
+        function showHeatmap(gpsPoints) {
+            // Filter out invalid points (entries without coordinates are null)
             gpsPoints = gpsPoints.filter(pt => pt && pt.length === 2 && !isNaN(pt[0]) && !isNaN(pt[1]));
             let center = [0, 0];
             if (gpsPoints.length > 0) {
@@ -483,17 +528,9 @@ function initReviewPage() {
         saveModal.show();
         const saveProgressBar = document.getElementById('saveProgressBar');
         const saveStatusText = document.getElementById('saveStatusText');
-        let progress = 0;
-        const interval = setInterval(() => {
-            if (progress >= 100) {
-                clearInterval(interval);
-                saveStatusText.innerText = 'Finalizing changes...';
-            } else {
-                progress += 10;
-                saveProgressBar.style.width = `${progress}%`;
-                saveStatusText.innerText = `Saving... ${progress}%`;
-            }
-        }, 300);
+        saveProgressBar.classList.remove('bg-danger');
+        saveProgressBar.style.width = '0%';
+        saveStatusText.innerText = 'Preparing to save...';
         fetch('/save_all', {
             method: 'POST',
             headers: {
@@ -506,32 +543,126 @@ function initReviewPage() {
             return response.json();
         })
         .then(data => {
-            clearInterval(interval);
-            if (data.status === 'success') {
+            if (data.status === 'started') {
+                followSaveProgress(data.events_url, saveModal);
+            } else {
+                showSaveError(`Error: ${data.message || 'Unknown error occurred'}`);
+            }
+        })
+        .catch(error => {
+            showSaveError(`Request failed: ${error.message}`);
+        });
+    }
+
+    function formatBytes(bytes) {
+        if (bytes < 1024 * 1024) return `${(bytes / 1024).toFixed(1)} KB`;
+        if (bytes < 1024 * 1024 * 1024) return `${(bytes / (1024 * 1024)).toFixed(1)} MB`;
+        return `${(bytes / (1024 * 1024 * 1024)).toFixed(2)} GB`;
+    }
+
+    function showSaveError(message) {
+        const saveProgressBar = document.getElementById('saveProgressBar');
+        saveProgressBar.classList.add('bg-danger');
+        document.getElementById('saveStatusText').innerHTML = `
+            <i class="bi bi-exclamation-triangle-fill text-danger"></i> 
+            ${message}
+        `;
+    }
+
+    function followSaveProgress(eventsUrl, saveModal) {
+        const saveProgressBar = document.getElementById('saveProgressBar');
+        const saveStatusText = document.getElementById('saveStatusText');
+        const saveStatsText = document.getElementById('saveStatsText');
+        const saveCurrentFile = document.getElementById('saveCurrentFile');
+        const source = new EventSource(eventsUrl);
+
+        source.addEventListener('progress', event => {
+            const job = JSON.parse(event.data);
+            const percent = job.discovered ? Math.round((job.processed / job.discovered) * 100) : 0;
+            saveProgressBar.style.width = `${percent}%`;
+            saveStatusText.innerText = `Saved ${job.processed - job.failed} of ${job.discovered} files` +
+                (job.failed ? `, ${job.failed} failed` : '');
+            saveStatsText.innerText = `${formatBytes(job.bytes_written)} written | ${job.throughput} files/s` +
+                (job.eta !== null ? ` | ${Math.round(job.eta)}s remaining` : '');
+            saveCurrentFile.innerText = job.message || '';
+        });
+
+        source.addEventListener('done', event => {
+            source.close();
+            const job = JSON.parse(event.data);
+            saveCurrentFile.innerText = '';
+            if (job.status === 'completed' && job.result) {
                 saveProgressBar.style.width = '100%';
                 saveStatusText.innerHTML = `
                     <i class="bi bi-check-circle-fill text-success"></i> 
-                    Saved ${data.changes_made} of ${data.total_entries} files
+                    Saved ${job.result.success} of ${job.result.total} files
+                    (${job.result.written} rewritten, the rest already up to date)
                 `;
-                document.getElementById('changesMadeCount').textContent = data.changes_made;
-                setTimeout(() => saveModal.hide(), 1500);
+                document.getElementById('changesMadeCount').textContent = job.result.success;
+                if (!job.result.failed) setTimeout(() => saveModal.hide(), 1500);
+            } else if (job.status === 'cancelled') {
+                showSaveError('Save cancelled');
             } else {
-                saveProgressBar.classList.add('bg-danger');
-                saveStatusText.innerHTML = `
-                    <i class="bi bi-exclamation-triangle-fill text-danger"></i> 
-                    Error: ${data.message || 'Unknown error occurred'}
-                `;
+                showSaveError(`Error: ${job.error || 'Unknown error occurred'}`);
             }
-        })
-        .catch(error => {
-            clearInterval(interval);
-            saveProgressBar.classList.add('bg-danger');
-            saveStatusText.innerHTML = `
-                <i class="bi bi-exclamation-triangle-fill text-danger"></i> 
-                Request failed: ${error.message}
-            `;
         });
+
+        source.onerror = () => {
+            // EventSource reconnects on its own; give up only once the server closed the stream for good
+            if (source.readyState === EventSource.CLOSED) {
+                showSaveError('Lost connection to the server. The save continues in the background.');
+            }
+        };
     }
+
+    // Reattach to a bulk save that is still running, e.g. after reloading the page
+    if (window.SAVE_EVENTS_URL) {
+        const saveModal = new bootstrap.Modal(document.getElementById('saveProgressModal'));
+        saveModal.show();
+        followSaveProgress(window.SAVE_EVENTS_URL, saveModal);
+    }
+
+    document.getElementById('retryWritesBtn')?.addEventListener('click', function () {
+        this.disabled = true;
+        fetch('/write_queue/retry', { method: 'POST', headers: { 'Content-Type': 'application/json' }, body: '{}' })
+            .finally(() => {
+                this.disabled = false;
+                pollWriteQueue();
+            });
+    });
+    pollWriteQueue();
+}
+
+/**
+ * Show queued and failed background GPS writes, polling while any are outstanding
+ */
+function pollWriteQueue() {
+    const container = document.getElementById('writeQueueStatus');
+    if (!container) return;
+    clearTimeout(window.writeQueueTimer);
+    fetch('/write_queue')
+        .then(res => res.json())
+        .then(queue => {
+            const outstanding = queue.pending + queue.writing;
+            const failedBox = document.getElementById('writeQueueFailed');
+            const failedList = document.getElementById('writeQueueFailedList');
+            document.getElementById('writeQueuePending').innerText =
+                outstanding ? `Writing ${outstanding} GPS update${outstanding === 1 ? '' : 's'} in the background...` : '';
+            failedList.innerHTML = '';
+            queue.failed.forEach(item => {
+                const li = document.createElement('li');
+                li.textContent = `${item.path}: ${item.error || 'unknown error'}`;
+                failedList.appendChild(li);
+            });
+            document.getElementById('writeQueueFailedText').innerText =
+                `${queue.failed.length} GPS update${queue.failed.length === 1 ? '' : 's'} could not be written`;
+            failedBox.style.display = queue.failed.length ? '' : 'none';
+            container.style.display = outstanding || queue.failed.length ? '' : 'none';
+            if (outstanding) window.writeQueueTimer = setTimeout(pollWriteQueue, 2000);
+        })
+        .catch(() => {
+            window.writeQueueTimer = setTimeout(pollWriteQueue, 5000);
+        });
 }
 
 // =====================================
@@ -649,7 +780,9 @@ function initIndexPage() {
                 })
                     .then((res) => res.json())
                     .then((data) => {
-                        if (data.status === "success" && data.redirect) {
+                        if (data.status === "started" && data.status_url) {
+                            pollScanJob(data, scanResult);
+                        } else if (data.status === "success" && data.redirect) {
                             window.location.href = data.redirect;
                         } else if (data.status === "error") {
                             scanResult.innerHTML = `<div class='alert alert-danger'>${
@@ -672,6 +805,37 @@ function initIndexPage() {
     }
 }
 
+/**
+ * Poll a background scan job, showing its progress until the review page is ready
+ */
+function pollScanJob(job, container) {
+    fetch(job.status_url)
+        .then((res) => res.json())
+        .then((status) => {
+            if (status.status === "completed") {
+                window.location.href = job.redirect;
+                return;
+            }
+            if (status.status === "failed" || status.status === "cancelled" || status.status === "error") {
+                const message = status.error || status.message || `Scan ${status.status}.`;
+                container.innerHTML = `<div class='alert alert-danger'>${message}</div>`;
+                return;
+            }
+            const eta = status.eta !== null ? `, about ${Math.round(status.eta)}s remaining` : "";
+            container.innerHTML =
+                `<div class="text-center"><div class="spinner-border" role="status"></div> ` +
+                `Scanning... ${status.processed} of ${status.discovered} files ` +
+                `(${status.failed} failed, ${status.throughput} files/s${eta}) ` +
+                `<button type="button" class="btn btn-sm btn-outline-danger ms-2" id="cancelScanBtn">Cancel</button></div>`;
+            document.getElementById("cancelScanBtn").addEventListener("click", function () {
+                this.disabled = true;
+                fetch(job.cancel_url, { method: "POST" });
+            });
+            setTimeout(() => pollScanJob(job, container), 500);
+        })
+        .catch(() => setTimeout(() => pollScanJob(job, container), 2000));
+}
+
 // =====================================
 // Document ready handler that initializes appropriate functionality
 // =====================================
@@ -688,9 +852,9 @@ document.addEventListener("DOMContentLoaded", function () {
     if (document.getElementById("map") && document.getElementById("gpsForm")) {
         initReviewPage();
         
-        // Initialize heatmap if GPS points are available
-        if (window.GPS_POINTS) {
-            setupHeatmapModal(window.GPS_POINTS);
+        // Initialize the heatmap; its points load in the background
+        if (window.GPS_POINTS_URL) {
+            setupHeatmapModal(loadGpsPoints());
         }
         
         // Enable tooltips (for proxy GPS indicators)
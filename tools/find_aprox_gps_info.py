@@ -10,6 +10,17 @@ import csv
 import platform
 from log_utils import setup_logger
 
+# Allow importing shared modules from the project root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from media_index import get_media_index
+from media_scanner import collect_media_paths, extract_many
+from mp4_atoms import QUICKTIME_EXTENSIONS, read_quicktime_metadata
+# Same extractor as the app, so index rows mean the same whoever wrote them
+from media_metadata import parse_iso6709, extract_media_info
+from heif_meta import HEIF_EXTENSIONS, read_fast_heif_exif
+from proxy_gps import GpsTimeIndex
+from gpx_track import GpxTrackStore
+
 # Set up logger
 logger = setup_logger('find_aprox_gps_info')
 
@@ -79,7 +90,15 @@ def get_media_datetime(file_path):
     
     file_lower = file_path.lower()
         
-    # Handle HEIC files specifically with pillow-heif if available
+    # HEIC/HEIF: read the Exif item from the meta box without decoding the image
+    if file_lower.endswith(HEIF_EXTENSIONS):
+        fast = read_fast_heif_exif(file_path)
+        if fast is not None:
+            if fast['datetime'] is None:
+                logger.debug(f"No DateTimeOriginal found in HEIC/HEIF file: {file_path}")
+            return fast['datetime']
+
+    # Fall back to pillow-heif if the container could not be parsed
     if file_lower.endswith(('.heic', '.heif')) and HEIF_SUPPORT:
         try:
             # pillow-heif allows opening HEIC files directly via PIL
@@ -112,6 +131,13 @@ def get_media_datetime(file_path):
     # For videos
     try:
         if file_lower.endswith(('.mp4', '.mov', '.avi', '.mkv')):
+            # Read mvhd straight from the moov box; ffprobe is only needed for AVI/MKV
+            if file_lower.endswith(QUICKTIME_EXTENSIONS):
+                native = read_quicktime_metadata(file_path)
+                if native is not None:
+                    if not native['creation_time']:
+                        logger.debug(f"No creation_time found in video metadata for {file_path}")
+                    return native['creation_time']
             metadata = get_video_metadata(file_path)
             if metadata:
                 tags = metadata.get('format', {}).get('tags', {})
@@ -146,7 +172,16 @@ def get_media_gps(file_path):
         
         file_lower = file_path.lower()
         
-        # Handle HEIC files specifically with pillow-heif if available
+        # HEIC/HEIF: read the Exif item from the meta box without decoding the image
+        if file_lower.endswith(HEIF_EXTENSIONS):
+            fast = read_fast_heif_exif(file_path)
+            if fast is not None:
+                if is_valid_gps(fast['gps']):
+                    return fast['gps']
+                logger.debug(f"No GPS data found in HEIC/HEIF file: {file_path}")
+                return None
+
+        # Fall back to pillow-heif if the container could not be parsed
         if file_lower.endswith(('.heic', '.heif')) and HEIF_SUPPORT:
             try:
                 # pillow-heif allows opening HEIC files directly via PIL
@@ -189,49 +224,27 @@ def get_media_gps(file_path):
             if ' ' in file_path or any(c in file_path for c in '()[]&$;,'):
                 logger.debug(f"Path contains spaces or special characters: {file_path}")
             
-            # Use FFmpeg to extract metadata, including GPS coordinates
-            try:
-                # Just pass the path directly - subprocess handles escaping
-                ffmpeg_command = [
-                    'ffmpeg', '-i', file_path, '-f', 'ffmetadata', '-']
-                result = subprocess.run(ffmpeg_command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-                metadata = result.stdout
-
-                # Check for errors
-                if result.stderr and "error" in result.stderr.lower():
-                    logger.error(f"Error with file {file_path}: {result.stderr}")
-                    return None
-            except Exception as e:
-                logger.error(f"FFmpeg execution error for {file_path}: {str(e)}")
-                return None
-
             gps_data = None
-            # Look for GPS info in the metadata output
-            for line in metadata.splitlines():
-                if 'location' in line.lower():  # Check for the location tag in the metadata
-                    gps_data = line.split('=')[1].strip()
-                    break
+            native = None
+            # Read udta/©xyz and mdta keys straight from the moov box when possible
+            if file_lower.endswith(QUICKTIME_EXTENSIONS):
+                native = read_quicktime_metadata(file_path)
+            
+            if native is not None:
+                gps_data = native['location']
+            else:
+                # Use ffprobe for containers we can't parse natively (AVI, MKV)
+                metadata = get_video_metadata(file_path)
+                if metadata:
+                    tags = metadata.get('format', {}).get('tags', {})
+                    for key, value in tags.items():
+                        if 'location' in key.lower():  # Check for the location tag in the metadata
+                            gps_data = value.strip()
+                            break
 
             if gps_data:
-                # Parse the location string if found (e.g., +38.7695-009.1297)
-                loc = gps_data.strip('/')
-                if loc[0] not in ('+', '-'):
-                    return None  # Invalid location format
-
-                split_indexes = [i for i in range(1, len(loc)) if loc[i] in ('+', '-') and loc[i-1] not in ('E', 'W', 'N', 'S')]
-
-                if len(split_indexes) == 1:
-                    # Extract latitude and longitude from the two parts
-                    lat = float(loc[:split_indexes[0]])
-                    lon = float(loc[split_indexes[0]:])
-                    if is_valid_gps((lat, lon)):
-                        return (lat, lon)
-                    else:
-                        logger.warning(f"Invalid GPS coordinates skipped: {lat}, {lon}")
-                        return None
-                else:
-                    logger.warning(f"Could not parse GPS coordinates: {loc}")
-                    return None
+                # Parse the ISO 6709 location string (e.g., +38.7695-009.1297+012.000/)
+                return parse_iso6709(gps_data)
 
         # Default behavior for other files
         else:
@@ -290,7 +303,7 @@ def get_video_metadata(file_path):
         
         result = subprocess.run([
             'ffprobe', '-v', 'quiet', '-print_format', 'json',
-            '-show_format', '-show_streams', file_path
+            '-show_format', file_path
         ], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
         
         if result.stderr:
@@ -305,9 +318,10 @@ def get_video_metadata(file_path):
         logger.error(f"Error in get_video_metadata for {file_path}: {str(e)}")
         return None
 
-def scan_directory_for_media(directory):
+def scan_directory_for_media(directory, workers=None):
     """Scan a directory and return all media files with their datetime and GPS info."""
     media_files = []
+    media_index = get_media_index()
     
     # Fix long path issue on Windows
     directory = fix_long_path(directory)
@@ -325,87 +339,52 @@ def scan_directory_for_media(directory):
     all_supported_extensions = image_extensions + video_extensions
     if HEIF_SUPPORT:
         all_supported_extensions += heic_extensions
+    else:
+        logger.warning("pillow-heif not available - HEIC/HEIF files will be skipped")
     
     logger.info(f"Scanning directory: {directory}")
-    for root, _, files in os.walk(directory):
-        for file in files:
-            file_path = os.path.join(root, file)
-            
-            # Fix long paths
-            file_path = fix_long_path(file_path)
-            file_lower = file_path.lower()
-            
-            # Skip unsupported HEIC files if pillow-heif is not available
-            if not HEIF_SUPPORT and file_lower.endswith(heic_extensions):
-                logger.warning(f"Skipping HEIC/HEIF file {file_path} - pillow-heif not available")
-                continue
-                
-            # Check file extension
-            if file_lower.endswith(all_supported_extensions):
-                try:
-                    logger.debug(f"Processing: {file_path}")
-                    dt = get_media_datetime(file_path)
-                    gps = get_media_gps(file_path)
-                    media_files.append({
-                        'path': file_path,
-                        'datetime': dt,
-                        'gps': gps  # Will be None if no valid GPS found
-                    })
-                except Exception as e:
-                    logger.error(f"Error processing {file_path}: {str(e)}")
-            else:
-                logger.debug(f"Skipping (unrecognized extension): {file_path}")
+    file_paths = collect_media_paths(directory, all_supported_extensions, fix_long_path)
+    
+    # Served from the media index when unchanged; misses are extracted in parallel
+    for file_path, info, error in extract_many(file_paths, extract_media_info, index=media_index, workers=workers):
+        if error:
+            logger.error(f"Error processing {file_path}: {error}")
+            continue
+        logger.debug(f"Processed: {file_path}")
+        media_files.append({
+            'path': file_path,
+            'datetime': info['datetime'],
+            'gps': info['gps'],  # Will be None if no valid GPS found
+            'orig_gps': info['gps']
+        })
     
     logger.info(f"Found {len(media_files)} media files in {directory}")
     return media_files
 
-def find_closest_gps(media_files, target_file, time_window_hours=1):
-    """Find closest media file with valid GPS within a time window."""
+def find_closest_gps(gps_index, target_file, time_window_hours=1):
+    """Find closest media file with valid GPS within a time window using a GpsTimeIndex."""
     try:
         target_dt = target_file['datetime']
         if not target_dt:
             logger.debug(f"No datetime for target file: {target_file['path']}")
             return None
-            
-        time_window = timedelta(hours=time_window_hours)
-        closest_gps = None
-        min_time_diff = None
-        source_path = None
-        
-        for media in media_files:
-            # Skip files that don't exist anymore
-            if not os.path.exists(media['path']):
-                continue
-                
-            # Skip comparing to self
-            if media['path'] == target_file['path']:
-                continue
-                
-            # Look for valid GPS data with datetime
-            if is_valid_gps(media['gps']) and media['datetime']:
-                try:
-                    time_diff = abs((target_dt - media['datetime']).total_seconds())
-                    if time_diff <= time_window.total_seconds():
-                        if min_time_diff is None or time_diff < min_time_diff:
-                            min_time_diff = time_diff
-                            closest_gps = media['gps']
-                            source_path = media['path']
-                except Exception as e:
-                    logger.error(f"Error calculating time difference: {str(e)}")
-        
+
+        match = gps_index.nearest(target_dt, timedelta(hours=time_window_hours).total_seconds())
+
         # Log the result
-        if closest_gps:
-            logger.info(f"Found GPS match for {target_file['path']}: using {source_path} with GPS {closest_gps} (time diff: {min_time_diff/60:.1f} minutes)")
-        else:
-            logger.debug(f"No GPS match found for {target_file['path']} within {time_window_hours} hour window")
-            
-        return closest_gps
+        if match:
+            closest_gps, time_diff, source_path = match
+            logger.info(f"Found GPS match for {target_file['path']}: using {source_path} with GPS {closest_gps} (time diff: {time_diff/60:.1f} minutes)")
+            return closest_gps
+
+        logger.debug(f"No GPS match found for {target_file['path']} within {time_window_hours} hour window")
+        return None
     except Exception as e:
         logger.error(f"Error finding closest GPS for {target_file.get('path', 'unknown')}: {str(e)}")
         return None
 
-def process_directory(directory, time_window_hours=1):
-    """Process media files and assign GPS coordinates."""
+def process_directory(directory, time_window_hours=1, workers=None, gpx_paths=None):
+    """Process media files and assign GPS coordinates, from GPX tracks first and then from other files."""
     # Verify directory exists and is accessible
     if not os.path.exists(directory):
         logger.error(f"Directory does not exist: {directory}")
@@ -416,11 +395,32 @@ def process_directory(directory, time_window_hours=1):
         return []
     
     # Scan for media files
-    media_files = scan_directory_for_media(directory)
+    media_files = scan_directory_for_media(directory, workers)
     logger.info(f"Found {len(media_files)} media files to process")
     
-    # Process files without GPS data
+    # Index the geotagged files by time once; files that vanished since the scan are left out
+    gps_index = GpsTimeIndex.from_media(
+        m for m in media_files if is_valid_gps(m['gps']) and m['datetime'] and os.path.exists(m['path'])
+    )
+    logger.info(f"Using {len(gps_index)} geotagged files as proxy GPS references")
+
+    # GPS logger tracks take precedence over neighbouring files
     files_processed = 0
+    if gpx_paths:
+        gpx_store = GpxTrackStore()
+        for gpx_path in gpx_paths:
+            gpx_store.add_path(gpx_path)
+        targets = [m for m in media_files if not is_valid_gps(m['gps']) and m['datetime'] is not None]
+        results = gpx_store.interpolate_many([m['datetime'].timestamp() for m in targets],
+                                             timedelta(hours=time_window_hours).total_seconds())
+        for media, result in zip(targets, results):
+            if result and is_valid_gps(result[0]):
+                media['gps'] = result[0]
+                media['gps_source'] = 'gpx'
+                files_processed += 1
+        logger.info(f"Added GPX track positions to {files_processed} files")
+
+    # Process files without GPS data
     for media in media_files:
         try:
             # Skip files that don't exist anymore
@@ -429,7 +429,7 @@ def process_directory(directory, time_window_hours=1):
                 continue
                 
             if not is_valid_gps(media['gps']) and media['datetime'] is not None:
-                media['gps'] = find_closest_gps(media_files, media, time_window_hours)
+                media['gps'] = find_closest_gps(gps_index, media, time_window_hours)
                 if is_valid_gps(media['gps']):
                     files_processed += 1
         except Exception as e:
@@ -463,8 +463,8 @@ def save_results(media_files, output_file):
                         logger.warning(f"File no longer exists, skipping CSV entry: {media['path']}")
                         continue
                         
-                    original_gps = get_media_gps(media['path'])
-                    gps_source = 'original' if media['gps'] == original_gps else 'proxy'
+                    original_gps = media['orig_gps'] if 'orig_gps' in media else get_media_gps(media['path'])
+                    gps_source = media.get('gps_source') or ('original' if media['gps'] == original_gps else 'proxy')
                     
                     writer.writerow({
                         'path': media['path'],
@@ -489,6 +489,10 @@ if __name__ == "__main__":
     parser.add_argument("--output", help="Output CSV file to save results.", required=True)
     parser.add_argument("--time-window", type=float, default=1.0,
                        help="Time window in hours to search for GPS matches (default: 1 hour)")
+    parser.add_argument("--workers", type=int, default=None,
+                       help="Number of parallel scan workers (default: SCAN_WORKERS or CPU count, 1 disables)")
+    parser.add_argument("--gpx", action="append", default=[],
+                       help="GPX file or directory of GPX files to use as a proxy GPS source (repeatable)")
     args = parser.parse_args()
 
     try:
@@ -506,7 +510,7 @@ if __name__ == "__main__":
         logger.info(f"Scanning {args.directory} for media files...")
         
         # Process directory
-        media_files = process_directory(args.directory, args.time_window)
+        media_files = process_directory(args.directory, args.time_window, args.workers, args.gpx)
         
         # If no media files found, log and exit
         if not media_files:
@@ -519,7 +523,7 @@ if __name__ == "__main__":
         # Only count original GPS if the files still exist
         files_with_original_gps = sum(1 for m in media_files 
                                      if os.path.exists(m['path']) and 
-                                     m['gps'] == get_media_gps(m['path']) and 
+                                     m['gps'] == m['orig_gps'] and 
                                      is_valid_gps(m['gps']))
                                      
         files_with_proxy_gps = files_with_gps - files_with_original_gps
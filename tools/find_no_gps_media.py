@@ -4,6 +4,13 @@ from PIL import Image, UnidentifiedImageError
 import exifread
 from log_utils import setup_logger
 
+# Allow importing shared modules from the project root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from media_index import get_media_index
+from media_scanner import collect_media_paths, extract_many
+# Same extractor as the app, so index rows mean the same whoever wrote them
+from media_metadata import extract_media_info
+
 # Set up logger
 logger = setup_logger('find_no_gps_media')
 
@@ -24,20 +31,20 @@ def has_gps_info(file_path):
         return False
     return False
 
-def scan_directory_for_no_gps(directory):
+def scan_directory_for_no_gps(directory, workers=None):
     """Scan a directory and return media files without GPS."""
     no_gps_files = []
     logger.info(f"Scanning directory: {directory}")
-    total_files = 0
-    for root, _, files in os.walk(directory):
-        for file in files:
-            file_path = os.path.join(root, file)
-            #if file.lower().endswith(('.jpg', '.jpeg', '.png', '.heic', '.tiff', '.mp4', '.mov', '.avi', '.mkv')):
-            if file.lower().endswith(('.jpg', '.jpeg', '.png', '.heic', '.tiff')):
-                total_files += 1
-                if not has_gps_info(file_path):
-                    logger.debug(f"No GPS found in: {file_path}")
-                    no_gps_files.append(file_path)
+    media_index = get_media_index()
+    #file_paths = collect_media_paths(directory, ('.jpg', '.jpeg', '.png', '.heic', '.tiff', '.mp4', '.mov', '.avi', '.mkv'))
+    file_paths = collect_media_paths(directory, ('.jpg', '.jpeg', '.png', '.heic', '.tiff'))
+    total_files = len(file_paths)
+    
+    # Served from the media index when unchanged; misses are extracted in parallel
+    for file_path, info, error in extract_many(file_paths, extract_media_info, index=media_index, workers=workers):
+        if error or info['gps'] is None:
+            logger.debug(f"No GPS found in: {file_path}")
+            no_gps_files.append(file_path)
     
     logger.info(f"Processed {total_files} files, found {len(no_gps_files)} without GPS")
     return no_gps_files
@@ -48,11 +55,13 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="List media files without GPS data.")
     parser.add_argument("directory", help="Directory to scan for media files.")
     parser.add_argument("--output", help="Output file to save results (optional).")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Number of parallel scan workers (default: SCAN_WORKERS or CPU count, 1 disables)")
     args = parser.parse_args()
 
     try:
         logger.info(f"Starting find_no_gps_media with directory: {args.directory}")
-        no_gps_files = scan_directory_for_no_gps(args.directory)
+        no_gps_files = scan_directory_for_no_gps(args.directory, args.workers)
 
         if no_gps_files:
             logger.info(f"Found {len(no_gps_files)} files without GPS")
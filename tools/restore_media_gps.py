@@ -0,0 +1,68 @@
+import os
+import sys
+import argparse
+from datetime import datetime
+from log_utils import setup_logger
+
+# Allow importing shared modules from the project root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from backup_journal import get_backup_journal
+
+# Set up logger
+logger = setup_logger('restore_media_gps')
+
+
+def list_backups(journal):
+    """Print every file with journaled original metadata."""
+    backups = journal.list_backups()
+    for backup in backups:
+        created = datetime.fromtimestamp(backup['created_at']).strftime('%Y-%m-%d %H:%M:%S')
+        print(f"{created}  {backup['kind']:<10} {backup['path']}")
+    print(f"{len(backups)} files backed up")
+
+
+def restore_paths(journal, paths):
+    """Restore the original metadata of each path, returning the number of failures."""
+    failed = 0
+    for path in paths:
+        if journal.restore(path):
+            logger.info(f"Restored: {path}")
+        else:
+            logger.error(f"Could not restore: {path}")
+            failed += 1
+    return failed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Undo GPS changes by re-applying the original metadata recorded in the backup journal"
+    )
+    parser.add_argument("paths", nargs="*", help="Files or directories to restore")
+    parser.add_argument("--all", action="store_true", help="Restore every file in the journal")
+    parser.add_argument("--list", action="store_true", help="List journaled files and exit")
+
+    args = parser.parse_args()
+    journal = get_backup_journal()
+
+    if args.list:
+        list_backups(journal)
+        sys.exit(0)
+
+    if args.all:
+        targets = [backup['path'] for backup in journal.list_backups()]
+    elif args.paths:
+        journaled = [backup['path'] for backup in journal.list_backups()]
+        targets = []
+        for path in args.paths:
+            path = os.path.abspath(path)
+            if os.path.isdir(path):
+                targets.extend(p for p in journaled if p.startswith(path + os.sep))
+            else:
+                targets.append(path)
+    else:
+        parser.error("give paths to restore, --all or --list")
+
+    logger.info(f"Restoring {len(targets)} files")
+    failed = restore_paths(journal, targets)
+    logger.info(f"Done: {len(targets) - failed} restored, {failed} failed")
+    sys.exit(1 if failed else 0)
@@ -1,15 +1,22 @@
 import os
 import subprocess
-import json
 from PIL import Image, ImageFile
-import exifread
-from datetime import datetime, timedelta
-import pytz
+from datetime import timedelta
 import csv
 import argparse
 import piexif
+import sys
 from log_utils import setup_logger
 
+# Allow importing shared modules from the project root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from media_index import get_media_index
+# Same extractor as the app, so index rows mean the same whoever wrote them
+from media_metadata import extract_media_info
+from mp4_atoms import QUICKTIME_EXTENSIONS
+from mp4_write import format_iso6709, write_quicktime_location
+from proxy_gps import GpsTimeIndex
+
 # Set up logger
 logger = setup_logger('update_media_gps_csv')
 
@@ -17,84 +24,21 @@ logger = setup_logger('update_media_gps_csv')
 ImageFile.LOAD_TRUNCATED_IMAGES = True
 
 
-def get_media_datetime(file_path):
-    """Extract datetime from media file."""
-    try:
-        with open(file_path, 'rb') as f:
-            tags = exifread.process_file(f, details=False)
-            if 'EXIF DateTimeOriginal' in tags:
-                dt_str = str(tags['EXIF DateTimeOriginal'])
-                return datetime.strptime(dt_str, '%Y:%m:%d %H:%M:%S').replace(tzinfo=pytz.UTC)
-    except Exception:
-        pass
-
-    metadata = get_video_metadata(file_path)
-    if metadata:
-        try:
-            tags = metadata.get('format', {}).get('tags', {})
-            creation_time = tags.get('creation_time')
-            if creation_time:
-                return datetime.fromisoformat(creation_time.replace('Z', '+00:00'))
-        except Exception:
-            pass
-
-    return None
-
-
-def get_media_gps(file_path):
-    """Extract GPS coordinates from media file if available."""
-    try:
-        with open(file_path, 'rb') as f:
-            tags = exifread.process_file(f, details=False)
-            if 'GPS GPSLatitude' in tags and 'GPS GPSLongitude' in tags:
-                lat = convert_to_decimal(tags['GPS GPSLatitude'], tags['GPS GPSLatitudeRef'])
-                lon = convert_to_decimal(tags['GPS GPSLongitude'], tags['GPS GPSLongitudeRef'])
-
-                if lat == 0.0 and lon == 0.0:
-                    return None
-                return lat, lon
-    except Exception as e:
-        logger.error(f"Error extracting GPS from {file_path}: {e}")
-    return None
-
-
-def convert_to_decimal(coord, ref):
-    """Convert EXIF GPS coordinates to decimal degrees."""
-    degrees = float(coord.values[0])
-    minutes = float(coord.values[1]) / 60
-    seconds = float(coord.values[2]) / 3600
-    decimal = degrees + minutes + seconds
-    if str(ref) in ['S', 'W']:
-        decimal = -decimal
-    return decimal
-
-
-def get_video_metadata(file_path):
-    """Use ffprobe to extract metadata from video."""
-    try:
-        result = subprocess.run(
-            ['ffprobe', '-v', 'quiet', '-print_format', 'json', '-show_format', '-show_streams', file_path],
-            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
-        )
-        return json.loads(result.stdout)
-    except Exception:
-        return None
-
-
 def scan_directory_for_media(directory, process_videos=False):
     """Scan directory for media files and identify those needing GPS updates."""
     media_files = []
+    media_index = get_media_index()
     for root, _, files in os.walk(directory):
         for file in files:
             file_path = os.path.join(root, file)
             if is_valid_media(file_path, process_videos):
                 try:
-                    gps_data = get_media_gps(file_path)
-                    timestamp = get_media_datetime(file_path)
+                    # Served from the media index when the file is unchanged
+                    info = media_index.get_or_extract(file_path, extract_media_info)
                     media_files.append({
                         'file_path': file_path,
-                        'timestamp': timestamp,
-                        'gps': gps_data
+                        'timestamp': info['datetime'],
+                        'gps': info['gps']
                     })
                 except Exception as e:
                     logger.exception(f"Error processing file {file_path}")
@@ -110,35 +54,25 @@ def is_valid_media(file_path, process_videos=False):
     return file_path.lower().endswith(valid_image_extensions + valid_video_extensions)
 
 
-def find_closest_gps(media_files, target_file, time_window_hours=1):
-    """Find closest media file with GPS within a time window."""
+def find_closest_gps(gps_index, target_file, time_window_hours=1):
+    """Find closest media file with GPS within a time window using a GpsTimeIndex."""
     target_dt = target_file['timestamp']
     if not target_dt:
         return None
 
-    time_window = timedelta(hours=time_window_hours)
-    closest_gps = None
-    min_time_diff = None
-
-    for media in media_files:
-        if media['gps'] and media['timestamp']:
-            time_diff = abs((target_dt - media['timestamp']).total_seconds())
-            if time_diff <= time_window.total_seconds():
-                if min_time_diff is None or time_diff < min_time_diff:
-                    min_time_diff = time_diff
-                    closest_gps = media['gps']
-
-    return closest_gps
+    match = gps_index.nearest(target_dt, timedelta(hours=time_window_hours).total_seconds())
+    return match[0] if match else None
 
 
 def process_directory(directory, process_videos=False):
     """Process media files and assign GPS coordinates."""
     media_files = scan_directory_for_media(directory, process_videos)
     gps_files = [m for m in media_files if m['gps'] is not None]
+    gps_index = GpsTimeIndex.from_media(gps_files, datetime_key='timestamp')
 
     for media in media_files:
         if media['gps'] is None and media['timestamp'] is not None:
-            media['gps'] = find_closest_gps(gps_files, media)
+            media['gps'] = find_closest_gps(gps_index, media)
 
     return media_files
 
@@ -188,7 +122,11 @@ def update_image_gps(image_path, lat, lon):
 
 
 def update_video_gps(video_path, lat, lon):
-    """Update GPS metadata for videos using FFmpeg."""
+    """Update GPS metadata for videos, editing the moov box in place and falling back to FFmpeg."""
+    if video_path.lower().endswith(QUICKTIME_EXTENSIONS) and write_quicktime_location(video_path, format_iso6709(lat, lon)):
+        logger.info(f"Successfully updated GPS for video: {video_path}")
+        return True
+
     temp_path = video_path.replace(".mp4", ".temp.mp4")
     try:
         cmd = [
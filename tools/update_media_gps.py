@@ -8,6 +8,11 @@ import subprocess
 import sys
 from log_utils import setup_logger
 
+# Allow importing shared modules from the project root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from mp4_atoms import QUICKTIME_EXTENSIONS
+from mp4_write import format_iso6709, write_quicktime_location
+
 # Set up logger
 logger = setup_logger('update_media_gps')
 
@@ -67,7 +72,11 @@ def update_image_gps(image_path, lat, lon):
         return False
 
 def update_video_gps(video_path, lat, lon):
-    """Update GPS metadata for videos using FFmpeg."""
+    """Update GPS metadata for videos, editing the moov box in place and falling back to FFmpeg."""
+    if video_path.lower().endswith(QUICKTIME_EXTENSIONS) and write_quicktime_location(video_path, format_iso6709(lat, lon)):
+        logger.info(f"Successfully updated GPS for video: {video_path}")
+        return True
+
     #temp_path = video_path + ".temp"
     temp_path = video_path.replace(".mp4", ".temp.mp4")
     
@@ -0,0 +1,344 @@
+import os
+import time
+import uuid
+import sqlite3
+import threading
+
+from utils import setup_logger
+from media_index import get_index_path
+
+# Setup logger
+logger = setup_logger()
+
+# Seconds a queued write waits for further edits of the same file before it is applied
+DEFAULT_SETTLE_DELAY = 2.0
+
+# Seconds the worker sleeps when the queue is empty, as a safety net for missed wakeups
+IDLE_POLL_INTERVAL = 5.0
+
+# Seconds between heartbeats of a write in progress, and after which a silent writer's claim expires
+LEASE_HEARTBEAT = 5.0
+LEASE_TIMEOUT = 30.0
+
+
+class WriteQueue:
+    """
+    Durable write-behind queue for GPS updates made on the review page.
+
+    enqueue() records the new coordinates in SQLite and returns at once; a
+    single background worker applies them with write(path, lat, lon,
+    media_type). The queue has one row per file, so repeated edits of a file
+    before it is written collapse into one write with the latest coordinates,
+    and rows only become eligible settle_delay seconds after their last edit.
+    Every edit bumps the row's version: a write only removes its row if no
+    newer edit arrived meanwhile. Failed writes stay in the queue with their
+    error until retried or discarded, and pending rows survive a restart.
+
+    A row being written is leased to its process (owner, refreshed by a
+    heartbeat), so a second process on the same database never writes a
+    file another one is writing; claims of a process that died expire after
+    LEASE_TIMEOUT and the row is written again.
+
+    done(path, ok), if given, is called by the worker after each write attempt,
+    once the row has been removed or marked failed.
+    """
+
+    def __init__(self, write, db_path=None, settle_delay=DEFAULT_SETTLE_DELAY, done=None):
+        self.write = write
+        self.done = done
+        self.db_path = db_path or get_index_path('write_queue.db')
+        self.settle_delay = settle_delay
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._current = None  # Path being written by the worker
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._thread = None
+        self._stopped = False
+        self._init_db()
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return conn
+
+    def _init_db(self):
+        conn = self._connect()
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS pending_writes ('
+            ' path TEXT PRIMARY KEY,'
+            ' media_type TEXT,'
+            ' latitude REAL NOT NULL,'
+            ' longitude REAL NOT NULL,'
+            ' status TEXT NOT NULL,'  # pending, writing, failed
+            ' version INTEGER NOT NULL,'
+            ' attempts INTEGER NOT NULL DEFAULT 0,'
+            ' error TEXT,'
+            ' queued_at REAL NOT NULL,'
+            ' updated_at REAL NOT NULL,'
+            ' owner TEXT,'  # Process writing the row
+            ' heartbeat REAL)'
+        )
+        columns = {row[1] for row in conn.execute('PRAGMA table_info(pending_writes)')}
+        for column, kind in (('owner', 'TEXT'), ('heartbeat', 'REAL')):
+            if column not in columns:
+                conn.execute(f'ALTER TABLE pending_writes ADD COLUMN {column} {kind}')
+        conn.commit()
+        self._expire_leases()
+
+    def _expire_leases(self):
+        """Put writes whose writer stopped sending heartbeats (e.g. killed by a restart) back in the queue."""
+        conn = self._connect()
+        conn.execute(
+            "UPDATE pending_writes SET status = 'pending', owner = NULL"
+            " WHERE status = 'writing' AND (heartbeat IS NULL OR heartbeat < ?)",
+            (time.time() - LEASE_TIMEOUT,)
+        )
+        conn.commit()
+
+    @staticmethod
+    def _key(file_path):
+        return os.path.abspath(file_path)
+
+    def enqueue(self, file_path, lat, lon, media_type=None):
+        """
+        Queue new coordinates for a file, replacing any queued but unwritten ones.
+
+        Args:
+            file_path (str): Path of the media file
+            lat (float): Latitude in decimal degrees
+            lon (float): Longitude in decimal degrees
+            media_type (str): 'image', 'heic' or 'video'
+        """
+        now = time.time()
+        conn = self._connect()
+        conn.execute(
+            'INSERT INTO pending_writes (path, media_type, latitude, longitude, status, version, queued_at, updated_at)'
+            " VALUES (?, ?, ?, ?, 'pending', 1, ?, ?)"
+            ' ON CONFLICT(path) DO UPDATE SET media_type = excluded.media_type, latitude = excluded.latitude,'
+            # A row being written stays claimed; its writer requeues it when it sees the newer version
+            " longitude = excluded.longitude, status = CASE status WHEN 'writing' THEN 'writing' ELSE 'pending' END,"
+            " version = version + 1, attempts = 0,"
+            ' error = NULL, updated_at = excluded.updated_at',
+            (self._key(file_path), media_type, lat, lon, now, now)
+        )
+        conn.commit()
+        with self._changed:
+            self._changed.notify_all()
+
+    def get(self, file_path):
+        """Return the queued write of a file as a dict, or None."""
+        row = self._connect().execute(
+            'SELECT path, media_type, latitude, longitude, status, attempts, error, updated_at'
+            ' FROM pending_writes WHERE path = ?',
+            (self._key(file_path),)
+        ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(('path', 'media_type', 'latitude', 'longitude', 'status', 'attempts', 'error', 'updated_at'), row))
+
+    def queued_paths(self):
+        """Set of the (absolute) paths with a queued, in-progress or failed write."""
+        return {row[0] for row in self._connect().execute('SELECT path FROM pending_writes')}
+
+    def status(self):
+        """Counts of queued and in-progress writes plus the failed ones with their errors."""
+        conn = self._connect()
+        counts = dict(conn.execute('SELECT status, COUNT(*) FROM pending_writes GROUP BY status').fetchall())
+        failed = conn.execute(
+            "SELECT path, latitude, longitude, attempts, error FROM pending_writes WHERE status = 'failed' ORDER BY path"
+        ).fetchall()
+        return {
+            'pending': counts.get('pending', 0),
+            'writing': counts.get('writing', 0),
+            'failed': [
+                {'path': path, 'latitude': lat, 'longitude': lon, 'attempts': attempts, 'error': error}
+                for path, lat, lon, attempts, error in failed
+            ]
+        }
+
+    def retry(self, file_path=None):
+        """Put failed writes (of one file, or all) back in the queue, returning how many were requeued."""
+        conn = self._connect()
+        if file_path:
+            cursor = conn.execute(
+                "UPDATE pending_writes SET status = 'pending', error = NULL WHERE status = 'failed' AND path = ?",
+                (self._key(file_path),)
+            )
+        else:
+            cursor = conn.execute("UPDATE pending_writes SET status = 'pending', error = NULL WHERE status = 'failed'")
+        conn.commit()
+        with self._changed:
+            self._changed.notify_all()
+        return cursor.rowcount
+
+    def discard(self, file_path):
+        """
+        Drop the queued write of a file, waiting for it to finish if it is being written.
+
+        Used before restoring a file so a queued write cannot land on top of the restore.
+        Writes in progress in other processes are waited for through their lease.
+        """
+        key = self._key(file_path)
+        conn = self._connect()
+        while True:
+            conn.execute(
+                "DELETE FROM pending_writes WHERE path = ? AND NOT (status = 'writing' AND heartbeat >= ?)",
+                (key, time.time() - LEASE_TIMEOUT)
+            )
+            conn.commit()
+            writing = conn.execute('SELECT 1 FROM pending_writes WHERE path = ?', (key,)).fetchone()
+            with self._changed:
+                if writing is None and self._current != key:
+                    return
+                self._changed.wait(0.2)
+
+    def wait_idle(self, timeout=None):
+        """
+        Block until no write is pending or in progress (failed writes do not count).
+
+        Returns:
+            bool: True if the queue drained, False on timeout
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            counts = self.status()
+            if not counts['pending'] and not counts['writing'] and self._current is None:
+                return True
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return False
+            with self._changed:
+                self._changed.wait(min(remaining, 0.5) if remaining is not None else 0.5)
+
+    def start(self):
+        """Start the background writer thread if it is not running."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopped = False
+            self._thread = threading.Thread(target=self._run, name='write-queue', daemon=True)
+            self._thread.start()
+        logger.info(f"Write-behind queue started ({self.db_path})")
+
+    def stop(self, timeout=None):
+        """Stop the worker after its current write; queued rows stay for the next start."""
+        with self._changed:
+            self._stopped = True
+            self._changed.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _next(self):
+        """Claim the oldest settled pending write, returning (path, media_type, lat, lon, version) or None."""
+        self._expire_leases()
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT path, media_type, latitude, longitude, version FROM pending_writes"
+            " WHERE status = 'pending' AND updated_at <= ? ORDER BY updated_at LIMIT 1",
+            (time.time() - self.settle_delay,)
+        ).fetchone()
+        if row is None:
+            return None
+        cursor = conn.execute(
+            "UPDATE pending_writes SET status = 'writing', owner = ?, heartbeat = ?"
+            " WHERE path = ? AND version = ? AND status = 'pending'",
+            (self.owner, time.time(), row[0], row[4])
+        )
+        conn.commit()
+        return row if cursor.rowcount else None
+
+    def _next_due(self):
+        """Seconds until the oldest pending write settles, or None if nothing is pending."""
+        row = self._connect().execute(
+            "SELECT MIN(updated_at) FROM pending_writes WHERE status = 'pending'"
+        ).fetchone()
+        if row is None or row[0] is None:
+            return None
+        return max(0.0, row[0] + self.settle_delay - time.time())
+
+    def _run(self):
+        while not self._stopped:
+            due = None
+            try:
+                claimed = self._next()
+                if claimed is None:
+                    due = self._next_due()
+            except sqlite3.Error as e:
+                # e.g. 'database is locked' while another process holds the queue; try again later
+                logger.error(f"Write queue error: {e}")
+                claimed = None
+            if claimed is None:
+                with self._changed:
+                    if not self._stopped:
+                        self._changed.wait(IDLE_POLL_INTERVAL if due is None else min(due + 0.05, IDLE_POLL_INTERVAL))
+                continue
+            try:
+                self._apply(*claimed)
+            except sqlite3.Error as e:
+                # The row stays claimed until its lease expires, then it is written again
+                logger.error(f"Write queue error after writing {claimed[0]}: {e}")
+                with self._changed:
+                    self._current = None
+                    self._changed.notify_all()
+
+    def _heartbeat(self, path, done):
+        """Keep the lease of a write in progress alive until done is set."""
+        while not done.wait(LEASE_HEARTBEAT):
+            try:
+                conn = self._connect()
+                conn.execute(
+                    "UPDATE pending_writes SET heartbeat = ? WHERE path = ? AND status = 'writing' AND owner = ?",
+                    (time.time(), path, self.owner)
+                )
+                conn.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"Write queue heartbeat failed: {e}")
+
+    def _apply(self, path, media_type, lat, lon, version):
+        with self._changed:
+            self._current = path
+        done = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(path, done), name='write-queue-heartbeat', daemon=True)
+        heartbeat.start()
+        error = None
+        try:
+            ok = self.write(path, lat, lon, media_type)
+            if not ok:
+                error = 'Write failed, see the log for details'
+        except Exception as e:
+            logger.error(f"Queued write of {path} failed: {e}")
+            ok, error = False, str(e)
+        finally:
+            done.set()
+            heartbeat.join()
+
+        conn = self._connect()
+        if ok:
+            # A newer edit bumped the version; keep its row
+            conn.execute('DELETE FROM pending_writes WHERE path = ? AND version = ?', (path, version))
+            logger.debug(f"Applied queued GPS write of {path}")
+        else:
+            conn.execute(
+                "UPDATE pending_writes SET status = 'failed', owner = NULL, attempts = attempts + 1, error = ?"
+                ' WHERE path = ? AND version = ?',
+                (error, path, version)
+            )
+            logger.warning(f"Queued GPS write of {path} failed: {error}")
+        # A newer edit arrived while writing: release the row so the new coordinates get written
+        conn.execute(
+            "UPDATE pending_writes SET status = 'pending', owner = NULL WHERE path = ? AND status = 'writing' AND owner = ?",
+            (path, self.owner)
+        )
+        conn.commit()
+        with self._changed:
+            self._current = None
+            self._changed.notify_all()
+        if self.done:
+            try:
+                self.done(path, ok)
+            except Exception as e:
+                logger.error(f"Write queue callback failed for {path}: {e}")